@@ -8,6 +8,8 @@ from aiogram import Bot, Dispatcher
 from aiogram.fsm.storage.redis import RedisStorage
 from aiogram.client.default import DefaultBotProperties
 
+from src.alerts import PriceAlertNotifier
+from src.api.ffio import rate_replica
 from src.config import config
 from src.database import engine as db, session, set_isolation_level
 from src.handlers import init_handlers
@@ -71,6 +73,9 @@ async def main():
             trn_notify_processor = TransactionNotifyProcessor(trn_notifyer)
 
             asyncio.create_task(trn_notify_processor.process_transactions())
+            asyncio.create_task(PriceAlertNotifier(bot).process_alerts())
+            if config.RATE_REPLICA_ENABLED:
+                rate_replica.start()
 
             await bot.delete_webhook(drop_pending_updates=True)
             await dispatcher.start_polling(bot)
@@ -0,0 +1,2 @@
+# flake8: noqa: E401
+from .alert_notifier import PriceAlertNotifier
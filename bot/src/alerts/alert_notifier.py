@@ -0,0 +1,83 @@
+import asyncio
+import logging
+
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.future import select
+
+from src.config import config
+from src.database import get_session
+from src.models import PriceAlert
+from src.utils import format_message
+
+logger = logging.getLogger(__name__)
+
+
+class PriceAlertNotifier:
+    """Notify users about price alerts triggered by the currencies loader.
+
+    Triggered alerts are read in batches of ``ALERTS_NOTIFY_BATCH_SIZE``,
+    marked notified and sent together. A full batch is followed by the
+    next one after a second, which keeps within Telegram's limit of
+    about 30 messages per second; otherwise the table is polled every
+    ``ALERTS_POLL_INTERVAL`` seconds.
+    """
+
+    def __init__(self, bot) -> None:
+        self.bot = bot
+
+    async def process_alerts(self) -> None:
+        while True:
+            sent = 0
+            try:
+                sent = await self._notify_batch()
+            except SQLAlchemyError as e:
+                logger.critical(
+                    'Critical error while working with database %s', e,
+                    exc_info=True
+                )
+            except Exception as e:
+                logger.error('Unknown error: %s', e, exc_info=True)
+            finally:
+                await asyncio.sleep(
+                    1 if sent >= config.ALERTS_NOTIFY_BATCH_SIZE
+                    else config.ALERTS_POLL_INTERVAL)
+
+    async def _notify_batch(self) -> int:
+        async with get_session() as session:
+            result = await session.execute(
+                select(PriceAlert)
+                .where(PriceAlert.is_triggered.is_(True),
+                       PriceAlert.is_notified.is_(False))
+                .order_by(PriceAlert.triggered_on)
+                .limit(config.ALERTS_NOTIFY_BATCH_SIZE)
+                .with_for_update(skip_locked=True, of=PriceAlert)
+            )
+            alerts = result.scalars().all()
+            messages = [(alert.id, alert.user.tg_id, self._get_message(alert))
+                        for alert in alerts]
+            for alert in alerts:
+                alert.is_notified = True
+            await session.commit()
+
+        await asyncio.gather(*(self._send(*message) for message in messages))
+        return len(messages)
+
+    async def _send(self, alert_id, chat_id: int, text: str) -> None:
+        try:
+            await self.bot.send_message(chat_id=chat_id, text=text)
+        except Exception as e:
+            logger.error(f'Failed to send price alert {alert_id}: {e}',
+                         exc_info=True)
+
+    def _get_message(self, alert: PriceAlert) -> str:
+        lang = alert.user.get_lang()
+        return format_message(
+            lang.alert.triggered,
+            from_currency=alert.from_currency,
+            from_network=alert.from_currency_network,
+            to_currency=alert.to_currency,
+            to_network=alert.to_currency_network,
+            direction=lang.alert.direction.get(alert.direction),
+            threshold=format(alert.threshold.normalize(), 'f'),
+            triggered_rate=format(alert.triggered_rate.normalize(), 'f'),
+        )
@@ -1,2 +1,3 @@
 # flake8: noqa: E501
 from .ffio_redis_data import ffio_redis_client
+from .rate_replica import rate_replica
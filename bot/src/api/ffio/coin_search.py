@@ -0,0 +1,105 @@
+from bisect import bisect_left
+from dataclasses import dataclass
+
+from src.utils.cache import TTLCache
+
+# Match classes, best first.
+EXACT, PREFIX, SUBSTRING, TYPO = range(4)
+
+
+@dataclass(frozen=True)
+class CoinSearchEntry:
+    coin: str
+    name: str
+    priority: int
+
+
+def _within_one_edit(first: str, second: str) -> bool:
+    """Check that two strings differ by at most one edit."""
+    if abs(len(first) - len(second)) > 1:
+        return False
+    if len(first) > len(second):
+        first, second = second, first
+    i = 0
+    while i < len(first) and first[i] == second[i]:
+        i += 1
+    if len(first) == len(second):
+        return first[i + 1:] == second[i + 1:]
+    return first[i:] == second[i + 1:]
+
+
+class CoinSearchIndex:
+    """In-memory search over coin codes and names for inline queries.
+
+    Terms (the lowercased code and every word of the name) are kept in a
+    sorted list, so prefix matches are found by bisection. Substring
+    matches scan the coins, which is cheap for a few hundred of them, and
+    one-typo matches are only looked for when the query found fewer than
+    ``TYPO_FALLBACK`` coins. Results are ranked by match class, then by
+    ``priority``, and ranked lists are cached per query for paging.
+    """
+
+    MIN_TYPO_QUERY = 3
+    TYPO_FALLBACK = 5
+
+    def __init__(self, entries: list[CoinSearchEntry]) -> None:
+        self.entries = sorted(entries,
+                              key=lambda entry: (-entry.priority, entry.coin))
+        self._terms = sorted(
+            (term, position)
+            for position, entry in enumerate(self.entries)
+            for term in {entry.coin.lower(), *entry.name.lower().split()}
+        )
+        self._keys = [term for term, _ in self._terms]
+        self._texts = [f'{entry.coin} {entry.name}'.lower()
+                       for entry in self.entries]
+        self._results = TTLCache(256, 60)
+
+    def _rank(self, query: str) -> list[CoinSearchEntry]:
+        if not query:
+            return self.entries
+
+        matches: dict[int, int] = {}
+        start = bisect_left(self._keys, query)
+        for term, position in self._terms[start:]:
+            if not term.startswith(query):
+                break
+            entry = self.entries[position]
+            match = EXACT if term == entry.coin.lower() == query else PREFIX
+            matches[position] = min(matches.get(position, match), match)
+
+        for position, text in enumerate(self._texts):
+            if position not in matches and query in text:
+                matches[position] = SUBSTRING
+
+        if (len(query) >= self.MIN_TYPO_QUERY
+                and len(matches) < self.TYPO_FALLBACK):
+            for term, position in self._terms:
+                if position in matches:
+                    continue
+                if any(_within_one_edit(query, term[:length]) for length in
+                       (len(query) - 1, len(query), len(query) + 1)):
+                    matches[position] = TYPO
+
+        return [self.entries[position] for position in
+                sorted(matches, key=lambda position: (matches[position],
+                                                      position))]
+
+    def search(
+            self, query: str, offset: int = 0, limit: int = 50,
+            allowed: set[str] | None = None
+    ) -> tuple[list[CoinSearchEntry], int | None]:
+        """Return a page of ranked matches and the next offset, if any.
+
+        ``allowed`` restricts the results to the given coins.
+        """
+        query = query.strip().lower()
+        ranked = self._results.get(query)
+        if ranked is None:
+            ranked = self._rank(query)
+            self._results.set(query, ranked)
+        if allowed is not None:
+            ranked = [entry for entry in ranked if entry.coin in allowed]
+        page = ranked[offset:offset + limit]
+        next_offset = offset + limit
+        return page, next_offset if next_offset < len(ranked) else None
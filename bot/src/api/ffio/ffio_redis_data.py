@@ -1,32 +1,149 @@
 import logging
+from datetime import datetime
+from decimal import Decimal
 
 from redis.exceptions import RedisError
 
 from src.api.ffio import schemas
+from src.api.ffio.coin_search import CoinSearchEntry, CoinSearchIndex
+from src.api.ffio.rate_replica import RateReplica, rate_replica
+from src.api.ffio.rates_snapshot import RatesSnapshots, rates_snapshots
+from src.api.ffio.route_finder import RateGraph, Route
+from src.config import config
 from src.redis import redis_client
+from src.utils.cache import TTLCache
 
 logger = logging.getLogger(__name__)
 
 
 class FFIORedisClient:
+    """Read ffio data through the generation published by the loader.
+
+    The currencies service writes every refresh under a new generation
+    and flips ``{exchanger}:{feed}:generation`` when it is complete, so
+    all keys are resolved against the current generation of their feed.
+    """
+
     EXCHANGER = 'ffio'
-    COINS_KEY = 'coins'
-    COIN_NETWORKS = '{coin_name}:networks'
-    FULL_COIN_INFO_KEY = '{exchanger}:{coin_name}:{network}:info'
-    RATE_KEY = '{exchanger}:{type}:{from_coin}:to:{to_coin}:info'
+    CURRENCIES_FEED = 'ccies'
+    GENERATION_KEY = '{exchanger}:{feed}:generation'
+    COINS_KEY = '{exchanger}:ccies:{generation}:coins'
+    COIN_NETWORKS = '{exchanger}:ccies:{generation}:{coin_name}:networks'
+    FULL_COIN_INFO_KEY = ('{exchanger}:ccies:{generation}:'
+                          '{coin_name}:{network}:info')
+    CODES_KEY = '{exchanger}:ccies:{generation}:codes'
+    CODE_FIELD = '{coin_name}:{network}'
+    COIN_NAMES_KEY = '{exchanger}:ccies:{generation}:names'
+    REACH_KEY = '{exchanger}:{type}:{generation}:reach'
+    ROUTES_KEY = '{exchanger}:{type}:{generation}:routes'
+    RATES_KEY = '{exchanger}:{type}:{generation}:{from_coin}:rates'
+    RATE_HISTORY_RAW_KEY = ('{exchanger}:{type}:history:raw:'
+                            '{from_coin}:{to_coin}')
+    RATE_HISTORY_KEY = ('{exchanger}:{type}:history:{resolution}:'
+                        '{from_coin}:{to_coin}')
+    RATE_HISTORY_OPEN_KEY = '{exchanger}:{type}:history:{resolution}:open'
+    RATE_HISTORY_RESOLUTIONS = {'1m': 60, '1h': 3600}
+
+    # Resolves both coins through the code index and reads the rate,
+    # following the key layout above. Returns nil if a generation or a
+    # coin is missing, otherwise {from_code, to_code, packed rate or nil}.
+    RATE_SCRIPT = """
+    local coins_generation = redis.call('GET', KEYS[1])
+    local rates_generation = redis.call('GET', KEYS[2])
+    if not coins_generation or not rates_generation then
+        return nil
+    end
+    local codes = redis.call(
+        'HMGET', ARGV[1] .. ':ccies:' .. coins_generation .. ':codes',
+        ARGV[3] .. ':' .. ARGV[4], ARGV[5] .. ':' .. ARGV[6])
+    if not codes[1] or not codes[2] then
+        return nil
+    end
+    local from_code = string.match(codes[1], '^[^|]*')
+    local to_code = string.match(codes[2], '^[^|]*')
+    local rate = redis.call(
+        'HGET', ARGV[1] .. ':' .. ARGV[2] .. ':' .. rates_generation
+        .. ':' .. from_code .. ':rates', to_code)
+    return {from_code, to_code, rate}
+    """
+
+    def __init__(self):
+        self._rate_script = redis_client.register_script(self.RATE_SCRIPT)
+        self._cache = TTLCache(config.COIN_CACHE_SIZE, config.COIN_CACHE_TTL)
+        self._cache_generation = None
+        self._generations = TTLCache(8, config.GENERATION_CACHE_TTL)
+        self._graphs: dict[str, tuple[int, RateGraph]] = {}
+
+    def get_cache_stats(self) -> dict:
+        """Return size and hit/miss counters of the coin cache."""
+        return self._cache.get_stats()
+
+    async def get_generation(self, feed: str) -> str | None:
+        """Retrieve the current generation of a feed.
+
+        The pointer is cached for ``GENERATION_CACHE_TTL`` seconds. When
+        the currencies generation changes, the coin cache is dropped, so
+        cached coin data never outlives its generation.
+        """
+        generation = self._generations.get(feed)
+        if generation is None:
+            generation = await redis_client.get(
+                self.GENERATION_KEY.format(exchanger=self.EXCHANGER,
+                                           feed=feed))
+            self._generations.set(feed, generation)
+            if (feed == self.CURRENCIES_FEED
+                    and generation != self._cache_generation):
+                logger.info('Coin cache reset for generation %s, stats: %s',
+                            generation, self.get_cache_stats())
+                self._cache.clear()
+                self._cache_generation = generation
+        return generation
 
     async def get_coins(self) -> set[str] | None:
         """Retrieve the set of available coins."""
         try:
-            return await redis_client.smembers(self.COINS_KEY)
+            generation = await self.get_generation(self.CURRENCIES_FEED)
+            coins = self._cache.get(('coins', generation))
+            if coins is None:
+                coins = await redis_client.smembers(
+                    self.COINS_KEY.format(exchanger=self.EXCHANGER,
+                                          generation=generation))
+                self._cache.set(('coins', generation), coins)
+            return coins
         except RedisError as e:
             logger.error('Error fetching coin list: %s', e, exc_info=True)
 
+    async def get_search_index(self) -> CoinSearchIndex | None:
+        """Retrieve the coin search index of the current generation."""
+        try:
+            generation = await self.get_generation(self.CURRENCIES_FEED)
+            index = self._cache.get(('search', generation))
+            if index is None:
+                names = await redis_client.hgetall(
+                    self.COIN_NAMES_KEY.format(exchanger=self.EXCHANGER,
+                                               generation=generation))
+                entries = []
+                for coin, value in names.items():
+                    priority, name = value.split('|', 1)
+                    entries.append(CoinSearchEntry(coin, name, int(priority)))
+                index = CoinSearchIndex(entries)
+                self._cache.set(('search', generation), index)
+            return index
+        except RedisError as e:
+            logger.error('Error fetching coin names: %s', e, exc_info=True)
+
     async def get_networks(self, coin_name: str) -> set[str] | None:
         """Retrieve the set of networks for a given coin."""
         try:
-            networks = await redis_client.smembers(
-                self.COIN_NETWORKS.format(coin_name=coin_name))
+            generation = await self.get_generation(self.CURRENCIES_FEED)
+            key = ('networks', generation, coin_name)
+            networks = self._cache.get(key)
+            if networks is None:
+                networks = await redis_client.smembers(
+                    self.COIN_NETWORKS.format(exchanger=self.EXCHANGER,
+                                              generation=generation,
+                                              coin_name=coin_name))
+                self._cache.set(key, networks)
             return networks
         except RedisError as e:
             logger.error('Error fetching networks for coin %s: %s',
@@ -35,11 +152,27 @@ class FFIORedisClient:
     async def get_coin_full_info(self, coin_name: str,
                                  network: str) -> schemas.Currency | None:
         """Retrieve full information for a coin on a specific network."""
+        try:
+            generation = await self.get_generation(self.CURRENCIES_FEED)
+        except RedisError as e:
+            logger.error('Error fetching currencies generation: %s', e,
+                         exc_info=True)
+            generation = None
+        return await self._get_coin_full_info(generation, coin_name, network)
+
+    async def _get_coin_full_info(
+            self, generation: str | None, coin_name: str,
+            network: str) -> schemas.Currency | None:
+        key = ('info', generation, coin_name, network)
+        coin = self._cache.get(key)
+        if coin is not None:
+            return coin
         coin_info = None
         try:
             coin_info = await redis_client.get(
                 self.FULL_COIN_INFO_KEY.format(
                     exchanger=self.EXCHANGER,
+                    generation=generation,
                     coin_name=coin_name,
                     network=network
                 )
@@ -47,39 +180,236 @@ class FFIORedisClient:
         except RedisError as e:
             logger.error('Error fetching coin info for %s on network %s: %s',
                          coin_name, network, e, exc_info=True)
-        return schemas.Currency.model_validate_json(coin_info)
+        coin = schemas.Currency.model_validate_json(coin_info)
+        self._cache.set(key, coin)
+        return coin
+
+    async def _get_codes(self) -> dict[str, schemas.CoinCode]:
+        """Return the code index of the current currencies generation."""
+        generation = await self.get_generation(self.CURRENCIES_FEED)
+        codes = self._cache.get(('codes', generation))
+        if codes is None:
+            codes = await redis_client.hgetall(
+                self.CODES_KEY.format(exchanger=self.EXCHANGER,
+                                      generation=generation))
+            codes = {field: schemas.CoinCode.unpack(value)
+                     for field, value in codes.items()}
+            self._cache.set(('codes', generation), codes)
+        return codes
+
+    async def get_coin_code(self, coin_name: str,
+                            network: str) -> schemas.CoinCode | None:
+        """Retrieve the exchange code and flags of a coin on a network.
+
+        The whole code index of the current generation is read once and
+        kept in the coin cache.
+        """
+        try:
+            codes = await self._get_codes()
+        except RedisError as e:
+            logger.error('Error fetching coin code for %s on network %s: %s',
+                         coin_name, network, e, exc_info=True)
+            return None
+        return codes.get(self.CODE_FIELD.format(coin_name=coin_name,
+                                                network=network))
+
+    async def _get_reach(self, rate_type: str) -> dict[str, frozenset[str]]:
+        """Return to-codes reachable from every from-code for a rate type."""
+        generation = await self.get_generation(rate_type)
+        reach = self._cache.get(('reach', rate_type, generation))
+        if reach is None:
+            reach = await redis_client.hgetall(
+                self.REACH_KEY.format(exchanger=self.EXCHANGER,
+                                      type=rate_type, generation=generation))
+            reach = {from_code: frozenset(to_codes.split())
+                     for from_code, to_codes in reach.items()}
+            self._cache.set(('reach', rate_type, generation), reach)
+        return reach
+
+    async def _get_reachable_codes(
+            self, rate_type: str, from_coin: str,
+            from_coin_network: str) -> frozenset[str] | None:
+        from_code = await self.get_coin_code(from_coin, from_coin_network)
+        if from_code is None:
+            return None
+        try:
+            reach = await self._get_reach(rate_type)
+        except RedisError as e:
+            logger.error('Error fetching %s reachability: %s', rate_type, e,
+                         exc_info=True)
+            return None
+        return reach.get(from_code.code, frozenset())
+
+    async def is_pair_supported(
+            self, rate_type: str, from_coin: str, from_coin_network: str,
+            to_coin: str, to_coin_network: str) -> bool | None:
+        """Check that the pair has a rate, or None if it is unknown."""
+        reachable = await self._get_reachable_codes(
+            rate_type, from_coin, from_coin_network)
+        to_code = await self.get_coin_code(to_coin, to_coin_network)
+        if reachable is None or to_code is None:
+            return None
+        return to_code.code in reachable
+
+    async def get_reachable_networks(
+            self, rate_type: str, from_coin: str, from_coin_network: str,
+            to_coin: str, networks: set[str] | None) -> set[str] | None:
+        """Filter ``networks`` of ``to_coin`` down to those with a rate.
+
+        ``networks`` is None when ``get_networks`` failed, and so is the
+        result.
+        """
+        if networks is None:
+            return None
+        reachable = await self._get_reachable_codes(
+            rate_type, from_coin, from_coin_network)
+        if reachable is None:
+            return None
+        supported = set()
+        for network in networks:
+            to_code = await self.get_coin_code(to_coin, network)
+            if to_code is not None and to_code.code in reachable:
+                supported.add(network)
+        return supported
+
+    async def get_reachable_coins(
+            self, rate_type: str, from_coin: str,
+            from_coin_network: str) -> set[str] | None:
+        """Retrieve coins with at least one network reachable by a rate."""
+        reachable = await self._get_reachable_codes(
+            rate_type, from_coin, from_coin_network)
+        if reachable is None:
+            return None
+        try:
+            codes = await self._get_codes()
+        except RedisError as e:
+            logger.error('Error fetching coin codes: %s', e, exc_info=True)
+            return None
+        return {field.rsplit(':', 1)[0] for field, code in codes.items()
+                if code.code in reachable}
+
+    async def _get_rate_graph(self, rate_type: str) -> RateGraph | None:
+        """Return the rate graph of the current generation of a feed.
+
+        The loader publishes the route tables with every generation; they
+        are loaded once per generation and kept until the next one, apart
+        from the coin cache so they are never evicted early.
+        """
+        generation = await self.get_generation(rate_type)
+        if generation is None:
+            return None
+        generation = int(generation)
+        cached = self._graphs.get(rate_type)
+        if cached is not None and cached[0] == generation:
+            return cached[1]
+        tables = await redis_client.hgetall(self.ROUTES_KEY.format(
+            exchanger=self.EXCHANGER, type=rate_type, generation=generation))
+        if not tables:
+            return None
+        graph = RateGraph(tables)
+        self._graphs[rate_type] = (generation, graph)
+        return graph
+
+    async def find_route(
+            self, rate_type: str, from_coin: str, from_coin_network: str,
+            to_coin: str, to_coin_network: str,
+            amount: Decimal | None = None) -> Route | None:
+        """Find the best direct or one-stop route between two coins."""
+        from_code = await self.get_coin_code(from_coin, from_coin_network)
+        to_code = await self.get_coin_code(to_coin, to_coin_network)
+        if from_code is None or to_code is None:
+            return None
+        try:
+            graph = await self._get_rate_graph(rate_type)
+        except RedisError as e:
+            logger.error('Error loading %s rate graph: %s', rate_type, e,
+                         exc_info=True)
+            return None
+        if graph is None:
+            return None
+        return graph.find_route(from_code.code, to_code.code,
+                                None if amount is None else float(amount))
+
+    async def get_coins_by_code(self) -> dict[str, tuple[str, str]]:
+        """Map exchange codes back to their coin and network."""
+        try:
+            codes = await self._get_codes()
+        except RedisError as e:
+            logger.error('Error fetching coin codes: %s', e, exc_info=True)
+            return {}
+        return {code.code: tuple(field.rsplit(':', 1))
+                for field, code in codes.items()}
+
+    async def _get_local_rate(
+            self, source: RateReplica | RatesSnapshots, rate_type: str,
+            from_coin: str, from_coin_network: str, to_coin: str,
+            to_coin_network: str) -> schemas.RatesSchema | None:
+        from_code = await self.get_coin_code(from_coin, from_coin_network)
+        to_code = await self.get_coin_code(to_coin, to_coin_network)
+        if not from_code or not to_code:
+            logger.warning('Missing coin information for %s or %s.',
+                           from_coin, to_coin)
+            return None
+        rate = source.get_rate(rate_type, from_code.code, to_code.code)
+        if not rate:
+            logger.warning('Rate %s for coins %s -> %s is missing.',
+                           rate_type, from_coin, to_coin)
+        return rate
+
+    async def _is_snapshot_current(self, rate_type: str) -> bool:
+        if rates_snapshots.get(rate_type) is None:
+            return False
+        try:
+            generation = await self.get_generation(rate_type)
+        except RedisError as e:
+            # Redis cannot serve the rate either; only the age applies.
+            logger.error('Error fetching %s generation: %s', rate_type, e)
+            generation = None
+        return rates_snapshots.is_current(rate_type, generation)
 
     async def _get_rate(self, rate_type: str, from_coin: str,
                         from_coin_network: str, to_coin: str,
                         to_coin_network: str) -> schemas.RatesSchema | None:
-        """Retrieve exchange rate between two coins."""
-        try:
-            from_coin_info = await self.get_coin_full_info(
-                from_coin, from_coin_network)
-            to_coin_info = await self.get_coin_full_info(
-                to_coin, to_coin_network)
-
-            if not from_coin_info or not to_coin_info:
-                logger.warning('Missing coin information for %s or %s.',
-                               from_coin, to_coin)
-                return None
+        """Retrieve exchange rate between two coins.
 
-            rate = await redis_client.get(
-                self.RATE_KEY.format(
-                    exchanger=self.EXCHANGER,
-                    type=rate_type,
-                    from_coin=from_coin_info.code,
-                    to_coin=to_coin_info.code
-                )
+        Served from the host's rates snapshot when one is configured,
+        mapped and current, then from the in-memory rate replica when it
+        is loaded, otherwise read from Redis in one round trip.
+        """
+        if await self._is_snapshot_current(rate_type):
+            return await self._get_local_rate(
+                rates_snapshots, rate_type, from_coin, from_coin_network,
+                to_coin, to_coin_network)
+        if config.RATE_REPLICA_ENABLED and rate_replica.is_ready(rate_type):
+            return await self._get_local_rate(
+                rate_replica, rate_type, from_coin, from_coin_network,
+                to_coin, to_coin_network)
+        try:
+            quote = await self._rate_script(
+                keys=[
+                    self.GENERATION_KEY.format(exchanger=self.EXCHANGER,
+                                               feed=self.CURRENCIES_FEED),
+                    self.GENERATION_KEY.format(exchanger=self.EXCHANGER,
+                                               feed=rate_type)
+                ],
+                args=[self.EXCHANGER, rate_type, from_coin,
+                      from_coin_network, to_coin, to_coin_network]
             )
-            if not rate:
-                logger.warning('Rate %s for coins %s -> %s is missing.',
-                               rate_type, from_coin, to_coin)
-                return None
-            return schemas.RatesSchema.model_validate_json(rate)
         except RedisError as e:
             logger.error('Error fetching exchange rate %s: %s',
                          rate_type, e, exc_info=True)
+            return None
+
+        if not quote:
+            logger.warning('Missing coin information for %s or %s.',
+                           from_coin, to_coin)
+            return None
+        from_code, to_code, rate = quote
+        if not rate:
+            logger.warning('Rate %s for coins %s -> %s is missing.',
+                           rate_type, from_coin, to_coin)
+            return None
+        return schemas.RatesSchema.unpack(from_code, to_code, rate)
 
     async def get_fixed_rate(
             self, from_coin: str, from_coin_network: str,
@@ -95,5 +425,99 @@ class FFIORedisClient:
         return await self._get_rate('float', from_coin, from_coin_network,
                                     to_coin, to_coin_network)
 
+    async def _get_pair_codes(
+            self, from_coin: str, from_coin_network: str, to_coin: str,
+            to_coin_network: str) -> tuple[str, str] | None:
+        from_code = await self.get_coin_code(from_coin, from_coin_network)
+        to_code = await self.get_coin_code(to_coin, to_coin_network)
+        if from_code is None or to_code is None:
+            return None
+        return from_code.code, to_code.code
+
+    async def get_rate_points(
+            self, rate_type: str, from_coin: str, from_coin_network: str,
+            to_coin: str, to_coin_network: str, start: datetime,
+            end: datetime) -> list[schemas.RatePoint]:
+        """Return the raw rates of a pair written between two moments.
+
+        Only refreshes that changed the pair have a point.
+        """
+        codes = await self._get_pair_codes(from_coin, from_coin_network,
+                                           to_coin, to_coin_network)
+        if codes is None:
+            return []
+        try:
+            entries = await redis_client.xrange(
+                self.RATE_HISTORY_RAW_KEY.format(
+                    exchanger=self.EXCHANGER, type=rate_type,
+                    from_coin=codes[0], to_coin=codes[1]),
+                min=int(start.timestamp() * 1000),
+                max=int(end.timestamp() * 1000))
+        except RedisError as e:
+            logger.error('Error fetching rate history: %s', e, exc_info=True)
+            return []
+        return [
+            schemas.RatePoint(
+                time=datetime.fromtimestamp(
+                    int(entry_id.split('-')[0]) / 1000),
+                in_amount=fields['in'], out_amount=fields['out'],
+                min_amount=fields['min'], max_amount=fields['max'])
+            for entry_id, fields in entries
+        ]
+
+    async def get_rate_buckets(
+            self, rate_type: str, from_coin: str, from_coin_network: str,
+            to_coin: str, to_coin_network: str, start: datetime,
+            end: datetime, resolution: str = '1m'
+    ) -> list[schemas.RateBucket]:
+        """Return the rate buckets of a pair overlapping a time range.
+
+        ``resolution`` is ``1m`` or ``1h``. Buckets are written when the
+        next one opens, so the open bucket is read from its own hash.
+        Intervals in which the pair did not change have no bucket.
+        """
+        seconds = self.RATE_HISTORY_RESOLUTIONS[resolution]
+        codes = await self._get_pair_codes(from_coin, from_coin_network,
+                                           to_coin, to_coin_network)
+        if codes is None:
+            return []
+        from_code, to_code = codes
+        start_at, end_at = start.timestamp(), end.timestamp()
+        try:
+            async with redis_client.pipeline(transaction=False) as pipe:
+                # A bucket is appended after it ends, up to one bucket
+                # after its start.
+                pipe.xrange(
+                    self.RATE_HISTORY_KEY.format(
+                        exchanger=self.EXCHANGER, type=rate_type,
+                        resolution=resolution, from_coin=from_code,
+                        to_coin=to_code),
+                    min=int(start_at * 1000),
+                    max='+')
+                pipe.hget(
+                    self.RATE_HISTORY_OPEN_KEY.format(
+                        exchanger=self.EXCHANGER, type=rate_type,
+                        resolution=resolution),
+                    f'{from_code}:{to_code}')
+                entries, open_bucket = await pipe.execute()
+        except RedisError as e:
+            logger.error('Error fetching rate history: %s', e, exc_info=True)
+            return []
+
+        buckets = [fields for _, fields in entries]
+        if open_bucket:
+            bucket_start, low, high, last = open_bucket.split(
+                schemas.RatesSchema.PACKED_SEPARATOR)
+            buckets.append({'start': bucket_start, 'min': low,
+                            'max': high, 'last': last})
+        return [
+            schemas.RateBucket(
+                start=datetime.fromtimestamp(int(bucket['start'])),
+                min_rate=bucket['min'], max_rate=bucket['max'],
+                last_rate=bucket['last'])
+            for bucket in buckets
+            if start_at - seconds < int(bucket['start']) <= end_at
+        ]
+
 
 ffio_redis_client = FFIORedisClient()
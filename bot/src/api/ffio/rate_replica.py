@@ -0,0 +1,185 @@
+import asyncio
+import json
+import logging
+import time
+
+from src.api.ffio import schemas
+from src.config import config
+from src.redis import redis_client
+
+logger = logging.getLogger(__name__)
+
+
+class RateReplica:
+    """In-memory copy of the current ffio rate tables.
+
+    The replica loads the published generation of every rate feed and
+    then follows ``{exchanger}:{type}:changes``, the stream of deltas the
+    loader appends after each refresh. An entry is applied only if it
+    continues the generation held in memory; a gap, a ``full`` entry or a
+    Redis error makes the feed reload from its snapshot.
+    """
+
+    EXCHANGER = 'ffio'
+    FEEDS = ('fixed', 'float')
+    GENERATION_KEY = '{exchanger}:{feed}:generation'
+    RATES_KEY = '{exchanger}:{type}:{generation}:{from_coin}:rates'
+    CHANGES_KEY = '{exchanger}:{type}:changes'
+
+    def __init__(self) -> None:
+        self._rates: dict[str, dict[str, dict[str, str]]] = {}
+        self._generations: dict[str, int] = {}
+        self._last_ids: dict[str, str] = {}
+        self._published_at: dict[str, float] = {}
+        self._lag: dict[str, float] = {}
+        self._task: asyncio.Task | None = None
+        self.resyncs = 0
+        self.applied = 0
+
+    def start(self) -> None:
+        """Start following the change streams unless already running."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    def is_ready(self, feed: str) -> bool:
+        return feed in self._generations
+
+    def get_rate(self, feed: str, from_code: str,
+                 to_code: str) -> schemas.RatesSchema | None:
+        rate = self._rates[feed].get(from_code, {}).get(to_code)
+        if rate is None:
+            return None
+        return schemas.RatesSchema.unpack(from_code, to_code, rate)
+
+    def get_age(self, feed: str) -> float | None:
+        """Seconds since the loader published the generation in memory."""
+        published_at = self._published_at.get(feed)
+        return None if published_at is None else time.time() - published_at
+
+    def get_lag(self, feed: str) -> float | None:
+        """Seconds the last delta took from publication to being applied."""
+        return self._lag.get(feed)
+
+    def get_stats(self) -> dict:
+        return {
+            'resyncs': self.resyncs,
+            'applied': self.applied,
+            'feeds': {
+                feed: {
+                    'generation': self._generations.get(feed),
+                    'pairs': sum(map(len, self._rates.get(feed, {}).values())),
+                    'age_seconds': self.get_age(feed),
+                    'lag_seconds': self.get_lag(feed),
+                } for feed in self.FEEDS
+            },
+        }
+
+    def get_tables(
+            self, feed: str) -> tuple[int, dict[str, dict[str, str]]] | None:
+        """Return the generation and packed rates held for a feed."""
+        if not self.is_ready(feed):
+            return None
+        return self._generations[feed], self._rates[feed]
+
+    async def load_tables(self, feed: str,
+                          generation: str) -> dict[str, dict[str, str]]:
+        """Read all packed rates of a generation from Redis."""
+        keys = [key async for key in redis_client.scan_iter(
+            match=self.RATES_KEY.format(exchanger=self.EXCHANGER, type=feed,
+                                        generation=generation, from_coin='*'),
+            count=1000)]
+        async with redis_client.pipeline(transaction=False) as pipe:
+            for key in keys:
+                pipe.hgetall(key)
+            tables = await pipe.execute()
+        return {key.split(':')[3]: table for key, table in zip(keys, tables)}
+
+    async def _resync(self, feed: str) -> None:
+        changes_key = self.CHANGES_KEY.format(exchanger=self.EXCHANGER,
+                                              type=feed)
+        last = await redis_client.xrevrange(changes_key, count=1)
+        generation = await redis_client.get(
+            self.GENERATION_KEY.format(exchanger=self.EXCHANGER, feed=feed))
+        if generation is None:
+            return
+
+        self._rates[feed] = await self.load_tables(feed, generation)
+        self._generations[feed] = int(generation)
+        self._last_ids[feed] = last[0][0] if last else '0-0'
+        if last and int(last[0][1]['generation']) == int(generation):
+            self._published_at[feed] = float(last[0][1]['published_at'])
+        self.resyncs += 1
+        logger.info('Rate replica %s reloaded at generation %s: %s',
+                    feed, generation, self.get_stats())
+
+    def _apply(self, feed: str, fields: dict) -> None:
+        generation = int(fields['generation'])
+        current = self._generations[feed]
+        if fields['full'] != '1' and generation <= current:
+            return
+        if fields['full'] == '1' or int(fields['previous']) != current:
+            logger.info('Rate replica %s gap at generation %s, reloading',
+                        feed, generation)
+            del self._generations[feed]
+            return
+
+        table = self._rates[feed]
+        for from_code, rates in json.loads(fields['changed']).items():
+            table.setdefault(from_code, {}).update(rates)
+        for from_code, to_code in json.loads(fields['removed']):
+            table.get(from_code, {}).pop(to_code, None)
+        self._generations[feed] = generation
+        self._published_at[feed] = float(fields['published_at'])
+        self._lag[feed] = time.time() - self._published_at[feed]
+        self.applied += 1
+
+    async def _check_generations(self) -> None:
+        """Reload feeds whose published generation moved without deltas.
+
+        This catches a stream that was trimmed or recreated, e.g. after a
+        Redis restart, which a blocking read would otherwise wait on.
+        """
+        for feed in self.FEEDS:
+            if not self.is_ready(feed):
+                continue
+            generation = await redis_client.get(
+                self.GENERATION_KEY.format(exchanger=self.EXCHANGER,
+                                           feed=feed))
+            current = self._generations[feed]
+            if generation is None or int(generation) != current:
+                logger.info('Rate replica %s is behind generation %s, '
+                            'reloading', feed, generation)
+                del self._generations[feed]
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                for feed in self.FEEDS:
+                    if not self.is_ready(feed):
+                        await self._resync(feed)
+                streams = {
+                    self.CHANGES_KEY.format(exchanger=self.EXCHANGER,
+                                            type=feed): self._last_ids[feed]
+                    for feed in self.FEEDS if self.is_ready(feed)
+                }
+                if not streams:
+                    await asyncio.sleep(config.RATE_REPLICA_BLOCK_MS / 1000)
+                    continue
+                response = await redis_client.xread(
+                    streams, block=config.RATE_REPLICA_BLOCK_MS)
+                if not response:
+                    await self._check_generations()
+                for stream, entries in response:
+                    feed = stream.split(':')[1]
+                    for entry_id, fields in entries:
+                        self._last_ids[feed] = entry_id
+                        if self.is_ready(feed):
+                            self._apply(feed, fields)
+            except Exception as e:
+                logger.error('Rate replica error, reloading: %s', e,
+                             exc_info=True)
+                self._generations.clear()
+                await asyncio.sleep(5)
+
+
+rate_replica = RateReplica()
@@ -0,0 +1,186 @@
+import logging
+import mmap
+import os
+import struct
+import time
+from bisect import bisect_left
+from decimal import Decimal
+
+from src.api.ffio import schemas
+from src.config import config
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b'FFRS'
+VERSION = 3
+# magic, version, generation, published_at, codes, pairs, codes blob size,
+# overflow rates, overflow blob size
+HEADER = struct.Struct('<4sHxxQdIIIII')
+DECIMAL_FIELDS = 9
+TOFEE_SAME = -1
+EXPONENT_NONE = -128
+NO_OVERFLOW = -1
+ALIGNMENT = 8
+
+
+def _align(offset: int) -> int:
+    return offset + (-offset % ALIGNMENT)
+
+
+class RatesSnapshot:
+    """Read-only, memory-mapped rates snapshot written by the loader.
+
+    See ``exchangers/src/loaders/rates_snapshot.py`` for the layout.
+    Only the code table is decoded on open; columns are read straight
+    from the mapping, which all bot processes on the host share.
+    """
+
+    def __init__(self, path: str) -> None:
+        with open(path, 'rb') as file:
+            self._mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(self._mmap)
+        (magic, version, self.generation, self.published_at, codes, pairs,
+         blob_size, overflow, overflow_size) = HEADER.unpack_from(view)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f'{path} is not a rates snapshot v{VERSION}')
+        self._offset = _align(HEADER.size)
+
+        code_offsets = self._take(view, 'I', 4, codes + 1)
+        blob = self._take(view, 'B', 1, blob_size)
+        self._codes = [
+            str(blob[code_offsets[i]:code_offsets[i + 1]], 'utf-8')
+            for i in range(codes)
+        ]
+        self._index = {code: i for i, code in enumerate(self._codes)}
+        self._first_rows = self._take(view, 'I', 4, codes + 1)
+        self._to = self._take(view, 'I', 4, pairs)
+        self._tofee_currency = self._take(view, 'i', 4, pairs)
+        self._overflow = self._take(view, 'i', 4, pairs)
+        self._overflow_offsets = self._take(view, 'I', 4, overflow + 1)
+        self._overflow_blob = self._take(view, 'B', 1, overflow_size)
+        self._columns = [
+            (self._take(view, 'q', 8, pairs), self._take(view, 'b', 1, pairs))
+            for _ in range(DECIMAL_FIELDS)
+        ]
+        self.pairs = pairs
+
+    def _take(self, view: memoryview, fmt: str, size: int,
+              count: int) -> memoryview:
+        section = view[self._offset:self._offset + size * count].cast(fmt)
+        self._offset = _align(self._offset + size * count)
+        return section
+
+    def get_rate(self, from_code: str,
+                 to_code: str) -> schemas.RatesSchema | None:
+        from_index = self._index.get(from_code)
+        to_index = self._index.get(to_code)
+        if from_index is None or to_index is None:
+            return None
+        first = self._first_rows[from_index]
+        last = self._first_rows[from_index + 1]
+        row = bisect_left(self._to, to_index, first, last)
+        if row == last or self._to[row] != to_index:
+            return None
+        overflow = self._overflow[row]
+        if overflow != NO_OVERFLOW:
+            return schemas.RatesSchema.unpack(from_code, to_code, str(
+                self._overflow_blob[self._overflow_offsets[overflow]:
+                                    self._overflow_offsets[overflow + 1]],
+                'utf-8'))
+
+        values = []
+        for mantissas, exponents in self._columns:
+            exponent = exponents[row]
+            values.append(None if exponent == EXPONENT_NONE
+                          else Decimal(f'{mantissas[row]}E{exponent}'))
+        tofee_currency = self._tofee_currency[row]
+        (in_amount, out_amount, amount, tofee, min_amount, max_amount,
+         *quote) = values
+        return schemas.RatesSchema.from_values(
+            from_code, to_code, in_amount, out_amount, amount, tofee,
+            to_code if tofee_currency == TOFEE_SAME
+            else self._codes[tofee_currency],
+            min_amount, max_amount, *quote
+        )
+
+
+class RatesSnapshots:
+    """Snapshots of all rate feeds, swapped when the loader replaces them.
+
+    The file of a feed is checked at most every ``GENERATION_CACHE_TTL``
+    seconds and remapped when its inode or mtime changed. The previous
+    mapping is only dropped, so lookups still holding it finish safely.
+
+    The loader may publish from another host, leaving this host's file
+    behind for good, so a snapshot is only served while ``is_current()``
+    finds it at the published generation and younger than
+    ``RATES_SNAPSHOT_MAX_AGE`` seconds.
+    """
+
+    EXCHANGER = 'ffio'
+
+    def __init__(self, directory: str | None) -> None:
+        self.directory = directory
+        self._snapshots: dict[str, RatesSnapshot] = {}
+        self._versions: dict[str, tuple[int, int]] = {}
+        self._checked_at: dict[str, float] = {}
+        # Generation of the last snapshot reported stale, per feed.
+        self._stale: dict[str, int] = {}
+
+    def _path(self, feed: str) -> str:
+        return os.path.join(self.directory, f'{self.EXCHANGER}_{feed}.rates')
+
+    def get(self, feed: str) -> RatesSnapshot | None:
+        if not self.directory:
+            return None
+        now = time.monotonic()
+        if now - self._checked_at.get(feed, 0) >= config.GENERATION_CACHE_TTL:
+            self._checked_at[feed] = now
+            self._refresh(feed)
+        return self._snapshots.get(feed)
+
+    def _refresh(self, feed: str) -> None:
+        path = self._path(feed)
+        try:
+            stat = os.stat(path)
+            version = (stat.st_ino, stat.st_mtime_ns)
+            if version != self._versions.get(feed):
+                self._snapshots[feed] = RatesSnapshot(path)
+                self._versions[feed] = version
+                logger.info('Rates snapshot %s mapped at generation %s',
+                            feed, self._snapshots[feed].generation)
+        except (OSError, ValueError, struct.error) as e:
+            if feed in self._snapshots:
+                logger.error('Rates snapshot %s is unavailable: %s', feed, e)
+            self._snapshots.pop(feed, None)
+            self._versions.pop(feed, None)
+
+    def is_current(self, feed: str, generation: str | None) -> bool:
+        """Check that the snapshot of a feed may serve rates.
+
+        ``generation`` is the published generation pointer of the feed,
+        None if it could not be read.
+        """
+        snapshot = self.get(feed)
+        if snapshot is None:
+            return False
+        behind = (generation is not None
+                  and int(generation) > snapshot.generation)
+        age = time.time() - snapshot.published_at
+        if not behind and age <= config.RATES_SNAPSHOT_MAX_AGE:
+            self._stale.pop(feed, None)
+            return True
+        if self._stale.get(feed) != snapshot.generation:
+            self._stale[feed] = snapshot.generation
+            logger.warning('Rates snapshot %s is stale at generation %s '
+                           '(published %s, age %.0fs), reading Redis',
+                           feed, snapshot.generation, generation, age)
+        return False
+
+    def get_rate(self, feed: str, from_code: str,
+                 to_code: str) -> schemas.RatesSchema | None:
+        snapshot = self.get(feed)
+        return snapshot.get_rate(from_code, to_code) if snapshot else None
+
+
+rates_snapshots = RatesSnapshots(config.RATES_SNAPSHOT_DIR)
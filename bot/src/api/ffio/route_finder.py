@@ -0,0 +1,139 @@
+import base64
+import math
+from dataclasses import dataclass
+
+import numpy as np
+
+
+@dataclass(frozen=True)
+class Route:
+    """Best path between two codes and its estimated output."""
+
+    codes: tuple[str, ...]
+    # Output for the requested amount, or the product of the leg rates
+    # when no amount was given. Floats are only used to pick the route;
+    # amounts shown to users are recomputed from the legs' rates.
+    estimate: float
+
+    @property
+    def via(self) -> tuple[str, ...]:
+        return self.codes[1:-1]
+
+
+class RateGraph:
+    """Rate graph of one rates generation, held in NumPy arrays.
+
+    The loader publishes the graph of every generation as route tables
+    (``build_route_tables`` in the exchangers loader): every rate is an
+    edge with its ``out / in`` ratio, its ``-log`` as the weight, ``tofee``
+    and ``min``/``max`` limits in the from-currency, sorted by from-node
+    with a CSR offset array. A dense node matrix maps (from, to) to an
+    edge, so a query only touches the out-edges of the from-node: a
+    vectorised 1-2 hop search.
+    """
+
+    INDEX_DTYPE = '<i4'
+    VALUE_DTYPE = '<f8'
+
+    def __init__(self, tables: dict[str, str]) -> None:
+        codes = tables['codes'].split()
+        self.codes = codes
+        self.index = {code: i for i, code in enumerate(codes)}
+
+        self.offsets = self._decode(tables['offsets'], self.INDEX_DTYPE)
+        self.dst = self._decode(tables['dst'], self.INDEX_DTYPE)
+        self.ratio = self._decode(tables['ratio'], self.VALUE_DTYPE)
+        self.weight = self._decode(tables['weight'], self.VALUE_DTYPE)
+        self.fee = self._decode(tables['fee'], self.VALUE_DTYPE)
+        self.min_amount = self._decode(tables['min'], self.VALUE_DTYPE)
+        self.max_amount = self._decode(tables['max'], self.VALUE_DTYPE)
+
+        nodes = len(codes)
+        self.src = np.repeat(np.arange(nodes, dtype=np.int32),
+                             np.diff(self.offsets))
+        self.edge = np.full((nodes, nodes), -1, dtype=np.int32)
+        self.edge[self.src, self.dst] = np.arange(self.dst.size,
+                                                  dtype=np.int32)
+
+    @staticmethod
+    def _decode(values: str, dtype: str) -> np.ndarray:
+        return np.frombuffer(base64.b64decode(values), dtype=dtype)
+
+    def find_route(self, from_code: str, to_code: str,
+                   amount: float | None = None) -> Route | None:
+        """Find the best direct or one-stop route.
+
+        With an ``amount`` the route maximises the output after fees and
+        respects every leg's limits. Without it, only one-stop routes
+        that some amount within the first leg's limits can take through
+        the second leg's are considered, ranked by the sum of log-rates.
+        """
+        start = self.index.get(from_code)
+        end = self.index.get(to_code)
+        if start is None or end is None or start == end:
+            return None
+        if amount is None:
+            return self._best_by_rate(start, end)
+        return self._best_by_amount(start, end, amount)
+
+    def _two_hops(self, start: int,
+                  end: int) -> tuple[np.ndarray, np.ndarray]:
+        """Return the first and second edges of every one-stop route."""
+        first = np.arange(self.offsets[start], self.offsets[start + 1])
+        first = first[self.dst[first] != end]
+        second = self.edge[self.dst[first], end]
+        valid = second >= 0
+        return first[valid], second[valid]
+
+    def _best_by_rate(self, start: int, end: int) -> Route | None:
+        best = None
+        direct = self.edge[start, end]
+        if direct >= 0 and not math.isinf(self.weight[direct]):
+            best = (self.weight[direct], (self.codes[start], self.codes[end]))
+
+        first, second = self._two_hops(start, end)
+        low = self.min_amount[first] * self.ratio[first] - self.fee[first]
+        high = self.max_amount[first] * self.ratio[first] - self.fee[first]
+        valid = ((high > 0) & (high > self.min_amount[second])
+                 & (low < self.max_amount[second]))
+        first, second = first[valid], second[valid]
+        weight = self.weight[first] + self.weight[second]
+        if weight.size:
+            i = int(np.argmin(weight))
+            if (not math.isinf(weight[i])
+                    and (best is None or weight[i] < best[0])):
+                best = (weight[i], (self.codes[start],
+                                    self.codes[self.dst[first[i]]],
+                                    self.codes[end]))
+        if best is None:
+            return None
+        return Route(best[1], math.exp(-best[0]))
+
+    def _best_by_amount(self, start: int, end: int,
+                        amount: float) -> Route | None:
+        best = None
+        direct = self.edge[start, end]
+        if direct >= 0 and self._within(direct, amount):
+            output = amount * self.ratio[direct] - self.fee[direct]
+            if output > 0:
+                best = Route((self.codes[start], self.codes[end]),
+                             float(output))
+
+        first, second = self._two_hops(start, end)
+        middle = amount * self.ratio[first] - self.fee[first]
+        valid = ((amount > self.min_amount[first])
+                 & (amount < self.max_amount[first])
+                 & (middle > self.min_amount[second])
+                 & (middle < self.max_amount[second]))
+        if not valid.any():
+            return best
+        first, middle, second = first[valid], middle[valid], second[valid]
+        output = middle * self.ratio[second] - self.fee[second]
+        i = int(np.argmax(output))
+        if output[i] > 0 and (best is None or output[i] > best.estimate):
+            best = Route((self.codes[start], self.codes[self.dst[first[i]]],
+                          self.codes[end]), float(output[i]))
+        return best
+
+    def _within(self, edge: int, amount: float) -> bool:
+        return self.min_amount[edge] < amount < self.max_amount[edge]
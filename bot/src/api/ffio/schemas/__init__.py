@@ -1,7 +1,8 @@
 # flake8: noqa: E401
-from .currencies_list import Currency
+from .currencies_list import CoinCode, Currency
 from .emergency import CreateEmergency, EmergencyChoice, EmergencyStatus
 from .order import (
     CreateOrder, CreateOrderDetails, Direction,
     OrderData, OrderStatus, OrderType)
+from .rate_history import RateBucket, RatePoint
 from .rates import RatesSchema
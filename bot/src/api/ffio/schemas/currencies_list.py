@@ -1,4 +1,4 @@
-from typing import Optional
+from typing import ClassVar, Optional
 
 from pydantic import BaseModel, HttpUrl
 
@@ -14,3 +14,25 @@ class Currency(BaseModel):
     logo: HttpUrl
     color: str
     priority: int
+
+
+class CoinCode(BaseModel):
+    """Exchange code and availability of a coin on a network."""
+
+    code: str
+    recv: bool
+    send: bool
+    tag: Optional[str]
+
+    PACKED_SEPARATOR: ClassVar[str] = '|'
+
+    @classmethod
+    def unpack(cls, value: str) -> 'CoinCode':
+        """Build a coin code from packed storage without validation."""
+        code, recv, send, tag = value.split(cls.PACKED_SEPARATOR)
+        return cls.model_construct(
+            code=code,
+            recv=recv == '1',
+            send=send == '1',
+            tag=tag or None
+        )
@@ -0,0 +1,23 @@
+from datetime import datetime
+from decimal import Decimal
+
+from pydantic import BaseModel
+
+
+class RatePoint(BaseModel):
+    """Raw rate of a pair as written by one loader refresh."""
+
+    time: datetime
+    in_amount: Decimal
+    out_amount: Decimal
+    min_amount: Decimal
+    max_amount: Decimal
+
+
+class RateBucket(BaseModel):
+    """Min, max and last ``out / in`` rate of a pair within a bucket."""
+
+    start: datetime
+    min_rate: Decimal
+    max_rate: Decimal
+    last_rate: Decimal
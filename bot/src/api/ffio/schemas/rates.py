@@ -1,5 +1,5 @@
 from decimal import Decimal
-from typing import Optional
+from typing import ClassVar, Optional
 
 from pydantic import BaseModel, Field
 
@@ -16,23 +16,83 @@ class RatesSchema(BaseModel):
     tofee_currency: Optional[str] = None
     min_amount: Decimal = Field(..., alias='minamount')
     max_amount: Decimal = Field(..., alias='maxamount')
+    quote_rate: Optional[Decimal] = None
+    to_min_amount: Optional[Decimal] = None
+    to_max_amount: Optional[Decimal] = None
+
+    PACKED_SEPARATOR: ClassVar[str] = '|'
+
+    @classmethod
+    def unpack(cls, from_coin: str, to_coin: str,
+               value: str) -> 'RatesSchema':
+        """Build a rate from packed storage without validation.
+
+        The quote the loader appends after the rate fills the quote
+        fields: rate, to-min and to-max, None where the quote is empty.
+        """
+        (in_amount, out_amount, amount, tofee, tofee_currency,
+         min_amount, max_amount, *quote) = value.split(cls.PACKED_SEPARATOR)
+        return cls.from_values(
+            from_coin, to_coin, Decimal(in_amount), Decimal(out_amount),
+            Decimal(amount), Decimal(tofee) if tofee else None,
+            tofee_currency or to_coin, Decimal(min_amount),
+            Decimal(max_amount),
+            *(Decimal(field) if field else None for field in quote)
+        )
+
+    @classmethod
+    def from_values(cls, from_coin: str, to_coin: str, in_amount: Decimal,
+                    out_amount: Decimal, amount: Decimal,
+                    tofee: Optional[Decimal], tofee_currency: Optional[str],
+                    min_amount: Decimal, max_amount: Decimal,
+                    quote_rate: Optional[Decimal] = None,
+                    to_min_amount: Optional[Decimal] = None,
+                    to_max_amount: Optional[Decimal] = None
+                    ) -> 'RatesSchema':
+        """Build a rate from already validated values.
+
+        ``model_construct`` skips validation, as this runs on every quote.
+        """
+        return cls.model_construct(
+            from_coin=from_coin,
+            to_coin=to_coin,
+            in_amount=in_amount,
+            out_amount=out_amount,
+            amount=amount,
+            tofee=tofee,
+            tofee_currency=tofee_currency,
+            min_amount=min_amount,
+            max_amount=max_amount,
+            quote_rate=quote_rate,
+            to_min_amount=to_min_amount,
+            to_max_amount=to_max_amount,
+        )
 
     # ToDo - fix the bug with incorrect min and max ammounts
     def get_clean_out_amount(self, out_amount) -> Decimal:
-        return out_amount - self.tofee
+        return out_amount - (self.tofee or 0)
+
+    def get_rate(self) -> Decimal:
+        """Return the to-amount of one from-unit."""
+        return self.out_amount / self.in_amount
 
     def calculate_from_amount(self, to_amount: Decimal) -> Decimal:
-        diff = self.out_amount / self.in_amount
-        return to_amount / diff
+        return to_amount / self.get_rate()
 
     def calculate_to_amount(self, from_amount: Decimal) -> Decimal:
-        diff = self.out_amount / self.in_amount
-        return self.get_clean_out_amount(from_amount * diff)
+        """Compute the exact to-amount of an order from the raw rate."""
+        return self.get_clean_out_amount(from_amount * self.get_rate())
 
     def get_to_min_amount(self) -> Decimal:
+        """Return the loader's to-min estimate, or compute it."""
+        if self.to_min_amount is not None:
+            return self.to_min_amount
         return self.calculate_to_amount(self.min_amount)
 
     def get_to_max_amount(self) -> Decimal:
+        """Return the loader's to-max estimate, or compute it."""
+        if self.to_max_amount is not None:
+            return self.to_max_amount
         return self.calculate_to_amount(self.max_amount)
 
     def check_min_max_limits(self, direction: str, amount: Decimal) -> bool:
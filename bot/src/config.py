@@ -14,6 +14,19 @@ class Config(BaseSettings):
     REDIS_PORT: Optional[str] = '6379'
     REDIS_DATABASE: Optional[int] = 0
 
+    COIN_CACHE_SIZE: int = 4096
+    COIN_CACHE_TTL: float = 60
+    GENERATION_CACHE_TTL: float = 1
+    RATE_REPLICA_ENABLED: bool = True
+    RATE_REPLICA_BLOCK_MS: int = 5000
+    RATES_SNAPSHOT_DIR: Optional[str] = None
+    RATES_SNAPSHOT_MAX_AGE: float = 300
+    INLINE_RESULTS_LIMIT: int = 50
+    INLINE_CACHE_TIME: int = 5
+    ALERTS_PER_USER_LIMIT: int = 20
+    ALERTS_POLL_INTERVAL: float = 3
+    ALERTS_NOTIFY_BATCH_SIZE: int = 30
+
     class Config:
         env_file = '.env'
         env_file_encoding = 'utf-8'
@@ -37,6 +50,8 @@ class KeyboardCallbackData:
     EMERGENCY_REFUND = 'emergency_refund:'  # after goes transaction id
     EMERGENCY_RETRY_ADDRESS = 'retry_address:'
 
+    ALERT_DELETE = 'alert_delete:'  # after goes alert id
+
     FAQ = "faq"
     FAQ_QUESTION = "faq_question_"
 
@@ -1,6 +1,7 @@
 import importlib
 
-HANDLERS = ["start", "faq", 'exchange', 'inline_handler', 'emergency']
+HANDLERS = ["start", "faq", 'exchange', 'inline_handler', 'emergency',
+            'alerts']
 
 
 def init_handlers(dispatcher):
@@ -0,0 +1,164 @@
+import logging
+from decimal import Decimal, InvalidOperation
+
+from aiogram import Router, F
+from aiogram.filters import Command, CommandObject
+from aiogram.types import Message, CallbackQuery
+from sqlalchemy import func, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from src.api.ffio import ffio_redis_client as frc
+from src.config import config, KeyboardCallbackData
+from src.keyboards import alerts as alert_kbs
+from src.lang import Language
+from src.models import AlertDirections, PriceAlert, RateTypes, User
+from src.utils import format_message
+
+router = Router()
+
+logger = logging.getLogger(__name__)
+
+ALERT_DIRECTIONS = {'>': AlertDirections.ABOVE, '<': AlertDirections.BELOW}
+
+
+def format_decimal(value: Decimal) -> str:
+    return format(value.normalize(), 'f')
+
+
+def format_alert(lang: Language, alert: PriceAlert) -> dict:
+    return {
+        'from_currency': alert.from_currency,
+        'from_network': alert.from_currency_network,
+        'to_currency': alert.to_currency,
+        'to_network': alert.to_currency_network,
+        'direction': lang.alert.direction.get(alert.direction),
+        'threshold': format_decimal(alert.threshold),
+        'rate_type': alert.rate_type,
+    }
+
+
+async def get_active_alerts(session: AsyncSession,
+                            user_id) -> list[PriceAlert]:
+    result = await session.execute(
+        select(PriceAlert)
+        .where(PriceAlert.user_id == user_id,
+               PriceAlert.is_active.is_(True),
+               PriceAlert.is_triggered.is_(False))
+        .order_by(PriceAlert.created_on)
+    )
+    return result.scalars().all()
+
+
+def get_alerts_text(lang: Language, alerts: list[PriceAlert]) -> str:
+    if not alerts:
+        return lang.alert.empty
+    return format_message(lang.alert.list, alerts='\n'.join(
+        format_message(lang.alert.list_item, number=number,
+                       **format_alert(lang, alert))
+        for number, alert in enumerate(alerts, start=1)
+    ))
+
+
+@router.message(Command('alert'))
+async def create_alert(message: Message, command: CommandObject, user: User,
+                       lang: Language, session: AsyncSession):
+    args = (command.args or '').split()
+    if len(args) == 6:
+        args.append(RateTypes.FLOAT)
+    if (len(args) != 7 or args[4] not in ALERT_DIRECTIONS
+            or args[6].lower() not in RateTypes.CHOICES):
+        await message.answer(lang.alert.usage)
+        return
+    from_currency, from_network, to_currency, to_network = (
+        arg.upper() for arg in args[:4])
+    direction = ALERT_DIRECTIONS[args[4]]
+    rate_type = args[6].lower()
+    try:
+        threshold = Decimal(args[5])
+    except InvalidOperation:
+        threshold = None
+    if threshold is None or not threshold.is_finite() or threshold <= 0:
+        await message.answer(lang.alert.usage)
+        return
+
+    from_code = await frc.get_coin_code(from_currency, from_network)
+    to_code = await frc.get_coin_code(to_currency, to_network)
+    if (from_code is None or to_code is None
+            or from_code.code == to_code.code):
+        await message.answer(lang.alert.incorrect_pair)
+        return
+    rate = await frc.get_fixed_rate(
+        from_currency, from_network, to_currency, to_network
+    ) if rate_type == RateTypes.FIXED else await frc.get_float_rate(
+        from_currency, from_network, to_currency, to_network)
+    if rate is None:
+        await message.answer(lang.alert.pair_unavailable)
+        return
+    current = rate.out_amount / rate.in_amount
+    if (current >= threshold if direction == AlertDirections.ABOVE
+            else current <= threshold):
+        await message.answer(format_message(
+            lang.alert.already_reached, from_currency=from_currency,
+            to_currency=to_currency, rate=format_decimal(current)))
+        return
+
+    active = await session.scalar(
+        select(func.count(PriceAlert.id))
+        .where(PriceAlert.user_id == user.id,
+               PriceAlert.is_active.is_(True),
+               PriceAlert.is_triggered.is_(False))
+    )
+    if active >= config.ALERTS_PER_USER_LIMIT:
+        await message.answer(format_message(
+            lang.alert.limit, limit=config.ALERTS_PER_USER_LIMIT))
+        return
+
+    alert = PriceAlert(
+        user_id=user.id,
+        rate_type=rate_type,
+        from_currency=from_currency,
+        from_currency_network=from_network,
+        to_currency=to_currency,
+        to_currency_network=to_network,
+        from_code=from_code.code,
+        to_code=to_code.code,
+        direction=direction,
+        threshold=threshold,
+    )
+    text = format_message(lang.alert.created, **format_alert(lang, alert))
+    session.add(alert)
+    await session.commit()
+    await message.answer(text)
+
+
+@router.message(Command('alerts'))
+async def list_alerts(message: Message, user: User, lang: Language,
+                      session: AsyncSession):
+    alerts = await get_active_alerts(session, user.id)
+    await message.answer(get_alerts_text(lang, alerts),
+                         reply_markup=alert_kbs.get_alerts_kb(lang, alerts))
+
+
+@router.callback_query(F.data.startswith(KeyboardCallbackData.ALERT_DELETE))
+async def delete_alert(query: CallbackQuery, user: User, lang: Language,
+                       session: AsyncSession):
+    alert_id = query.data.removeprefix(KeyboardCallbackData.ALERT_DELETE)
+    user_id = user.id
+    try:
+        await session.execute(
+            update(PriceAlert)
+            .where(PriceAlert.id == alert_id,
+                   PriceAlert.user_id == user_id)
+            .values(is_active=False)
+        )
+        await session.commit()
+    except Exception as e:
+        logger.error(f'Error deleting alert {alert_id}: {e}', exc_info=True)
+        await session.rollback()
+        return
+    alerts = await get_active_alerts(session, user_id)
+    await query.answer(lang.alert.deleted)
+    await query.message.edit_text(
+        get_alerts_text(lang, alerts),
+        reply_markup=alert_kbs.get_alerts_kb(lang, alerts))
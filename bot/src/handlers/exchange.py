@@ -163,10 +163,8 @@ async def select_network_from(message: Message, lang: Language,
     network = message.text
 
     if network in networks:
-        currency_info = await frc.get_coin_full_info(
-            currency, network
-        )
-        if not currency_info.recv:
+        currency_info = await frc.get_coin_code(currency, network)
+        if not currency_info or not currency_info.recv:
             await message.answer(lang.exchange.tech_workings,
                                  reply_markup=exchange_kbs.get_search_kb(lang))
             await state.set_state(ExchangeForm.currency_from)
@@ -195,6 +193,15 @@ async def select_currency_to(message: Message, lang: Language,
     currency = message.text
     if currency in currencies:
         networks = await frc.get_networks(currency)
+        data = await state.get_data()
+        reachable = await frc.get_reachable_networks(
+            data.get('rate_type'), data.get('currency_from'),
+            data.get('currency_from_network'), currency, networks)
+        if reachable is not None:
+            if not reachable:
+                await message.answer(lang.exchange.pair_unavailable)
+                return
+            networks = reachable
         await state.update_data(currency_to=currency)
         await state.set_state(ExchangeForm.currency_to_network)
         await message.answer(
@@ -207,6 +214,34 @@ async def select_currency_to(message: Message, lang: Language,
         await message.answer(lang.exchange.incorrect_currency)
 
 
+async def get_from_amount(state: FSMContext) -> Decimal | None:
+    """Return the from-amount the user entered, if it is known yet."""
+    data = await state.get_data()
+    if (data.get('exchange_direction') != DirectionTypes.FROM
+            or data.get('amount_value') is None):
+        return None
+    try:
+        return Decimal(data['amount_value'])
+    except InvalidOperation:
+        return None
+
+
+async def get_pair_unavailable_text(
+        lang: Language, rate_type: str, currency_from: str, network_from: str,
+        currency_to: str, network_to: str,
+        amount: Decimal | None = None) -> str:
+    route = await frc.find_route(rate_type, currency_from, network_from,
+                                 currency_to, network_to, amount)
+    if route is None or not route.via:
+        return lang.exchange.pair_unavailable
+    coins = await frc.get_coins_by_code()
+    via = coins.get(route.via[0])
+    if via is None:
+        return lang.exchange.pair_unavailable
+    return format_message(lang.exchange.pair_unavailable_route,
+                          via_coin=via[0], via_network=via[1])
+
+
 @router.message(ExchangeForm.currency_to_network)
 async def select_network_to(message: Message, lang: Language,
                             state: FSMContext):
@@ -219,10 +254,17 @@ async def select_network_to(message: Message, lang: Language,
         if currency_from == currency and network == network_from:
             await message.answer(lang.exchange.same_currency_error)
             return
-        currency_info = await frc.get_coin_full_info(
-            currency, network
-        )
-        if not currency_info.send:
+        supported = await frc.is_pair_supported(
+            await state.get_value('rate_type'), currency_from, network_from,
+            currency, network)
+        if supported is False:
+            await message.answer(await get_pair_unavailable_text(
+                lang, await state.get_value('rate_type'), currency_from,
+                network_from, currency, network,
+                await get_from_amount(state)))
+            return
+        currency_info = await frc.get_coin_code(currency, network)
+        if not currency_info or not currency_info.send:
             await message.answer(lang.exchange.tech_workings,
                                  reply_markup=exchange_kbs.get_search_kb(lang))
             await state.set_state(ExchangeForm.currency_to)
@@ -289,8 +331,8 @@ async def select_wallet(message: Message, lang: Language, state: FSMContext):
     if wallet:
         await state.update_data(wallet_address=wallet)
 
-        coin = await frc.get_coin_full_info(currency_to, network_to)
-        if coin.tag is not None:
+        coin = await frc.get_coin_code(currency_to, network_to)
+        if coin and coin.tag is not None:
             await state.set_state(ExchangeForm.tag)
             await state.update_data(tag_name=coin.tag)
             await message.answer(
@@ -6,6 +6,7 @@ from aiogram.types import (InlineQueryResultArticle,
                            InputTextMessageContent)
 
 from src.api.ffio import ffio_redis_client as frc
+from src.config import config
 from src.states import ExchangeForm
 
 router = Router()
@@ -15,6 +16,7 @@ router = Router()
 async def inline_query_handler(inline_query: types.InlineQuery, bot: Bot,
                                state: FSMContext):
     results = []
+    next_offset = None
 
     current_state = await state.get_state()
     data = await state.get_data()
@@ -36,21 +38,34 @@ async def inline_query_handler(inline_query: types.InlineQuery, bot: Bot,
             )
     elif current_state in [ExchangeForm.currency_to,
                            ExchangeForm.currency_from]:
-        user_query = (inline_query.query or '').lower()
-        currencies = await frc.get_coins()
-        if user_query:
-            currencies = [
-                currency for currency in currencies if currency.lower().startswith(user_query) # noqa
-            ]
-        for currency in currencies:
-            results.append(
-                InlineQueryResultArticle(
-                    id=str(uuid4()),
-                    title=currency,
-                    input_message_content=InputTextMessageContent(
-                        message_text=currency
+        index = await frc.get_search_index()
+        allowed = None
+        if current_state == ExchangeForm.currency_to:
+            allowed = await frc.get_reachable_coins(
+                data.get('rate_type'), data.get('currency_from'),
+                data.get('currency_from_network'))
+        if index is not None:
+            offset = int(inline_query.offset or 0)
+            coins, next_offset = index.search(
+                inline_query.query or '', offset,
+                config.INLINE_RESULTS_LIMIT, allowed)
+            for coin in coins:
+                results.append(
+                    InlineQueryResultArticle(
+                        id=coin.coin,
+                        title=coin.coin,
+                        description=coin.name,
+                        input_message_content=InputTextMessageContent(
+                            message_text=coin.coin
+                        )
                     )
                 )
-            )
 
-    await bot.answer_inline_query(inline_query.id, results, cache_time=0)
+    # Results depend on the user's exchange step, so they are cached per
+    # user and only for a few seconds.
+    await bot.answer_inline_query(
+        inline_query.id, results,
+        cache_time=config.INLINE_CACHE_TIME,
+        is_personal=True,
+        next_offset=str(next_offset) if next_offset else ''
+    )
@@ -1,3 +1,4 @@
 import src.keyboards.main as main
 import src.keyboards.faq as faq
-import src.keyboards.exchange as exchange
\ No newline at end of file
+import src.keyboards.exchange as exchange
+import src.keyboards.alerts as alerts
\ No newline at end of file
@@ -0,0 +1,15 @@
+from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
+
+from src.lang import Language
+from src.models import PriceAlert
+from src.utils import format_message
+from src.config import KeyboardCallbackData
+
+
+def get_alerts_kb(lang: Language, alerts: list[PriceAlert]):
+    return InlineKeyboardMarkup(inline_keyboard=[
+        [InlineKeyboardButton(
+            text=format_message(lang.keyboard.alert.delete, number=number),
+            callback_data=f'{KeyboardCallbackData.ALERT_DELETE}{alert.id}')]
+        for number, alert in enumerate(alerts, start=1)
+    ])
@@ -3,13 +3,19 @@ from pathlib import Path
 
 
 class AttrGenerator:
-    def __init__(self, data):
+    def __init__(self, data, base=None):
         self.__data = data
+        # Same section of the base language, for keys missing from data.
+        self.__base = base or {}
 
     def __getattr__(self, attr, default=None):
-        result = self.__data.get(attr, default)
+        base = self.__base.get(attr)
+        result = self.__data.get(attr) or base
+        if result is None:
+            return default
         if type(result) == dict:
-            return self.__class__(result)
+            return self.__class__(result,
+                                  base if isinstance(base, dict) else None)
         return result
 
     def get(self, attr, default=None):
@@ -26,15 +32,15 @@ class Language:
         base_path = path / f'{self.__BASE_LANGUAGE}.json'
 
         with open(lang_path, 'r', encoding='utf-8') as lang_file:
-            replicas = AttrGenerator(json.load(lang_file))
+            replicas = json.load(lang_file)
         with open(base_path, 'r', encoding='utf-8') as base_file:
-            base_replicas = AttrGenerator(json.load(base_file))
+            base_replicas = json.load(base_file)
 
-        self.__replicas = replicas
-        self.__base_replicas = base_replicas
+        # Keys missing from a section fall back to the base language.
+        self.__replicas = AttrGenerator(replicas, base_replicas)
 
     def __getattr__(self, attr):
-        return self.__replicas.get(attr) or self.__base_replicas.get(attr)
+        return self.__replicas.get(attr)
 
     def get(self, path):
         result = self
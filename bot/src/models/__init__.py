@@ -3,6 +3,7 @@ from sqlalchemy.ext.asyncio import AsyncEngine
 
 from .transaction import (DirectionTypes,  EmergencyChoices, EmergencyStatuses,
                           RateTypes, Transaction, TransactionStatuses)
+from .price_alert import AlertDirections, PriceAlert
 from .user import User
 from src.database import BaseModel
 
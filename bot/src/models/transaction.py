@@ -1,9 +1,10 @@
 from sqlalchemy import (Boolean, Column, DateTime, DECIMAL, Enum, ForeignKey,
-                        Integer, String, Text)
+                        Index, Integer, String, Text)
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.future import select
 from sqlalchemy.inspection import inspect
 from sqlalchemy.orm import relationship
+from sqlalchemy.sql import text
 
 from src.database import BaseModel
 from src.utils.random import generate_unique_name
@@ -53,6 +54,15 @@ class TransactionStatuses:
 
 class Transaction(BaseModel):
     __tablename__ = 'transaction'
+    __table_args__ = (
+        Index('ix_transaction_new', 'created_on',
+              postgresql_where=text(f"status = '{TransactionStatuses.NEW}'")),
+        Index('ix_transaction_active', 'id',
+              postgresql_where=text(
+                  f"status NOT IN ('{TransactionStatuses.NEW}', "
+                  f"'{TransactionStatuses.DONE}', "
+                  f"'{TransactionStatuses.ERROR}')")),
+    )
     # Transaction meta-data
     name = Column(String(6), unique=True, nullable=False)
     status_code = Column(Integer(), nullable=True)
@@ -137,6 +147,12 @@ class Transaction(BaseModel):
     emergency_tag_value = Column(String(512), nullable=True)
     made_emergency_action = Column(Boolean(), nullable=True, default=True) # Use for error address or other problems # noqa
 
+    # 1.5 Claim by a transactions service worker
+    claimed_by = Column(String(255), nullable=True)
+    lease_expires_at = Column(DateTime, nullable=True)
+    # Set just before the ff.io order is created, to never create it twice
+    create_started_at = Column(DateTime, nullable=True)
+
     user = relationship('User', lazy='joined')
 
     def set_emergency_statuses(self, statuses: list[str]) -> bool:
@@ -20,31 +20,77 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
-async def run_task(task, task_id):
-    try:
-        await task
-    except Exception as e:
-        logger.error(f'Task {task_id} failed with error: {e}', exc_info=True)
+# Seconds between the stats logged by the main loop.
+STATS_INTERVAL = 60
 
 
-async def main():
+def log_stats(loader, scheduler, election) -> None:
+    logger.info(f'Leader election: {election.get_stats()}')
+    if scheduler is None:
+        return
+    logger.info(f'Feeds: {scheduler.get_stats()}, Refreshes: '
+                f'{dict(loader.refresh_stats)}, FFIO pool stats: '
+                f'{loader.api_client.get_pool_stats()}')
+    if loader.history:
+        logger.info(f'Rate history writes: {dict(loader.history.stats)}')
+    if loader.alerts:
+        logger.info(f'Price alert evaluations: {dict(loader.alerts.stats)}')
+
+
+async def wait_logging(aws, loader, scheduler, election) -> None:
+    """Wait for the first of ``aws`` to finish, logging stats meanwhile."""
     while True:
+        done, _ = await asyncio.wait(aws, timeout=STATS_INTERVAL,
+                                     return_when=asyncio.FIRST_COMPLETED)
         try:
-            tasks = ffio_load_tasks.get_tasks()
+            log_stats(loader, scheduler, election)
+        except Exception as e:
+            logger.error(f'Failed to log stats: {e}', exc_info=True)
+        if done:
+            return
 
-            if not tasks:
-                logger.info('No tasks to execute.')
-            else:
-                await asyncio.gather(
-                    *(run_task(task, idx) for idx, task in enumerate(
-                        tasks, start=1))
-                )
 
-            logger.info('Finished loading tasks.')
-        except Exception as e:
-            logger.error(f'Unexpected error in main loop: {e}', exc_info=True)
+async def lead(loader, election) -> None:
+    """Refresh the feeds until the leadership is lost."""
+    loader.reset()
+    loader.fencing_token = election.token
+    scheduler = ffio_load_tasks.get_scheduler()
+    scheduling = asyncio.create_task(scheduler.run())
+    deposed = asyncio.create_task(election.deposed.wait())
+    try:
+        await wait_logging([scheduling, deposed], loader, scheduler,
+                           election)
+        if scheduling.done():
+            await scheduling
+    finally:
+        loader.fencing_token = None
+        for task in (scheduling, deposed):
+            task.cancel()
+        await asyncio.gather(scheduling, deposed, return_exceptions=True)
+
 
-        await asyncio.sleep(10)
+async def main():
+    loader = ffio_load_tasks.loader
+    election = ffio_load_tasks.get_election()
+    # Followers keep the loader started, so a takeover starts refreshing
+    # with warm connections.
+    await loader.start()
+    electing = asyncio.create_task(election.run())
+    try:
+        while not electing.done():
+            elected = asyncio.create_task(election.elected.wait())
+            try:
+                await wait_logging([electing, elected], loader, None,
+                                   election)
+            finally:
+                elected.cancel()
+            if election.is_leader:
+                await lead(loader, election)
+        await electing
+    finally:
+        electing.cancel()
+        await asyncio.gather(electing, return_exceptions=True)
+        await loader.close()
 
 
 if __name__ == '__main__':
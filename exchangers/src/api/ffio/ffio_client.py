@@ -3,30 +3,134 @@ import hashlib
 import hmac
 import json
 import logging
-from decimal import Decimal
-from typing import Optional
+import tempfile
+from dataclasses import dataclass
+from typing import IO, AsyncIterator, Optional
+from xml.etree.ElementTree import ParseError
 
 import aiohttp
-import xmltodict
 from aiohttp import ClientError, ClientTimeout
 from pydantic import BaseModel
 
 from . import schemas, constants as c
+from .rates_parser import RatesXMLParser
 from src.api import exceptions as ex
 from src.config import config
 
 logger = logging.getLogger(__name__)
 
 
+@dataclass
+class FeedVersion:
+    """Validators and content hash of the last loaded copy of a feed."""
+
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    content_hash: Optional[str] = None
+
+
 class FFIOClient:
     RESP_OK = 0
     FIXED_RATES_URL = 'https://ff.io/rates/fixed.xml'
     FLOAT_RATES_URL = 'https://ff.io/rates/float.xml'
+    FIXED_FEED = 'fixed'
+    FLOAT_FEED = 'float'
+    CURRENCIES_FEED = 'ccies'
 
-    def __init__(self, key: str, secret: str, timeout: int = 10) -> None:
+    def __init__(
+            self, key: str, secret: str, timeout: int = 10,
+            limit_per_host: int = config.FFIO_POOL_LIMIT_PER_HOST,
+            keepalive_timeout: int = config.FFIO_POOL_KEEPALIVE_TIMEOUT,
+            dns_cache_ttl: int = config.FFIO_POOL_DNS_CACHE_TTL,
+            rates_chunk_size: int = config.FFIO_RATES_CHUNK_SIZE) -> None:
         self.key = key
         self.secret = secret
         self.timeout = ClientTimeout(total=timeout)
+        self.limit_per_host = limit_per_host
+        self.keepalive_timeout = keepalive_timeout
+        self.dns_cache_ttl = dns_cache_ttl
+        self.rates_chunk_size = rates_chunk_size
+        self.feed_versions: dict[str, FeedVersion] = {}
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._stats = {
+            'requests': 0,
+            'connections_created': 0,
+            'connections_reused': 0,
+            'dns_cache_hits': 0,
+            'dns_cache_misses': 0,
+        }
+        # Requests between their start and end trace hooks, i.e. the
+        # connections taken from the pool.
+        self._in_flight = 0
+
+    def _get_trace_config(self) -> aiohttp.TraceConfig:
+        trace_config = aiohttp.TraceConfig()
+
+        def count(stat: str):
+            async def on_event(session, context, params) -> None:
+                self._stats[stat] += 1
+            return on_event
+
+        async def on_request_start(session, context, params) -> None:
+            self._stats['requests'] += 1
+            self._in_flight += 1
+
+        async def on_request_done(session, context, params) -> None:
+            self._in_flight -= 1
+
+        trace_config.on_request_start.append(on_request_start)
+        trace_config.on_request_end.append(on_request_done)
+        trace_config.on_request_exception.append(on_request_done)
+        trace_config.on_connection_create_end.append(
+            count('connections_created'))
+        trace_config.on_connection_reuseconn.append(
+            count('connections_reused'))
+        trace_config.on_dns_cache_hit.append(count('dns_cache_hits'))
+        trace_config.on_dns_cache_miss.append(count('dns_cache_misses'))
+        return trace_config
+
+    async def start(self) -> None:
+        """Open the pooled session shared by all requests of the client."""
+        if self._session is not None and not self._session.closed:
+            return
+        connector = aiohttp.TCPConnector(
+            limit_per_host=self.limit_per_host,
+            keepalive_timeout=self.keepalive_timeout,
+            ttl_dns_cache=self.dns_cache_ttl,
+            use_dns_cache=True,
+        )
+        self._session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=self.timeout,
+            trace_configs=[self._get_trace_config()],
+        )
+        logger.info('FFIO client session opened '
+                    f'(limit_per_host={self.limit_per_host}, '
+                    f'keepalive_timeout={self.keepalive_timeout}, '
+                    f'dns_cache_ttl={self.dns_cache_ttl})')
+
+    async def close(self) -> None:
+        """Close the pooled session and release all kept-alive sockets."""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+            logger.info(f'FFIO client session closed. Stats: '
+                        f'{self.get_pool_stats()}')
+        self._session = None
+
+    async def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            await self.start()
+        return self._session
+
+    def get_pool_stats(self) -> dict:
+        """Return request counters and current connection pool usage."""
+        stats = dict(self._stats)
+        stats['acquired'] = self._in_flight
+        connector = self._session.connector if self._session else None
+        stats['limit'] = connector.limit if connector else None
+        stats['limit_per_host'] = (connector.limit_per_host if connector
+                                   else self.limit_per_host)
+        return stats
 
     def _sign(self, data: str) -> str:
         return hmac.new(self.secret.encode(), data.encode(),
@@ -34,6 +138,11 @@ class FFIOClient:
 
     async def _req(self, method: str,
                    data: Optional[BaseModel] = None) -> list[dict]:
+        _, result = await self._req_raw(method, data)
+        return result
+
+    async def _req_raw(self, method: str,
+                       data: Optional[BaseModel] = None) -> tuple[bytes, dict]:
         url = f'https://ff.io/api/v2/{method}'
         logger.info(f'Sending request to {url} with data: {data}')
         req = data.model_dump_json(by_alias=True) if data else json.dumps({})
@@ -45,72 +154,112 @@ class FFIOClient:
             'Content-Type': 'application/json; charset=UTF-8',
         }
 
-        async with aiohttp.ClientSession(timeout=self.timeout) as session:
-            retry_times = 1
-            while retry_times < c.RETRY_TIMES:
-                try:
-                    async with session.post(
-                            url, data=req, headers=headers) as response:
-                        result = await response.json()
-                        if result.get('code') == 429:
-                            logger.warning(
-                                f'Request limit exceeded. Retrying... ({result.get('msg')})') # noqa
-                            await asyncio.sleep(retry_times)
-                            retry_times += 1
-                            continue
-                        return result
-                except ClientError as e:
-                    raise ex.NetworkError('Network error occurred') from e
-                except asyncio.TimeoutError:
-                    raise ex.TimeoutError('Request timed out')
-                except json.JSONDecodeError as e:
-                    raise ex.DataProcessingError(
-                        'Failed to decode JSON response') from e
-            raise ex.MaximumRetriesError('Maximum retries happened.')
-
-    async def _get_rates(self, is_fixed=True) -> list[schemas.RatesSchema]:
+        session = await self._get_session()
+        retry_times = 1
+        while retry_times < c.RETRY_TIMES:
+            try:
+                async with session.post(
+                        url, data=req, headers=headers) as response:
+                    body = await response.read()
+                    result = json.loads(body)
+                    if result.get('code') == 429:
+                        logger.warning(
+                            f'Request limit exceeded. Retrying... ({result.get('msg')})') # noqa
+                        await asyncio.sleep(retry_times)
+                        retry_times += 1
+                        continue
+                    return body, result
+            except ClientError as e:
+                raise ex.NetworkError('Network error occurred') from e
+            except asyncio.TimeoutError:
+                raise ex.TimeoutError('Request timed out')
+            except json.JSONDecodeError as e:
+                raise ex.DataProcessingError(
+                    'Failed to decode JSON response') from e
+        raise ex.MaximumRetriesError('Maximum retries happened.')
+
+    async def fetch_rates(
+            self, is_fixed: bool = True
+    ) -> Optional[tuple[FeedVersion, AsyncIterator[schemas.RatesSchema]]]:
+        """Download a rate feed unless it is unchanged since the last load.
+
+        The request is conditional on the stored ETag/Last-Modified. The
+        body is hashed while it is spooled (to disk past one chunk), so an
+        unchanged feed is detected before any parsing. Returns ``None``
+        for an unchanged feed, otherwise the new version and an iterator
+        over the rates. Pass the version to :meth:`confirm_feed` once the
+        rates have been stored.
+        """
+        feed = self.FIXED_FEED if is_fixed else self.FLOAT_FEED
         url = self.FIXED_RATES_URL if is_fixed else self.FLOAT_RATES_URL
+        known = self.feed_versions.get(feed, FeedVersion())
+        headers = {}
+        if known.etag:
+            headers['If-None-Match'] = known.etag
+        if known.last_modified:
+            headers['If-Modified-Since'] = known.last_modified
+
+        spool = tempfile.SpooledTemporaryFile(max_size=self.rates_chunk_size)
+        content_hash = hashlib.sha256()
         try:
-            async with aiohttp.ClientSession(timeout=self.timeout) as session:
-                async with session.get(url) as response:
-                    xml_data = await response.text()
-                    dict_data = xmltodict.parse(xml_data)
-
-            rates = dict_data['rates']['item']
-            results = []
-            for rate in rates:
-                tofee, tofee_cur = rate.get('tofee', '0 None').split()
-                results.append(
-                    schemas.RatesSchema(
-                        from_coin=rate['from'],
-                        to=rate['to'],
-                        in_amount=Decimal(rate['in']),
-                        out=Decimal(rate['out']),
-                        amount=Decimal(rate['amount']),
-                        tofee=Decimal(tofee) if tofee != 'None' else None,
-                        tofee_currency=tofee_cur,
-                        minamount=Decimal(rate['minamount'].split()[0]),
-                        maxamount=Decimal(rate['maxamount'].split()[0])
-                    )
+            session = await self._get_session()
+            async with session.get(url, headers=headers) as response:
+                if response.status == 304:
+                    spool.close()
+                    return None
+                response.raise_for_status()
+                async for chunk in response.content.iter_chunked(
+                        self.rates_chunk_size):
+                    content_hash.update(chunk)
+                    spool.write(chunk)
+                version = FeedVersion(
+                    etag=response.headers.get('ETag'),
+                    last_modified=response.headers.get('Last-Modified'),
+                    content_hash=content_hash.hexdigest()
                 )
-            return results
         except ClientError as e:
+            spool.close()
             raise ex.NetworkError(
                 'Network error occurred while fetching rates') from e
         except asyncio.TimeoutError:
+            spool.close()
             raise ex.TimeoutError('Request timed out')
-        except xmltodict.expat.ExpatError as e:
-            raise ex.DataProcessingError('Error parsing XML response') from e
 
-    async def get_fixed_rates(self) -> list[schemas.RatesSchema]:
-        return await self._get_rates(True)
+        if version.content_hash == known.content_hash:
+            spool.close()
+            self.feed_versions[feed] = version
+            return None
+        spool.seek(0)
+        return version, self._iter_spooled_rates(spool)
+
+    async def _iter_spooled_rates(
+            self, spool: IO[bytes]) -> AsyncIterator[schemas.RatesSchema]:
+        parser = RatesXMLParser()
+        try:
+            while chunk := spool.read(self.rates_chunk_size):
+                for rate in parser.feed(chunk):
+                    yield rate
+            for rate in parser.close():
+                yield rate
+        except (ParseError, KeyError, ValueError, ArithmeticError) as e:
+            raise ex.DataProcessingError('Error parsing XML response') from e
+        finally:
+            spool.close()
 
-    async def get_float_rates(self) -> list[schemas.RatesSchema]:
-        return await self._get_rates(False)
+    def confirm_feed(self, feed: str, version: FeedVersion) -> None:
+        """Remember the version of a feed that has been fully loaded."""
+        self.feed_versions[feed] = version
 
-    async def ccies(self) -> list[schemas.Currency]:
-        currencies = await self._req('ccies')
-        return [schemas.Currency(**cur) for cur in currencies['data']]
+    async def ccies_if_changed(
+            self) -> Optional[tuple[FeedVersion, list[schemas.Currency]]]:
+        """Fetch currencies, or ``None`` if the response is unchanged."""
+        body, currencies = await self._req_raw('ccies')
+        version = FeedVersion(content_hash=hashlib.sha256(body).hexdigest())
+        known = self.feed_versions.get(self.CURRENCIES_FEED, FeedVersion())
+        if version.content_hash == known.content_hash:
+            return None
+        return version, [schemas.Currency(**cur)
+                         for cur in currencies['data']]
 
     async def create(self, data: schemas.CreateOrder) -> schemas.OrderData:
         response = await self._req('create', data)
@@ -9,11 +9,18 @@ logger = logging.getLogger(__name__)
 
 
 class FFIORedisClient:
+    """Read ffio data through the generation published by the loader."""
+
     EXCHANGER = 'ffio'
-    COINS_KEY = 'coins'
-    COIN_NETWORKS = '{coin_name}:networks'
-    FULL_COIN_INFO_KEY = '{exchanger}:{coin_name}:{network}:info'
-    RATE_KEY = '{exchanger}:{type}:{from_coin}:to:{to_coin}:info'
+    CURRENCIES_FEED = 'ccies'
+    GENERATION_KEY = '{exchanger}:{feed}:generation'
+    COINS_KEY = '{exchanger}:ccies:{generation}:coins'
+    COIN_NETWORKS = '{exchanger}:ccies:{generation}:{coin_name}:networks'
+    FULL_COIN_INFO_KEY = ('{exchanger}:ccies:{generation}:'
+                          '{coin_name}:{network}:info')
+    CODES_KEY = '{exchanger}:ccies:{generation}:codes'
+    CODE_FIELD = '{coin_name}:{network}'
+    RATES_KEY = '{exchanger}:{type}:{generation}:{from_coin}:rates'
 
     def __init__(self):
         self.redis_client = StrictRedis(
@@ -22,42 +29,92 @@ class FFIORedisClient:
             db=config.REDIS_DATABASE,
             decode_responses=True
         )
+        self._codes_generation = None
+        self._codes: dict[str, schemas.CoinCode] = {}
+
+    async def get_generation(self, feed: str) -> str | None:
+        return await self.redis_client.get(
+            self.GENERATION_KEY.format(exchanger=self.EXCHANGER, feed=feed))
 
     async def get_coins(self) -> set[str]:
-        return await self.redis_client.smembers(self.COINS_KEY)
+        generation = await self.get_generation(self.CURRENCIES_FEED)
+        return await self.redis_client.smembers(
+            self.COINS_KEY.format(exchanger=self.EXCHANGER,
+                                  generation=generation))
 
     async def get_networks(self, coin_name: str) -> set[str]:
+        generation = await self.get_generation(self.CURRENCIES_FEED)
         return await self.redis_client.smembers(
-            self.COIN_NETWORKS.format(coin_name=coin_name))
+            self.COIN_NETWORKS.format(exchanger=self.EXCHANGER,
+                                      generation=generation,
+                                      coin_name=coin_name))
 
     async def get_coin_full_info(self, coin_name: str,
                                  network: str) -> schemas.Currency:
+        generation = await self.get_generation(self.CURRENCIES_FEED)
+        return await self._get_coin_full_info(generation, coin_name, network)
+
+    async def _get_coin_full_info(self, generation: str, coin_name: str,
+                                  network: str) -> schemas.Currency:
         coin_info = await self.redis_client.get(
             self.FULL_COIN_INFO_KEY.format(
                 exchanger=self.EXCHANGER,
+                generation=generation,
                 coin_name=coin_name,
                 network=network
             )
         )
         return schemas.Currency.model_validate_json(coin_info)
 
+    async def _get_coin_codes(
+            self, generation: str | None) -> dict[str, schemas.CoinCode]:
+        """Return the code index of a generation, cached until it changes."""
+        if generation != self._codes_generation:
+            codes = await self.redis_client.hgetall(
+                self.CODES_KEY.format(exchanger=self.EXCHANGER,
+                                      generation=generation))
+            self._codes = {field: schemas.CoinCode.unpack(value)
+                           for field, value in codes.items()}
+            self._codes_generation = generation
+        return self._codes
+
+    async def get_coin_code(self, coin_name: str,
+                            network: str) -> schemas.CoinCode | None:
+        generation = await self.get_generation(self.CURRENCIES_FEED)
+        codes = await self._get_coin_codes(generation)
+        return codes.get(self.CODE_FIELD.format(coin_name=coin_name,
+                                                network=network))
+
     async def _get_rate(
             self, rate_type: str, from_coin: str, from_coin_network: str,
             to_coin: str, to_coin_network: str) -> schemas.RatesSchema | None:
-        from_coin_info = await self.get_coin_full_info(from_coin,
-                                                       from_coin_network)
-        to_coin_info = await self.get_coin_full_info(to_coin,
-                                                     to_coin_network)
+        coins_generation, rates_generation = await self.redis_client.mget(
+            self.GENERATION_KEY.format(exchanger=self.EXCHANGER,
+                                       feed=self.CURRENCIES_FEED),
+            self.GENERATION_KEY.format(exchanger=self.EXCHANGER,
+                                       feed=rate_type)
+        )
+        codes = await self._get_coin_codes(coins_generation)
+        from_coin_code = codes.get(self.CODE_FIELD.format(
+            coin_name=from_coin, network=from_coin_network))
+        to_coin_code = codes.get(self.CODE_FIELD.format(
+            coin_name=to_coin, network=to_coin_network))
+        if not from_coin_code or not to_coin_code:
+            return None
 
-        rate = await self.redis_client.get(
-            self.RATE_KEY.format(
+        rate = await self.redis_client.hget(
+            self.RATES_KEY.format(
                 exchanger=self.EXCHANGER,
                 type=rate_type,
-                from_coin=from_coin_info.code,
-                to_coin=to_coin_info.code
-            )
+                generation=rates_generation,
+                from_coin=from_coin_code.code
+            ),
+            to_coin_code.code
         )
-        return schemas.RatesSchema.model_validate_json(rate) if rate else None
+        if not rate:
+            return None
+        return schemas.RatesSchema.unpack(from_coin_code.code,
+                                          to_coin_code.code, rate)
 
     async def get_fixed_rate(
             self, from_coin: str, from_coin_network: str,
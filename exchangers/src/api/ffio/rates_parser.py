@@ -0,0 +1,58 @@
+from decimal import Decimal
+from typing import Iterator
+from xml.etree import ElementTree
+
+from . import schemas
+
+
+def parse_rate_item(rate: dict) -> schemas.RatesSchema:
+    """Build a rate schema from the fields of one feed ``<item>``."""
+    tofee, tofee_cur = rate.get('tofee', '0 None').split()
+    return schemas.RatesSchema(
+        from_coin=rate['from'],
+        to=rate['to'],
+        in_amount=Decimal(rate['in']),
+        out=Decimal(rate['out']),
+        amount=Decimal(rate['amount']),
+        tofee=Decimal(tofee) if tofee != 'None' else None,
+        tofee_currency=tofee_cur,
+        minamount=Decimal(rate['minamount'].split()[0]),
+        maxamount=Decimal(rate['maxamount'].split()[0])
+    )
+
+
+class RatesXMLParser:
+    """Incremental parser of the ff.io rates XML feed.
+
+    The feed is fed chunk by chunk and every completed ``<item>`` is
+    yielded as soon as its closing tag is read. Processed items are
+    dropped from the tree, so memory stays bounded by the chunk size
+    instead of the feed size.
+    """
+
+    ITEM_TAG = 'item'
+
+    def __init__(self) -> None:
+        self._parser = ElementTree.XMLPullParser(events=('start', 'end'))
+        self._root = None
+
+    def feed(self, chunk: bytes) -> Iterator[schemas.RatesSchema]:
+        self._parser.feed(chunk)
+        yield from self._read_items()
+
+    def close(self) -> Iterator[schemas.RatesSchema]:
+        self._parser.close()
+        yield from self._read_items()
+
+    def _read_items(self) -> Iterator[schemas.RatesSchema]:
+        for event, elem in self._parser.read_events():
+            if event == 'start':
+                if self._root is None:
+                    self._root = elem
+                continue
+            if elem.tag != self.ITEM_TAG:
+                continue
+            rate = parse_rate_item(
+                {child.tag: (child.text or '').strip() for child in elem})
+            self._root.clear()
+            yield rate
@@ -1,5 +1,5 @@
 # flake8: noqa: E401
-from .currencies_list import Currency
+from .currencies_list import CoinCode, Currency
 from .emergency import CreateEmergency, EmergencyChoice, EmergencyStatus
 from .order import (
     CreateOrder, CreateOrderDetails, Direction,
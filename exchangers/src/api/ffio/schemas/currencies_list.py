@@ -1,4 +1,4 @@
-from typing import Optional
+from typing import ClassVar, Optional
 
 from pydantic import BaseModel, HttpUrl
 
@@ -14,3 +14,39 @@ class Currency(BaseModel):
     logo: HttpUrl
     color: str
     priority: int
+
+
+class CoinCode(BaseModel):
+    """Exchange code and availability of a coin on a network."""
+
+    code: str
+    recv: bool
+    send: bool
+    tag: Optional[str]
+
+    PACKED_SEPARATOR: ClassVar[str] = '|'
+
+    @classmethod
+    def from_currency(cls, currency: Currency) -> 'CoinCode':
+        return cls(code=currency.code, recv=currency.recv,
+                   send=currency.send, tag=currency.tag)
+
+    def pack(self) -> str:
+        """Pack into ``code|recv|send|tag`` with flags as ``1``/``0``."""
+        return self.PACKED_SEPARATOR.join((
+            self.code,
+            '1' if self.recv else '0',
+            '1' if self.send else '0',
+            self.tag or '',
+        ))
+
+    @classmethod
+    def unpack(cls, value: str) -> 'CoinCode':
+        """Build a coin code from packed storage without validation."""
+        code, recv, send, tag = value.split(cls.PACKED_SEPARATOR)
+        return cls.model_construct(
+            code=code,
+            recv=recv == '1',
+            send=send == '1',
+            tag=tag or None
+        )
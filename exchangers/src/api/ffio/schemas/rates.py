@@ -1,5 +1,5 @@
 from decimal import Decimal
-from typing import Optional
+from typing import ClassVar, Optional
 
 from pydantic import BaseModel, Field
 
@@ -14,3 +14,62 @@ class RatesSchema(BaseModel):
     tofee_currency: Optional[str] = None
     min_amount: Decimal = Field(..., alias='minamount')
     max_amount: Decimal = Field(..., alias='maxamount')
+    quote_rate: Optional[Decimal] = None
+    to_min_amount: Optional[Decimal] = None
+    to_max_amount: Optional[Decimal] = None
+
+    PACKED_SEPARATOR: ClassVar[str] = '|'
+
+    @staticmethod
+    def _pack_decimal(value: Optional[Decimal]) -> str:
+        return '' if value is None else format(value.normalize(), 'f')
+
+    def pack(self) -> str:
+        """Pack the rate into a compact fixed-order string.
+
+        Field order: in, out, amount, tofee, tofee currency, min, max.
+        The tofee currency is left empty when it equals the to-coin.
+        Quote fields are not packed; the loader appends them.
+        """
+        tofee_currency = self.tofee_currency
+        if tofee_currency == self.to_coin:
+            tofee_currency = ''
+        return self.PACKED_SEPARATOR.join((
+            self._pack_decimal(self.in_amount),
+            self._pack_decimal(self.out_amount),
+            self._pack_decimal(self.amount),
+            self._pack_decimal(self.tofee),
+            tofee_currency or '',
+            self._pack_decimal(self.min_amount),
+            self._pack_decimal(self.max_amount),
+        ))
+
+    @classmethod
+    def unpack(cls, from_coin: str, to_coin: str,
+               value: str) -> 'RatesSchema':
+        """Build a rate from packed storage without validation.
+
+        The values were validated by the loader before packing, so the
+        instance is built with ``model_construct``. A quote appended by the
+        loader (rate, to-min, to-max) fills the quote fields; they stay
+        None for an empty quote.
+        """
+        (in_amount, out_amount, amount, tofee, tofee_currency,
+         min_amount, max_amount, *quote) = value.split(cls.PACKED_SEPARATOR)
+        quote_rate, to_min_amount, to_max_amount = (
+            [Decimal(field) if field else None for field in quote]
+            if quote else [None] * 3)
+        return cls.model_construct(
+            from_coin=from_coin,
+            to_coin=to_coin,
+            in_amount=Decimal(in_amount),
+            out_amount=Decimal(out_amount),
+            amount=Decimal(amount),
+            tofee=Decimal(tofee) if tofee else None,
+            tofee_currency=tofee_currency or to_coin,
+            min_amount=Decimal(min_amount),
+            max_amount=Decimal(max_amount),
+            quote_rate=quote_rate,
+            to_min_amount=to_min_amount,
+            to_max_amount=to_max_amount,
+        )
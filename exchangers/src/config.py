@@ -11,6 +11,51 @@ class Config(BaseSettings):
     REDIS_HOST: Optional[str] = 'localhost'
     REDIS_PORT: Optional[str] = '6379'
     REDIS_DATABASE: Optional[int] = 0
+    REDIS_WRITE_CHUNK_SIZE: int = 1000
+    REDIS_KEEP_GENERATIONS: int = 2
+    REDIS_CHANGES_MAXLEN: int = 100
+    RATES_SNAPSHOT_DIR: Optional[str] = None
+    RATE_HISTORY_ENABLED: bool = True
+    RATE_HISTORY_RAW_RETENTION: int = 6 * 3600
+    RATE_HISTORY_MINUTE_RETENTION: int = 7 * 24 * 3600
+    RATE_HISTORY_HOUR_RETENTION: int = 180 * 24 * 3600
+    PRICE_ALERTS_ENABLED: bool = True
+    PRICE_ALERTS_BATCH_SIZE: int = 1000
+    CCIES_REFRESH_INTERVAL: float = 600
+    FIXED_REFRESH_INTERVAL: float = 10
+    FLOAT_REFRESH_INTERVAL: float = 10
+    REFRESH_CHANGED_FACTOR: float = 1
+    REFRESH_JITTER: float = 0.1
+    REFRESH_MAX_BACKOFF: float = 300
+    LEADER_LEASE_TTL: float = 3
+    LEADER_RENEW_INTERVAL: float = 1
+    TRANSACTIONS_SWEEP_INTERVAL: float = 30
+    TRANSACTIONS_WORKER_ID: Optional[str] = None
+    TRANSACTIONS_CLAIM_BATCH_SIZE: int = 500
+    TRANSACTIONS_CLAIM_LEASE: float = 300
+    TRANSACTIONS_POLL_WORKERS: int = 16
+    TRANSACTIONS_FFIO_RATE: float = 20
+    TRANSACTIONS_FFIO_BURST: int = 20
+    TRANSACTIONS_POLL_STATS_INTERVAL: float = 60
+    TRANSACTIONS_RECOVERY_RATE: float = 15
+    ORDER_POLL_FAST: float = 5
+    ORDER_POLL_FAST_WINDOW: float = 120
+    ORDER_POLL_AWAITING_DEPOSIT: float = 30
+    ORDER_POLL_CONFIRMING: float = 20
+    ORDER_POLL_ACTIVE: float = 10
+    ORDER_POLL_EXPIRATION_GRACE: float = 2
+    ORDER_POLL_EXPIRED_BASE: float = 60
+    ORDER_POLL_EXPIRED_MAX: float = 3600
+    ORDER_POLL_EXPIRED_GIVE_UP: float = 24 * 3600
+    ORDER_POLL_RETRY_BASE: float = 5
+    ORDER_POLL_RETRY_MAX: float = 600
+    ORDER_POLL_RETRY_ATTEMPTS: int = 12
+
+    FFIO_POOL_LIMIT_PER_HOST: int = 20
+    FFIO_POOL_KEEPALIVE_TIMEOUT: int = 30
+    FFIO_POOL_DNS_CACHE_TTL: int = 300
+    FFIO_RATES_CHUNK_SIZE: int = 64 * 1024
+    FFIO_STALE_AFTER_CYCLES: int = 1
 
     class Config:
         env_file = '.env'
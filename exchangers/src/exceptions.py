@@ -14,3 +14,9 @@ class ClientError(Exception):
     """The base class for client errors."""
 
     pass
+
+
+class LeadershipLostError(Exception):
+    """Raises when a newer leader has fenced off this replica's writes."""
+
+    pass
@@ -0,0 +1,58 @@
+import time
+
+from redis.asyncio import StrictRedis
+
+from src.config import config
+
+
+class RedisBulkWriter:
+    """Buffer loader writes and send them in non-transactional pipelines.
+
+    Commands are queued on a pipeline and flushed every ``chunk_size``
+    commands, so a refresh costs one round trip per chunk instead of one
+    per key. Use as an async context manager: the remaining commands are
+    flushed on a clean exit and discarded if the block raised.
+    """
+
+    def __init__(self, redis_client: StrictRedis,
+                 chunk_size: int = config.REDIS_WRITE_CHUNK_SIZE) -> None:
+        self.redis_client = redis_client
+        self.chunk_size = chunk_size
+        self._pipeline = redis_client.pipeline(transaction=False)
+        self._buffered = 0
+        self.commands = 0
+        self.round_trips = 0
+        self.write_seconds = 0.0
+
+    async def __aenter__(self) -> 'RedisBulkWriter':
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            await self.flush()
+        else:
+            await self._pipeline.reset()
+
+    async def add(self, command: str, *args, **kwargs) -> None:
+        """Queue a redis command, e.g. ``add('set', key, value)``."""
+        getattr(self._pipeline, command)(*args, **kwargs)
+        self._buffered += 1
+        if self._buffered >= self.chunk_size:
+            await self.flush()
+
+    async def flush(self) -> None:
+        if not self._buffered:
+            return
+        started = time.perf_counter()
+        await self._pipeline.execute()
+        self.write_seconds += time.perf_counter() - started
+        self.commands += self._buffered
+        self.round_trips += 1
+        self._buffered = 0
+
+    def get_stats(self) -> dict:
+        return {
+            'commands': self.commands,
+            'round_trips': self.round_trips,
+            'write_seconds': round(self.write_seconds, 4),
+        }
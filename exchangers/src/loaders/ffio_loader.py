@@ -1,21 +1,68 @@
+import asyncio
+import json
 import logging
+import os
+import time
 from collections import defaultdict
+from typing import AsyncIterator, Callable
 
 from redis.asyncio import StrictRedis
 
 from src.config import config
+from src.exceptions import LeadershipLostError
 from src.api.ffio import schemas
 from src.api.ffio.ffio_client import FFIOClient
+from .bulk_writer import RedisBulkWriter
+from .price_alerts import PriceAlertEvaluator
+from .quotes import build_quotes
+from .rate_history import RateHistoryWriter
+from .rates_snapshot import write_rates_snapshot
+from .route_tables import build_route_tables
 
 logger = logging.getLogger(__name__)
 
 
 class LoadFFIODataToRedis:
+    """Load ffio currencies and rates into versioned Redis snapshots.
+
+    Every refresh of a feed is written under a new generation number and
+    published with a single atomic ``SET`` of the feed's generation
+    pointer, so readers never see a half-written snapshot. Generations
+    older than the last ``REDIS_KEEP_GENERATIONS`` are removed afterwards.
+    """
+
     EXCHANGER = 'ffio'
-    COINS_KEY = 'coins'
-    COIN_NETWORKS = '{coin_name}:networks'
-    FULL_COIN_INFO_KEY = '{exchanger}:{coin_name}:{network}:info'
-    RATE_KEY = '{exchanger}:{type}:{from_coin}:to:{to_coin}:info'
+    CURRENCIES_FEED = FFIOClient.CURRENCIES_FEED
+    GENERATION_KEY = '{exchanger}:{feed}:generation'
+    GENERATION_SEQ_KEY = '{exchanger}:{feed}:generation:seq'
+    GENERATIONS_KEY = '{exchanger}:{feed}:generations'
+    GENERATION_PREFIX = '{exchanger}:{feed}:{generation}:'
+    COINS_KEY = '{exchanger}:ccies:{generation}:coins'
+    COIN_NETWORKS = '{exchanger}:ccies:{generation}:{coin_name}:networks'
+    FULL_COIN_INFO_KEY = ('{exchanger}:ccies:{generation}:'
+                          '{coin_name}:{network}:info')
+    CODES_KEY = '{exchanger}:ccies:{generation}:codes'
+    CODE_FIELD = '{coin_name}:{network}'
+    COIN_NAMES_KEY = '{exchanger}:ccies:{generation}:names'
+    RATES_KEY = '{exchanger}:{type}:{generation}:{from_coin}:rates'
+    REACH_KEY = '{exchanger}:{type}:{generation}:reach'
+    ROUTES_KEY = '{exchanger}:{type}:{generation}:routes'
+    CHANGES_KEY = '{exchanger}:{type}:changes'
+    FEED_STATUS_KEY = '{exchanger}:feeds:status'
+    LEADER_KEY = '{exchanger}:currencies:leader'
+    LEADER_TOKEN_KEY = '{exchanger}:currencies:leader:token'
+    REPLICA_KEY = '{exchanger}:currencies:replicas:{instance}'
+    LEGACY_REMOVED_KEY = '{exchanger}:legacy:removed'
+
+    # Flips a generation pointer only if the fencing token is still the
+    # latest one issued. Returns 1 if the pointer was set, 0 otherwise.
+    FENCED_SET_SCRIPT = """
+    if redis.call('GET', KEYS[2]) ~= ARGV[2] then
+        return 0
+    end
+    redis.call('SET', KEYS[1], ARGV[1])
+    return 1
+    """
 
     def __init__(self):
         self.redis_client = StrictRedis(
@@ -28,6 +75,58 @@ class LoadFFIODataToRedis:
             key=config.FFIO_APIKEY,
             secret=config.FFIO_SECRET
         )
+        self.refresh_stats = defaultdict(
+            lambda: {'loaded': 0, 'skipped': 0})
+        self.write_stats: dict[str, dict] = {}
+        self.expiry_stats: dict[str, dict] = {}
+        self._cycles = defaultdict(int)
+        self._seen_rates = defaultdict(dict)
+        self._published: dict[str, int] = {}
+        self._seen_coins: set[tuple[str, str]] = set()
+        self._listed_codes: set[str] = set()
+        self._unknown_codes: set[str] = set()
+        # Called with a feed name when another feed shows it is outdated.
+        self.refresh_requested: Callable[[str], None] | None = None
+        # Fencing token of the leader lease, None when not elected.
+        self.fencing_token: int | None = None
+        self._fenced_set = self.redis_client.register_script(
+            self.FENCED_SET_SCRIPT)
+        self.history = (RateHistoryWriter(self.redis_client, self.EXCHANGER)
+                        if config.RATE_HISTORY_ENABLED else None)
+        self.alerts = (PriceAlertEvaluator()
+                       if config.PRICE_ALERTS_ENABLED else None)
+
+    async def start(self) -> None:
+        await self.api_client.start()
+        try:
+            await self._remove_legacy_keys()
+        except Exception as e:
+            logger.error(f'Failed to remove legacy keys: {e}', exc_info=True)
+
+    async def close(self) -> None:
+        if self.history:
+            await self.history.close()
+        if self.alerts:
+            await self.alerts.close()
+        await self.api_client.close()
+        await self.redis_client.aclose()
+
+    def reset(self) -> None:
+        """Forget the state of earlier refreshes.
+
+        Called when this replica becomes leader, as another replica may
+        have published newer generations in the meantime: the next
+        refresh of every feed is fetched and published in full.
+        """
+        self.api_client.feed_versions.clear()
+        self._cycles.clear()
+        self._seen_rates.clear()
+        self._published.clear()
+        self._seen_coins = set()
+        self._listed_codes = set()
+        self._unknown_codes = set()
+        if self.history:
+            self.history.reset()
 
     async def _remove_currencies_ununiqueness(
             self, coins) -> list[schemas.Currency]:
@@ -48,62 +147,387 @@ class LoadFFIODataToRedis:
 
         return filtered_coins
 
-    async def load_currencies_and_networks(self) -> None:
-        coins = await self.api_client.ccies()
+    async def _new_generation(self, feed: str) -> int:
+        generation = await self.redis_client.incr(
+            self.GENERATION_SEQ_KEY.format(exchanger=self.EXCHANGER,
+                                           feed=feed))
+        await self.redis_client.zadd(
+            self.GENERATIONS_KEY.format(exchanger=self.EXCHANGER, feed=feed),
+            {generation: generation}
+        )
+        return generation
+
+    async def _publish_generation(self, feed: str, generation: int) -> int:
+        """Flip the feed pointer and return the number of removed keys.
+
+        With a fencing token the flip is refused once a newer leader has
+        been elected, and ``LeadershipLostError`` is raised.
+        """
+        key = self.GENERATION_KEY.format(exchanger=self.EXCHANGER, feed=feed)
+        if self.fencing_token is None:
+            await self.redis_client.set(key, generation)
+        elif not await self._fenced_set(
+                keys=[key, self.LEADER_TOKEN_KEY.format(
+                    exchanger=self.EXCHANGER)],
+                args=[generation, self.fencing_token]):
+            raise LeadershipLostError(
+                f'{feed} generation {generation} not published: token '
+                f'{self.fencing_token} is fenced off')
+        logger.info(f'{feed} generation {generation} published')
+        try:
+            return await self._collect_generations(feed, generation)
+        except Exception as e:
+            logger.error(f'Failed to collect old {feed} generations: {e}',
+                         exc_info=True)
+            return 0
+
+    async def _unlink_keys(self, keys: list[str]) -> int:
+        async with RedisBulkWriter(self.redis_client) as writer:
+            for key in keys:
+                await writer.add('unlink', key)
+        return writer.commands
+
+    async def _collect_generations(self, feed: str, current: int) -> int:
+        removed = 0
+        generations_key = self.GENERATIONS_KEY.format(
+            exchanger=self.EXCHANGER, feed=feed)
+        stale = await self.redis_client.zrangebyscore(
+            generations_key, '-inf', current - config.REDIS_KEEP_GENERATIONS)
+        for generation in stale:
+            prefix = self.GENERATION_PREFIX.format(
+                exchanger=self.EXCHANGER, feed=feed, generation=generation)
+            keys = [key async for key in self.redis_client.scan_iter(
+                match=f'{prefix}*', count=config.REDIS_WRITE_CHUNK_SIZE)]
+            removed += await self._unlink_keys(keys)
+            await self.redis_client.zrem(generations_key, generation)
+            logger.info(f'{feed} generation {generation} removed '
+                        f'({len(keys)} keys)')
+        return removed
+
+    @staticmethod
+    def _is_legacy_key(key: str) -> bool:
+        """Match the legacy coin and rate keys.
+
+        They are ``ffio:{coin}:{network}:info`` and
+        ``ffio:{type}:{from_coin}:to:{to_coin}:info``.
+        """
+        parts = key.split(':')
+        if parts[0] != LoadFFIODataToRedis.EXCHANGER or parts[-1] != 'info':
+            return False
+        return (len(parts) == 4
+                or (len(parts) == 6 and parts[3] == 'to'
+                    and parts[1] in ('fixed', 'float')))
+
+    async def _remove_legacy_keys(self) -> None:
+        """Remove keys of the unversioned layout used before generations.
+
+        Only the ``ffio:*:info`` keys of that layout are matched; the scan
+        runs once per Redis database, as recorded in ``LEGACY_REMOVED_KEY``.
+        """
+        done_key = self.LEGACY_REMOVED_KEY.format(exchanger=self.EXCHANGER)
+        if await self.redis_client.exists(done_key):
+            return
+        keys = [key async for key in self.redis_client.scan_iter(
+                match=f'{self.EXCHANGER}:*:info',
+                count=config.REDIS_WRITE_CHUNK_SIZE)
+                if self._is_legacy_key(key)]
+        if keys:
+            removed = await self._unlink_keys(keys)
+            logger.info(f'Removed {removed} legacy unversioned keys')
+        await self.redis_client.set(done_key, int(time.time()))
+
+    def _record_expiry(self, feed: str, delisted: int, withheld: int,
+                       keys_removed: int) -> None:
+        self.expiry_stats[feed] = {
+            'delisted': delisted,
+            'withheld': withheld,
+            'keys_removed': keys_removed,
+        }
+        logger.info(f'{feed} expiry: {self.expiry_stats[feed]}')
+
+    def _record_refresh(self, feed: str, loaded: bool) -> None:
+        self.refresh_stats[feed]['loaded' if loaded else 'skipped'] += 1
+
+    def _record_writes(self, feed: str, writer: RedisBulkWriter) -> None:
+        self.write_stats[feed] = writer.get_stats()
+        logger.info(f'{feed} writes: {self.write_stats[feed]}')
+
+    async def load_currencies_and_networks(self) -> bool:
+        fetched = await self.api_client.ccies_if_changed()
+        if fetched is None:
+            self._record_refresh(self.CURRENCIES_FEED, False)
+            logger.info('Currencies are unchanged, refresh skipped')
+            return False
+        version, coins = fetched
         coins = await self._remove_currencies_ununiqueness(coins)
 
         coins_set = set()
         coin_networks = defaultdict(set)
+        coin_names = {}
+        listed_coins = {(coin.coin, coin.network) for coin in coins}
+        generation = await self._new_generation(self.CURRENCIES_FEED)
+        codes_key = self.CODES_KEY.format(exchanger=self.EXCHANGER,
+                                          generation=generation)
 
-        for coin in coins:
-            # await self.redis_client.sadd(self.COINS_KEY, coin.coin)
-            # await self.redis_client.sadd(
-            #     self.COIN_NETWORKS.format(coin_name=coin.coin),
-            #     coin.network
-            # )
-            coins_set.add(coin.coin)
-            coin_networks[coin.coin].add(coin.network)
-            await self.redis_client.set(
-                self.FULL_COIN_INFO_KEY.format(
-                    exchanger=self.EXCHANGER,
-                    coin_name=coin.coin,
-                    network=coin.network
-                ),
-                coin.model_dump_json()
+        async with RedisBulkWriter(self.redis_client) as writer:
+            for coin in coins:
+                coins_set.add(coin.coin)
+                coin_networks[coin.coin].add(coin.network)
+                named = coin_names.get(coin.coin)
+                if named is None or coin.priority > named.priority:
+                    coin_names[coin.coin] = coin
+                await writer.add(
+                    'set',
+                    self.FULL_COIN_INFO_KEY.format(
+                        exchanger=self.EXCHANGER,
+                        generation=generation,
+                        coin_name=coin.coin,
+                        network=coin.network
+                    ),
+                    coin.model_dump_json()
+                )
+                await writer.add(
+                    'hset',
+                    codes_key,
+                    self.CODE_FIELD.format(coin_name=coin.coin,
+                                           network=coin.network),
+                    schemas.CoinCode.from_currency(coin).pack()
+                )
+
+            await writer.add(
+                'sadd',
+                self.COINS_KEY.format(exchanger=self.EXCHANGER,
+                                      generation=generation),
+                *coins_set
             )
 
-        await self.redis_client.delete(self.COINS_KEY)
-        await self.redis_client.sadd(self.COINS_KEY, *coins_set)
+            for coin, networks in coin_networks.items():
+                await writer.add(
+                    'sadd',
+                    self.COIN_NETWORKS.format(exchanger=self.EXCHANGER,
+                                              generation=generation,
+                                              coin_name=coin),
+                    *networks
+                )
+
+            if coin_names:
+                await writer.add(
+                    'hset',
+                    self.COIN_NAMES_KEY.format(exchanger=self.EXCHANGER,
+                                               generation=generation),
+                    mapping={coin: f'{info.priority}|{info.name}'
+                             for coin, info in coin_names.items()}
+                )
+        self._record_writes(self.CURRENCIES_FEED, writer)
+        keys_removed = await self._publish_generation(self.CURRENCIES_FEED,
+                                                      generation)
+        delisted = self._seen_coins - listed_coins
+        for coin, network in delisted:
+            logger.info(f'Coin {coin}/{network} is delisted')
+        self._seen_coins = listed_coins
+        self._listed_codes = {coin.code for coin in coins}
+        self._record_expiry(self.CURRENCIES_FEED, len(delisted), 0,
+                            keys_removed)
+
+        self.api_client.confirm_feed(self.CURRENCIES_FEED, version)
+        self._record_refresh(self.CURRENCIES_FEED, True)
+        logger.info('Currencies and networks loaded successfully')
+        return True
+
+    async def _load_rates(self, rates: AsyncIterator[schemas.RatesSchema],
+                          type: str):
+        """Write a rate feed into a new generation and publish it.
+
+        Rates are written as they stream in, every
+        ``REDIS_WRITE_CHUNK_SIZE`` of them with their quotes appended,
+        computed for the chunk at once by ``build_quotes``. Pairs missing
+        from the feed are left out of the new generation at once, so they
+        are never quoted from their old values; they disappear from Redis
+        with the generations that still hold them. They are only reported
+        delisted after ``FFIO_STALE_AFTER_CYCLES`` refreshes without them,
+        and are withheld until then. The route graph tables of the
+        generation are built from its rates before it is published.
+        """
+        self._cycles[type] += 1
+        cycle = self._cycles[type]
+        seen = self._seen_rates[type]
+        previous = self._published.pop(type, None)
+        changed = defaultdict(dict)
+        removed = []
+        generation = await self._new_generation(type)
+        async with RedisBulkWriter(self.redis_client) as writer:
+            chunk = []
+            async for rate in rates:
+                chunk.append(rate)
+                if len(chunk) >= config.REDIS_WRITE_CHUNK_SIZE:
+                    await self._write_rates(writer, type, generation, chunk,
+                                            changed)
+                    chunk = []
+            await self._write_rates(writer, type, generation, chunk, changed)
 
-        for coin, networks in coin_networks.items():
-            await self.redis_client.delete(
-                self.COIN_NETWORKS.format(coin_name=coin)
+            delisted = withheld = 0
+            for pair, (last_cycle, value) in list(seen.items()):
+                if last_cycle == cycle:
+                    continue
+                if value is not None:
+                    # A withheld pair has no value, so it counts as
+                    # changed again once the feed lists it.
+                    seen[pair] = (last_cycle, None)
+                    removed.append(pair)
+                if cycle - last_cycle >= config.FFIO_STALE_AFTER_CYCLES:
+                    del seen[pair]
+                    delisted += 1
+                    logger.info(
+                        f'{type} pair {pair[0]}->{pair[1]} is delisted')
+                else:
+                    withheld += 1
+
+            reach = defaultdict(list)
+            for (from_coin, to_coin), (last_cycle, _) in seen.items():
+                if last_cycle == cycle:
+                    reach[from_coin].append(to_coin)
+            if reach:
+                await writer.add(
+                    'hset',
+                    self.REACH_KEY.format(exchanger=self.EXCHANGER,
+                                          type=type, generation=generation),
+                    mapping={from_coin: ' '.join(to_coins)
+                             for from_coin, to_coins in reach.items()}
+                )
+            await writer.add(
+                'hset',
+                self.ROUTES_KEY.format(exchanger=self.EXCHANGER,
+                                       type=type, generation=generation),
+                mapping=build_route_tables(
+                    {pair: value
+                     for pair, (last_cycle, value) in seen.items()
+                     if last_cycle == cycle})
             )
-            await self.redis_client.sadd(
-                self.COIN_NETWORKS.format(coin_name=coin),
-                *networks
+        self._record_writes(type, writer)
+        self._check_codes(type, changed)
+        keys_removed = await self._publish_generation(type, generation)
+        await self._publish_changes(type, generation, previous,
+                                    changed, removed)
+        self._published[type] = generation
+        if self.history:
+            self.history.record(type, time.time(), changed, removed)
+        if self.alerts:
+            self.alerts.record(type, changed)
+        self._record_expiry(type, delisted, withheld, keys_removed)
+        if config.RATES_SNAPSHOT_DIR:
+            await self._write_snapshot(type, generation)
+
+    async def _write_rates(self, writer: RedisBulkWriter, type: str,
+                           generation: int, rates: list[schemas.RatesSchema],
+                           changed: dict) -> None:
+        """Write a chunk of rates with their quotes into a generation."""
+        cycle = self._cycles[type]
+        seen = self._seen_rates[type]
+        quotes = build_quotes(rates)
+        for rate, quote in zip(rates, quotes):
+            value = (f'{rate.pack()}'
+                     f'{schemas.RatesSchema.PACKED_SEPARATOR}{quote}')
+            pair = (rate.from_coin, rate.to_coin)
+            if seen.get(pair, (None, None))[1] != value:
+                changed[rate.from_coin][rate.to_coin] = value
+            seen[pair] = (cycle, value)
+            await writer.add(
+                'hset',
+                self._rates_key(type, generation, rate.from_coin),
+                rate.to_coin,
+                value
             )
 
-        logger.info('Currencies and networks loaded successfully')
+    def _check_codes(self, type: str, changed: dict) -> None:
+        """Request a currencies refresh when rates list new unknown codes.
+
+        A code is only reported once, so rates of a coin missing from the
+        currencies feed for good do not refresh it on every change.
+        """
+        if not self._listed_codes or self.refresh_requested is None:
+            return
+        unknown = ({code for from_coin, targets in changed.items()
+                    for code in (from_coin, *targets)}
+                   - self._listed_codes - self._unknown_codes)
+        if unknown:
+            self._unknown_codes |= unknown
+            logger.info(f'{type} rates list unknown codes: '
+                        f'{", ".join(sorted(unknown))}')
+            self.refresh_requested(self.CURRENCIES_FEED)
+
+    async def _write_snapshot(self, type: str, generation: int) -> None:
+        """Write the published rates to a memory-mappable snapshot file."""
+        path = os.path.join(config.RATES_SNAPSHOT_DIR,
+                            f'{self.EXCHANGER}_{type}.rates')
+        rates = {pair: value
+                 for pair, (_, value) in self._seen_rates[type].items()
+                 if value is not None}
+        try:
+            await asyncio.to_thread(write_rates_snapshot, path, generation,
+                                    rates)
+            logger.info(f'{type} snapshot of generation {generation} '
+                        f'written to {path}')
+        except Exception as e:
+            logger.error(f'Failed to write {type} snapshot: {e}',
+                         exc_info=True)
 
-    async def _load_rates(self, rates: list[schemas.RatesSchema], type: str):
-        for rate in rates:
-            await self.redis_client.set(
-                self.RATE_KEY.format(
-                    exchanger=self.EXCHANGER,
-                    type=type,
-                    from_coin=rate.from_coin,
-                    to_coin=rate.to_coin
-                ),
-                rate.model_dump_json(by_alias=True)
+    async def _publish_changes(self, type: str, generation: int,
+                               previous: int | None, changed: dict,
+                               removed: list[tuple[str, str]]) -> None:
+        """Append the delta of a published rates generation to its stream.
+
+        An entry holds the pairs added or changed since ``previous`` and
+        the pairs removed, so a reader at ``previous`` can move to
+        ``generation`` without rereading the snapshot. When the previous
+        generation is unknown (first refresh or a failed one) the entry is
+        marked ``full`` and readers reload the snapshot instead.
+        """
+        full = previous is None
+        fields = {
+            'generation': generation,
+            'previous': '' if full else previous,
+            'published_at': time.time(),
+            'full': int(full),
+            'changed': '{}' if full else json.dumps(changed),
+            'removed': '[]' if full else json.dumps(removed),
+        }
+        try:
+            await self.redis_client.xadd(
+                self.CHANGES_KEY.format(exchanger=self.EXCHANGER, type=type),
+                fields,
+                maxlen=config.REDIS_CHANGES_MAXLEN,
+                approximate=True
             )
+        except Exception as e:
+            logger.error(f'Failed to publish {type} changes: {e}',
+                         exc_info=True)
+
+    def _rates_key(self, type: str, generation: int, from_coin: str) -> str:
+        return self.RATES_KEY.format(
+            exchanger=self.EXCHANGER,
+            type=type,
+            generation=generation,
+            from_coin=from_coin
+        )
+
+    async def _load_rates_feed(self, is_fixed: bool) -> bool:
+        feed = (self.api_client.FIXED_FEED if is_fixed
+                else self.api_client.FLOAT_FEED)
+        fetched = await self.api_client.fetch_rates(is_fixed)
+        if fetched is None:
+            self._record_refresh(feed, False)
+            logger.info(f'{feed.capitalize()} rates are unchanged, '
+                        'refresh skipped')
+            return False
+        version, rates = fetched
+        await self._load_rates(rates, feed)
+        self.api_client.confirm_feed(feed, version)
+        self._record_refresh(feed, True)
+        logger.info(f'{feed.capitalize()} rates loaded successfully')
+        return True
 
-    async def load_fixed_rates(self):
-        fixed_rates = await self.api_client.get_fixed_rates()
-        await self._load_rates(fixed_rates, 'fixed')
-        logger.info('Fixed rates loaded successfully')
+    async def load_fixed_rates(self) -> bool:
+        return await self._load_rates_feed(is_fixed=True)
 
-    async def load_float_rates(self):
-        float_rates = await self.api_client.get_float_rates()
-        await self._load_rates(float_rates, 'float')
-        logger.info('Float rates loaded successully')
+    async def load_float_rates(self) -> bool:
+        return await self._load_rates_feed(is_fixed=False)
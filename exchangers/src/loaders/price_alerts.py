@@ -0,0 +1,210 @@
+import asyncio
+import logging
+import time
+from bisect import bisect_left, bisect_right, insort
+from collections import defaultdict
+from datetime import datetime, timedelta
+from decimal import Decimal
+from operator import itemgetter
+
+from sqlalchemy import update
+from sqlalchemy.future import select
+
+from src.api.ffio.schemas import RatesSchema
+from src.config import config
+from src.database import get_session
+from src.models import AlertDirections, PriceAlert
+
+logger = logging.getLogger(__name__)
+
+_threshold = itemgetter(0)
+
+
+class ThresholdIndex:
+    """Untriggered alerts of one pair, sorted by threshold.
+
+    ``above`` and ``below`` hold ``(threshold, alert id)`` in ascending
+    order, so the alerts crossed by a rate are a prefix of ``above`` and
+    a suffix of ``below``, found by bisection.
+    """
+
+    __slots__ = ('above', 'below')
+
+    def __init__(self) -> None:
+        self.above: list[tuple[Decimal, str]] = []
+        self.below: list[tuple[Decimal, str]] = []
+
+    def __len__(self) -> int:
+        return len(self.above) + len(self.below)
+
+    def _side(self, direction: str) -> list[tuple[Decimal, str]]:
+        return self.above if direction == AlertDirections.ABOVE else self.below
+
+    def add(self, direction: str, threshold: Decimal, alert_id: str) -> None:
+        insort(self._side(direction), (threshold, alert_id))
+
+    def remove(self, direction: str, threshold: Decimal,
+               alert_id: str) -> None:
+        side = self._side(direction)
+        i = bisect_left(side, (threshold, alert_id))
+        if i < len(side) and side[i] == (threshold, alert_id):
+            del side[i]
+
+    def pop_crossed(self, rate: Decimal) -> list[str]:
+        """Remove and return the alerts whose threshold the rate reached."""
+        above = bisect_right(self.above, rate, key=_threshold)
+        below = bisect_left(self.below, rate, key=_threshold)
+        crossed = [alert_id for _, alert_id in self.above[:above]]
+        crossed += [alert_id for _, alert_id in self.below[below:]]
+        del self.above[:above]
+        del self.below[below:]
+        return crossed
+
+
+class PriceAlertEvaluator:
+    """Match rate changes against price alerts after every refresh.
+
+    Untriggered alerts are kept in memory in a ``ThresholdIndex`` per
+    feed and pair, so a refresh only looks at the pairs it changed and
+    costs a bisection per pair plus the crossed alerts, however many
+    alerts exist. Alerts created or deleted in the bot are picked up by
+    ``updated_on`` before every evaluation. Crossed alerts are marked
+    triggered in one transaction per evaluation; the bot notifies their
+    owners.
+
+    Evaluation runs in one task per feed, like the rate history, and
+    only the latest rate of a pair is kept for refreshes that queue up.
+    """
+
+    # Alerts updated this long before the last sync are read again, to
+    # allow for clock skew between the bot and the loader.
+    SYNC_OVERLAP = timedelta(seconds=60)
+
+    def __init__(self) -> None:
+        # type -> (from code, to code) -> index
+        self._indexes = defaultdict(lambda: defaultdict(ThresholdIndex))
+        # alert id -> (type, pair, direction, threshold)
+        self._alerts: dict[str, tuple] = {}
+        self._synced_at: datetime | None = None
+        self._sync_lock = asyncio.Lock()
+        self._pending: dict[str, dict] = defaultdict(dict)
+        self._tasks: dict[str, asyncio.Task] = {}
+        self.stats = defaultdict(lambda: {'evaluations': 0, 'pairs': 0,
+                                          'triggered': 0, 'seconds': 0.0,
+                                          'failed': 0})
+
+    def record(self, type: str, changed: dict[str, dict[str, str]]) -> None:
+        """Queue the changed rates of a refresh for evaluation."""
+        pending = self._pending[type]
+        for from_coin, targets in changed.items():
+            for to_coin, value in targets.items():
+                pending[(from_coin, to_coin)] = value
+        if not pending:
+            return
+        task = self._tasks.get(type)
+        if task is None or task.done():
+            self._tasks[type] = asyncio.create_task(self._evaluate(type))
+
+    async def close(self) -> None:
+        await asyncio.gather(*self._tasks.values(), return_exceptions=True)
+
+    async def _evaluate(self, type: str) -> None:
+        while self._pending[type]:
+            changed, self._pending[type] = self._pending[type], {}
+            started = time.perf_counter()
+            stats = self.stats[type]
+            try:
+                await self._sync()
+                triggered = self._match(type, changed)
+                if triggered:
+                    await self._trigger(triggered)
+                stats['evaluations'] += 1
+                stats['pairs'] += len(changed)
+                stats['triggered'] += sum(map(len, triggered.values()))
+            except Exception as e:
+                stats['failed'] += 1
+                # Rebuild the indexes from the database on the next run,
+                # as alerts popped from them may not have been saved.
+                self._reset()
+                logger.error(f'Failed to evaluate {type} price alerts: {e}',
+                             exc_info=True)
+            stats['seconds'] = round(time.perf_counter() - started, 4)
+
+    def _reset(self) -> None:
+        self._indexes.clear()
+        self._alerts.clear()
+        self._synced_at = None
+
+    async def _sync(self) -> None:
+        """Apply the alerts created, deleted or triggered since last sync."""
+        async with self._sync_lock:
+            synced_at = datetime.now()
+            query = select(
+                PriceAlert.id, PriceAlert.rate_type, PriceAlert.from_code,
+                PriceAlert.to_code, PriceAlert.direction,
+                PriceAlert.threshold, PriceAlert.is_active,
+                PriceAlert.is_triggered
+            )
+            if self._synced_at is None:
+                query = query.where(PriceAlert.is_active.is_(True),
+                                    PriceAlert.is_triggered.is_(False))
+            else:
+                query = query.where(PriceAlert.updated_on
+                                    >= self._synced_at - self.SYNC_OVERLAP)
+            async with get_session() as session:
+                rows = (await session.execute(query)).all()
+
+            for (alert_id, type, from_code, to_code, direction, threshold,
+                 is_active, is_triggered) in rows:
+                alert_id = str(alert_id)
+                known = self._alerts.pop(alert_id, None)
+                if known is not None:
+                    known_type, pair, known_direction, known_threshold = known
+                    self._indexes[known_type][pair].remove(
+                        known_direction, known_threshold, alert_id)
+                if is_active and not is_triggered:
+                    pair = (from_code, to_code)
+                    self._indexes[type][pair].add(direction, threshold,
+                                                  alert_id)
+                    self._alerts[alert_id] = (type, pair, direction,
+                                              threshold)
+            self._synced_at = synced_at
+
+    def _match(self, type: str,
+               changed: dict[tuple[str, str], str]) -> dict[Decimal, list]:
+        """Pop the alerts crossed by the changed rates, grouped by rate."""
+        indexes = self._indexes[type]
+        triggered = defaultdict(list)
+        for pair, value in changed.items():
+            index = indexes.get(pair)
+            if not index:
+                continue
+            in_amount, out_amount, _ = value.split(
+                RatesSchema.PACKED_SEPARATOR, 2)
+            if not Decimal(in_amount):
+                continue
+            rate = Decimal(out_amount) / Decimal(in_amount)
+            crossed = index.pop_crossed(rate)
+            for alert_id in crossed:
+                del self._alerts[alert_id]
+            triggered[rate] += crossed
+        return {rate: ids for rate, ids in triggered.items() if ids}
+
+    async def _trigger(self, triggered: dict[Decimal, list[str]]) -> None:
+        now = datetime.now()
+        async with get_session() as session:
+            for rate, alert_ids in triggered.items():
+                for start in range(0, len(alert_ids),
+                                   config.PRICE_ALERTS_BATCH_SIZE):
+                    await session.execute(
+                        update(PriceAlert)
+                        .where(PriceAlert.id.in_(
+                            alert_ids[start:
+                                      start + config.PRICE_ALERTS_BATCH_SIZE]),
+                               PriceAlert.is_active.is_(True),
+                               PriceAlert.is_triggered.is_(False))
+                        .values(is_triggered=True, triggered_rate=rate,
+                                triggered_on=now, is_notified=False,
+                                updated_on=now)
+                    )
+            await session.commit()
@@ -0,0 +1,123 @@
+from decimal import Decimal
+
+import numpy as np
+
+from src.api.ffio.schemas import RatesSchema
+
+# Significant digits of the displayed estimates.
+QUOTE_DIGITS = 8
+# Unit roundoff of float64.
+UNIT_ROUNDOFF = 2.0 ** -53
+# Worst-case relative error, in unit roundoffs, of every float operation
+# below: four decimal-to-float conversions, the division, the product and
+# the final subtraction each contribute one, and the margin covers the
+# second-order terms and the scaling to the display grid.
+ERROR_ULPS = 16
+
+
+def _exact_quote(rate: RatesSchema) -> tuple[Decimal, Decimal, Decimal]:
+    effective = rate.out_amount / rate.in_amount
+    tofee = rate.tofee or 0
+    return (effective, rate.min_amount * effective - tofee,
+            rate.max_amount * effective - tofee)
+
+
+def _round_decimal(value: Decimal) -> Decimal:
+    if not value:
+        return Decimal(0)
+    exponent = value.adjusted() - QUOTE_DIGITS + 1
+    return value.quantize(Decimal(1).scaleb(exponent))
+
+
+def _format_fixed(negative: bool, mantissa: int, exponent: int) -> str:
+    digits = str(mantissa)
+    if exponent >= 0:
+        digits += '0' * exponent
+    else:
+        digits = digits.rjust(1 - exponent, '0')
+        digits = f'{digits[:exponent]}.{digits[exponent:]}'
+    return f'-{digits}' if negative else digits
+
+
+def _round_floats(values: np.ndarray,
+                  errors: np.ndarray) -> tuple[list, np.ndarray]:
+    """Round floats to ``QUOTE_DIGITS`` significant digits.
+
+    Returns the rounded values as packed strings and a mask of the values
+    whose error bound reaches a rounding boundary or a power of ten; only
+    those can round differently from the exact value and are left as
+    ``None``.
+    """
+    magnitude = np.abs(values)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        decade = np.log10(magnitude)
+        exponents = np.floor(decade) - QUOTE_DIGITS + 1
+        scaled = magnitude / 10.0 ** exponents
+        scaled_errors = (errors / 10.0 ** exponents
+                         + ERROR_ULPS * UNIT_ROUNDOFF * scaled)
+        unsafe = ((magnitude == 0) | ~np.isfinite(scaled)
+                  | (np.abs(scaled - np.floor(scaled) - 0.5)
+                     <= scaled_errors)
+                  | (np.abs(decade - np.rint(decade)) <= 1e-9))
+        mantissas = np.where(unsafe, 0, np.rint(scaled)).astype(np.int64)
+        exponents = np.where(unsafe, 0, exponents).astype(np.int64)
+
+    # Strip trailing zeros, as packed decimals are normalized.
+    for _ in range(QUOTE_DIGITS):
+        zeros = (mantissas % 10 == 0) & (mantissas != 0)
+        if not zeros.any():
+            break
+        mantissas[zeros] //= 10
+        exponents[zeros] += 1
+
+    rounded = [None if skip else _format_fixed(negative, mantissa, exponent)
+               for skip, negative, mantissa, exponent in zip(
+                   unsafe.tolist(), (values < 0).tolist(),
+                   mantissas.tolist(), exponents.tolist())]
+    return rounded, unsafe
+
+
+def build_quotes(rates: list[RatesSchema]) -> list[str]:
+    """Compute the displayed quote of every rate in one vectorised pass.
+
+    A quote holds the rate ``out / in`` and the limits in the to-currency
+    after ``tofee``, as ``calculate_to_amount`` computes them, packed as
+    ``rate|to_min|to_max`` and rounded to ``QUOTE_DIGITS`` significant
+    digits. The float results come with a first-order error bound; values
+    the bound can not round reliably are recomputed with ``Decimal``, so
+    every quote equals the rounded exact value. A rate without a positive
+    ``in`` has no quote, and its fields are left empty.
+    """
+    if not rates:
+        return []
+    (in_amount, out_amount, tofee, min_amount,
+     max_amount) = np.array([
+         (float(rate.in_amount), float(rate.out_amount),
+          float(rate.tofee or 0), float(rate.min_amount),
+          float(rate.max_amount))
+         for rate in rates
+     ]).T
+    quotable = in_amount > 0
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        effective = np.where(quotable, out_amount / in_amount, 0.0)
+    to_min = min_amount * effective
+    to_max = max_amount * effective
+    bound = ERROR_ULPS * UNIT_ROUNDOFF
+    columns = [
+        _round_floats(effective, bound * np.abs(effective)),
+        _round_floats(to_min - tofee, bound * (np.abs(to_min) + tofee)),
+        _round_floats(to_max - tofee, bound * (np.abs(to_max) + tofee)),
+    ]
+
+    for column, (rounded, unsafe) in enumerate(columns):
+        for row in np.flatnonzero(unsafe & quotable).tolist():
+            rounded[row] = RatesSchema._pack_decimal(_round_decimal(
+                _exact_quote(rates[row])[column]))
+
+    separator = RatesSchema.PACKED_SEPARATOR
+    return [separator.join(values) if row_quotable
+            else separator * (len(columns) - 1)
+            for row_quotable, values in zip(
+                quotable.tolist(),
+                zip(*(rounded for rounded, _ in columns)))]
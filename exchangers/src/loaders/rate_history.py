@@ -0,0 +1,214 @@
+import asyncio
+import logging
+import time
+from collections import defaultdict
+from decimal import Decimal
+
+from redis.asyncio import StrictRedis
+
+from src.api.ffio.schemas import RatesSchema
+from src.config import config
+from .bulk_writer import RedisBulkWriter
+
+logger = logging.getLogger(__name__)
+
+
+class RateHistoryWriter:
+    """Append rate changes to per-pair Redis streams in the background.
+
+    Every changed pair gets a raw entry with its ``in``, ``out`` and
+    limits. The rate (``out / in``) is also rolled up into 1m and 1h
+    buckets holding its min, max and last value: open buckets live in one
+    hash per feed and resolution, updated with a single ``HSET`` per
+    refresh, and are appended to the pair's rollup stream once a newer
+    bucket opens. A bucket only exists for intervals in which the pair
+    changed; until then its last value carries on.
+
+    Writes run in one task per feed, so a refresh only hands its changes
+    over. Refreshes that arrive while a write is running are queued and
+    written together by the same task.
+    """
+
+    RAW = 'raw'
+    RESOLUTIONS = {'1m': 60, '1h': 3600}
+    RAW_KEY = '{exchanger}:{type}:history:raw:{from_coin}:{to_coin}'
+    ROLLUP_KEY = ('{exchanger}:{type}:history:{resolution}:'
+                  '{from_coin}:{to_coin}')
+    OPEN_BUCKETS_KEY = '{exchanger}:{type}:history:{resolution}:open'
+    PAIR_FIELD = '{from_coin}:{to_coin}'
+
+    def __init__(self, redis_client: StrictRedis, exchanger: str) -> None:
+        self.redis_client = redis_client
+        self.exchanger = exchanger
+        self.retention = {
+            self.RAW: config.RATE_HISTORY_RAW_RETENTION,
+            '1m': config.RATE_HISTORY_MINUTE_RETENTION,
+            '1h': config.RATE_HISTORY_HOUR_RETENTION,
+        }
+        # type -> resolution -> pair field -> [start, min, max, last]
+        self._buckets = defaultdict(dict)
+        self._pending = defaultdict(list)
+        self._tasks: dict[str, asyncio.Task] = {}
+        self.stats = defaultdict(lambda: {'writes': 0, 'commands': 0,
+                                          'seconds': 0.0, 'failed': 0})
+
+    def record(self, type: str, timestamp: float,
+               changed: dict[str, dict[str, str]],
+               removed: list[tuple[str, str]]) -> None:
+        """Queue the changes of a refresh and make sure a writer runs."""
+        if not changed and not removed:
+            return
+        self._pending[type].append((timestamp, changed, removed))
+        task = self._tasks.get(type)
+        if task is None or task.done():
+            self._tasks[type] = asyncio.create_task(self._write(type))
+
+    def reset(self) -> None:
+        """Reload the open buckets from Redis on the next write."""
+        self._buckets.clear()
+
+    async def close(self) -> None:
+        """Wait for the queued writes to finish."""
+        await asyncio.gather(*self._tasks.values(), return_exceptions=True)
+
+    async def _write(self, type: str) -> None:
+        while self._pending[type]:
+            batch, self._pending[type] = self._pending[type], []
+            started = time.perf_counter()
+            stats = self.stats[type]
+            try:
+                buckets = await self._get_buckets(type)
+                touched = set()
+                async with RedisBulkWriter(self.redis_client) as writer:
+                    for timestamp, changed, removed in batch:
+                        await self._write_refresh(writer, type, buckets,
+                                                  touched, timestamp,
+                                                  changed, removed)
+                    await self._write_open_buckets(writer, type, buckets,
+                                                   touched)
+                stats['writes'] += 1
+                stats['commands'] += writer.commands
+            except Exception as e:
+                stats['failed'] += 1
+                # Reload the open buckets from Redis on the next write.
+                self._buckets.pop(type, None)
+                logger.error(f'Failed to write {type} rate history: {e}',
+                             exc_info=True)
+            stats['seconds'] = round(time.perf_counter() - started, 4)
+
+    async def _get_buckets(self, type: str) -> dict[str, dict[str, list]]:
+        """Return the open buckets, restored from Redis after a restart."""
+        if type in self._buckets:
+            return self._buckets[type]
+        buckets = {}
+        for resolution in self.RESOLUTIONS:
+            stored = await self.redis_client.hgetall(
+                self.OPEN_BUCKETS_KEY.format(exchanger=self.exchanger,
+                                             type=type,
+                                             resolution=resolution))
+            buckets[resolution] = {
+                pair: [int(start), Decimal(low), Decimal(high),
+                       Decimal(last)]
+                for pair, (start, low, high, last) in (
+                    (pair, value.split(RatesSchema.PACKED_SEPARATOR))
+                    for pair, value in stored.items())
+            }
+        self._buckets[type] = buckets
+        return buckets
+
+    async def _write_refresh(
+            self, writer: RedisBulkWriter, type: str,
+            buckets: dict[str, dict[str, list]], touched: set[str],
+            timestamp: float, changed: dict[str, dict[str, str]],
+            removed: list[tuple[str, str]]) -> None:
+        raw_minid = int((timestamp - self.retention[self.RAW]) * 1000)
+        for from_coin, targets in changed.items():
+            for to_coin, value in targets.items():
+                (in_amount, out_amount, _, _, _, min_amount,
+                 max_amount, *_) = value.split(RatesSchema.PACKED_SEPARATOR)
+                raw_key = self.RAW_KEY.format(
+                    exchanger=self.exchanger, type=type,
+                    from_coin=from_coin, to_coin=to_coin)
+                await writer.add(
+                    'xadd', raw_key,
+                    {'in': in_amount, 'out': out_amount,
+                     'min': min_amount, 'max': max_amount},
+                    minid=raw_minid, approximate=True)
+                # Set on every write, so the stream of a pair that stops
+                # changing still goes once its entries are out of range.
+                await writer.add('expire', raw_key, self.retention[self.RAW])
+
+                if not Decimal(in_amount):
+                    # No rate to roll up without an in amount.
+                    continue
+                rate = Decimal(out_amount) / Decimal(in_amount)
+                pair = self.PAIR_FIELD.format(from_coin=from_coin,
+                                              to_coin=to_coin)
+                touched.add(pair)
+                for resolution, seconds in self.RESOLUTIONS.items():
+                    start = int(timestamp // seconds * seconds)
+                    bucket = buckets[resolution].get(pair)
+                    if bucket is not None and bucket[0] == start:
+                        bucket[1] = min(bucket[1], rate)
+                        bucket[2] = max(bucket[2], rate)
+                        bucket[3] = rate
+                        continue
+                    if bucket is not None:
+                        await self._close_bucket(writer, type, resolution,
+                                                 from_coin, to_coin, bucket,
+                                                 timestamp)
+                    buckets[resolution][pair] = [start, rate, rate, rate]
+
+        for from_coin, to_coin in removed:
+            pair = self.PAIR_FIELD.format(from_coin=from_coin,
+                                          to_coin=to_coin)
+            touched.discard(pair)
+            for resolution in self.RESOLUTIONS:
+                bucket = buckets[resolution].pop(pair, None)
+                if bucket is not None:
+                    await self._close_bucket(writer, type, resolution,
+                                             from_coin, to_coin, bucket,
+                                             timestamp)
+                    await writer.add(
+                        'hdel', self.OPEN_BUCKETS_KEY.format(
+                            exchanger=self.exchanger, type=type,
+                            resolution=resolution),
+                        pair)
+
+    async def _close_bucket(self, writer: RedisBulkWriter, type: str,
+                            resolution: str, from_coin: str, to_coin: str,
+                            bucket: list, timestamp: float) -> None:
+        key = self.ROLLUP_KEY.format(exchanger=self.exchanger, type=type,
+                                     resolution=resolution,
+                                     from_coin=from_coin, to_coin=to_coin)
+        retention = self.retention[resolution]
+        await writer.add('xadd', key, self._pack_bucket(bucket),
+                         minid=int((timestamp - retention) * 1000),
+                         approximate=True)
+        await writer.add('expire', key, retention)
+
+    async def _write_open_buckets(self, writer: RedisBulkWriter, type: str,
+                                  buckets: dict[str, dict[str, list]],
+                                  touched: set[str]) -> None:
+        if not touched:
+            return
+        for resolution, open_buckets in buckets.items():
+            await writer.add(
+                'hset',
+                self.OPEN_BUCKETS_KEY.format(exchanger=self.exchanger,
+                                             type=type, resolution=resolution),
+                mapping={
+                    pair: RatesSchema.PACKED_SEPARATOR.join(
+                        self._pack_bucket(bucket).values())
+                    for pair, bucket in open_buckets.items()
+                    if pair in touched
+                }
+            )
+
+    @staticmethod
+    def _pack_bucket(bucket: list) -> dict[str, str]:
+        start, low, high, last = bucket
+        return {'start': str(start),
+                **{name: RatesSchema._pack_decimal(value)
+                   for name, value in (('min', low), ('max', high),
+                                       ('last', last))}}
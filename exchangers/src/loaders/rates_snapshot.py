@@ -0,0 +1,141 @@
+import logging
+import os
+import struct
+import tempfile
+import time
+from array import array
+from decimal import Decimal
+
+from src.api.ffio.schemas import RatesSchema
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b'FFRS'
+VERSION = 3
+# magic, version, generation, published_at, codes, pairs, codes blob size,
+# overflow rates, overflow blob size
+HEADER = struct.Struct('<4sHxxQdIIIII')
+DECIMAL_FIELDS = ('in_amount', 'out_amount', 'amount', 'tofee',
+                  'min_amount', 'max_amount', 'quote_rate', 'to_min_amount',
+                  'to_max_amount')
+# tofee currency index meaning "same as the to-coin"
+TOFEE_SAME = -1
+# exponent meaning "no value", used for a missing tofee or quote
+EXPONENT_NONE = -128
+# overflow index of rows whose values all fit the numeric columns
+NO_OVERFLOW = -1
+ALIGNMENT = 8
+
+
+def _split_decimal(value: Decimal | None) -> tuple[int, int]:
+    """Split a decimal into an int64 mantissa and an int8 exponent."""
+    if value is None:
+        return 0, EXPONENT_NONE
+    sign, digits, exponent = value.normalize().as_tuple()
+    mantissa = int(''.join(map(str, digits)))
+    if exponent > 0:
+        mantissa, exponent = mantissa * 10 ** exponent, 0
+    if not -2 ** 63 <= mantissa < 2 ** 63 or not -127 <= exponent <= 127:
+        raise ValueError(f'{value} does not fit the snapshot columns')
+    return -mantissa if sign else mantissa, exponent
+
+
+def _pad(buffer: bytearray) -> None:
+    buffer.extend(b'\0' * (-len(buffer) % ALIGNMENT))
+
+
+def _strings_section(strings: list[bytes]) -> tuple[array, bytes]:
+    offsets = array('I', [0])
+    for string in strings:
+        offsets.append(offsets[-1] + len(string))
+    return offsets, b''.join(strings)
+
+
+def build_rates_snapshot(generation: int,
+                         rates: dict[tuple[str, str], str]) -> bytes:
+    """Serialize packed rates of one generation into the snapshot format.
+
+    Sections follow the header in this order, each padded to 8 bytes:
+    ``uint32[codes + 1]`` code offsets into the blob, the blob of sorted
+    UTF-8 codes, ``uint32[codes + 1]`` first row of every from-code,
+    ``uint32[pairs]`` to-code indexes, ``int32[pairs]`` tofee currency
+    indexes, ``int32[pairs]`` overflow indexes, ``uint32[overflow + 1]``
+    overflow offsets and the blob of overflow rates, then an
+    ``int64[pairs]`` mantissa column and an ``int8[pairs]`` exponent
+    column for every field of ``DECIMAL_FIELDS``.
+
+    Rows are sorted by from-code and to-code index. A rate with a value
+    that does not fit the columns is kept as its packed string in the
+    overflow blob instead. Columns use the host byte order, since the
+    file is only shared between processes on the host that wrote it.
+    """
+    rows = []
+    codes = set()
+    overflow = []
+    for (from_coin, to_coin), value in rates.items():
+        rate = RatesSchema.unpack(from_coin, to_coin, value)
+        try:
+            columns = [_split_decimal(getattr(rate, field))
+                       for field in DECIMAL_FIELDS]
+            overflow_index = NO_OVERFLOW
+        except ValueError:
+            columns = [(0, EXPONENT_NONE)] * len(DECIMAL_FIELDS)
+            overflow_index = len(overflow)
+            overflow.append(value.encode())
+        codes.update((from_coin, to_coin, rate.tofee_currency))
+        rows.append((from_coin, to_coin, rate.tofee_currency, columns,
+                     overflow_index))
+
+    codes = sorted(codes)
+    index = {code: i for i, code in enumerate(codes)}
+    rows.sort(key=lambda row: (index[row[0]], index[row[1]]))
+
+    code_offsets, blob = _strings_section(
+        [code.encode() for code in codes])
+    overflow_offsets, overflow_blob = _strings_section(overflow)
+
+    first_rows = array('I', [0] * (len(codes) + 1))
+    for row in rows:
+        first_rows[index[row[0]] + 1] += 1
+    for i in range(len(codes)):
+        first_rows[i + 1] += first_rows[i]
+
+    buffer = bytearray(HEADER.pack(MAGIC, VERSION, generation, time.time(),
+                                   len(codes), len(rows), len(blob),
+                                   len(overflow), len(overflow_blob)))
+    _pad(buffer)
+    for section in (code_offsets, blob, first_rows):
+        buffer.extend(section)
+        _pad(buffer)
+    buffer.extend(array('I', [index[row[1]] for row in rows]))
+    _pad(buffer)
+    buffer.extend(array('i', [
+        TOFEE_SAME if row[2] == row[1] else index[row[2]] for row in rows]))
+    _pad(buffer)
+    buffer.extend(array('i', [row[4] for row in rows]))
+    _pad(buffer)
+    for section in (overflow_offsets, overflow_blob):
+        buffer.extend(section)
+        _pad(buffer)
+    for field in range(len(DECIMAL_FIELDS)):
+        buffer.extend(array('q', [row[3][field][0] for row in rows]))
+        _pad(buffer)
+        buffer.extend(array('b', [row[3][field][1] for row in rows]))
+        _pad(buffer)
+    return bytes(buffer)
+
+
+def write_rates_snapshot(path: str, generation: int,
+                         rates: dict[tuple[str, str], str]) -> None:
+    """Write a snapshot next to ``path`` and atomically move it in place."""
+    data = build_rates_snapshot(generation, rates)
+    directory = os.path.dirname(path) or '.'
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as file:
+            file.write(data)
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
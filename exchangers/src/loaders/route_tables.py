@@ -0,0 +1,62 @@
+import base64
+
+import numpy as np
+
+from src.api.ffio.schemas import RatesSchema
+
+# Packed fields used by the tables: in, out, amount, tofee, tofee
+# currency, min, max.
+FIELDS = 7
+INDEX_DTYPE = '<i4'
+VALUE_DTYPE = '<f8'
+
+
+def _encode(values: np.ndarray, dtype: str) -> str:
+    return base64.b64encode(
+        np.ascontiguousarray(values, dtype=dtype).tobytes()).decode()
+
+
+def build_route_tables(rates: dict[tuple[str, str], str]) -> dict[str, str]:
+    """Build the route graph tables of a rates generation.
+
+    Every packed rate with a positive ``in`` is an edge with its
+    ``out / in`` ratio, its ``-log`` as the weight, ``tofee`` and the
+    ``min``/``max`` limits in the from-currency. Edges are sorted by
+    from-node, with a CSR offset array per node, so the bot only loads
+    the arrays. Codes are joined by spaces and the arrays are stored as
+    base64 of their little-endian bytes.
+    """
+    pairs = list(rates.items())
+    columns = list(zip(*(
+        value.split(RatesSchema.PACKED_SEPARATOR, FIELDS)
+        for _, value in pairs))) or [()] * FIELDS
+    in_amount = np.array(columns[0], dtype=float)
+    # A zero in amount has no ratio, so the pair is left out of routes.
+    valid = in_amount > 0
+
+    codes = sorted({code for pair in rates for code in pair})
+    index = {code: i for i, code in enumerate(codes)}
+    size = len(pairs)
+    src = np.fromiter((index[from_code] for (from_code, _), _ in pairs),
+                      dtype=np.int32, count=size)
+    dst = np.fromiter((index[to_code] for (_, to_code), _ in pairs),
+                      dtype=np.int32, count=size)
+    order = np.flatnonzero(valid)[np.lexsort((dst[valid], src[valid]))]
+
+    ratio = (np.array(columns[1], dtype=float)[order] / in_amount[order])
+    with np.errstate(divide='ignore'):
+        weight = -np.log(ratio)
+    fee = np.array([tofee or 0 for tofee in columns[3]], dtype=float)
+    offsets = np.searchsorted(src[order], np.arange(len(codes) + 1))
+    return {
+        'codes': ' '.join(codes),
+        'offsets': _encode(offsets, INDEX_DTYPE),
+        'dst': _encode(dst[order], INDEX_DTYPE),
+        'ratio': _encode(ratio, VALUE_DTYPE),
+        'weight': _encode(weight, VALUE_DTYPE),
+        'fee': _encode(fee[order], VALUE_DTYPE),
+        'min': _encode(np.array(columns[5], dtype=float)[order],
+                       VALUE_DTYPE),
+        'max': _encode(np.array(columns[6], dtype=float)[order],
+                       VALUE_DTYPE),
+    }
@@ -0,0 +1,91 @@
+import asyncio
+import logging
+
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.sql import text
+
+from .transaction import TransactionStatuses
+
+logger = logging.getLogger(__name__)
+
+# Serialises migrations of replicas starting together; arbitrary but
+# fixed.
+MIGRATION_LOCK_ID = 7305157440
+MIGRATION_LOCK = f'SELECT pg_try_advisory_lock({MIGRATION_LOCK_ID})'
+MIGRATION_UNLOCK = f'SELECT pg_advisory_unlock({MIGRATION_LOCK_ID})'
+# Seconds between attempts to take the migration lock.
+MIGRATION_LOCK_RETRY = 1
+
+TABLE_EXISTS = """SELECT to_regclass('"transaction"') IS NOT NULL"""
+EXISTING_COLUMNS = (
+    'SELECT column_name FROM information_schema.columns '
+    "WHERE table_schema = current_schema() AND table_name = 'transaction'"
+)
+INVALID_INDEX = (
+    'SELECT 1 FROM pg_index JOIN pg_class '
+    'ON pg_class.oid = pg_index.indexrelid '
+    'WHERE pg_class.relname = :name AND NOT pg_index.indisvalid'
+)
+
+# Claim columns of the transactions service, missing from tables created
+# before them.
+COLUMNS_DDL = {
+    'claimed_by': ('ALTER TABLE "transaction" ADD COLUMN IF NOT EXISTS '
+                   'claimed_by VARCHAR(255)'),
+    'lease_expires_at': ('ALTER TABLE "transaction" ADD COLUMN IF NOT '
+                         'EXISTS lease_expires_at TIMESTAMP WITHOUT TIME '
+                         'ZONE'),
+    'create_started_at': ('ALTER TABLE "transaction" ADD COLUMN IF NOT '
+                          'EXISTS create_started_at TIMESTAMP WITHOUT TIME '
+                          'ZONE'),
+}
+INDEXES_DDL = {
+    'ix_transaction_new': (
+        'CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_transaction_new '
+        'ON "transaction" (created_on) '
+        f"WHERE status = '{TransactionStatuses.NEW}'"
+    ),
+    'ix_transaction_active': (
+        'CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_transaction_active '
+        'ON "transaction" (id) '
+        f"WHERE status NOT IN ('{TransactionStatuses.NEW}', "
+        f"'{TransactionStatuses.DONE}', '{TransactionStatuses.ERROR}')"
+    ),
+}
+DROP_INDEX = 'DROP INDEX CONCURRENTLY IF EXISTS {name}'
+
+
+async def migrate_models(db: AsyncEngine) -> None:
+    """Add the claim columns and indexes to an existing transaction table.
+
+    Statements run outside a transaction. A column is only added when it
+    is missing, as ``ALTER TABLE`` locks the whole table, and indexes are
+    built ``CONCURRENTLY`` so writes go on meanwhile; an invalid index
+    left by a failed build is dropped and built again. Replicas starting
+    together take turns through a session advisory lock, polled so that
+    no waiting transaction holds up the index builds. A missing table is
+    left to the bot's ``init_models``, which creates it complete.
+    """
+    async with db.connect() as connection:
+        await connection.execution_options(isolation_level='AUTOCOMMIT')
+        while not (await connection.execute(text(MIGRATION_LOCK))).scalar():
+            await asyncio.sleep(MIGRATION_LOCK_RETRY)
+        try:
+            if not (await connection.execute(text(TABLE_EXISTS))).scalar():
+                return
+            existing = set((await connection.execute(
+                text(EXISTING_COLUMNS))).scalars())
+            for column, ddl in COLUMNS_DDL.items():
+                if column not in existing:
+                    await connection.execute(text(ddl))
+                    logger.info(f'Added transaction column {column}')
+            for name, ddl in INDEXES_DDL.items():
+                invalid = (await connection.execute(
+                    text(INVALID_INDEX), {'name': name})).first()
+                if invalid:
+                    logger.warning(f'Rebuilding invalid index {name}')
+                    await connection.execute(
+                        text(DROP_INDEX.format(name=name)))
+                await connection.execute(text(ddl))
+        finally:
+            await connection.execute(text(MIGRATION_UNLOCK))
@@ -0,0 +1,47 @@
+from sqlalchemy import (Boolean, Column, DateTime, DECIMAL, Enum, ForeignKey,
+                        Index, String)
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.orm import relationship
+from sqlalchemy.sql import text
+
+from .transaction import RateTypes
+from src.database import BaseModel
+
+
+class AlertDirections:
+    ABOVE = 'above'  # Fire when the rate rises to the threshold
+    BELOW = 'below'  # Fire when the rate falls to the threshold
+    CHOICES = (ABOVE, BELOW)
+
+
+class PriceAlert(BaseModel):
+    __tablename__ = 'price_alert'
+    __table_args__ = (
+        Index('ix_price_alert_updated_on', 'updated_on'),
+        Index('ix_price_alert_pending', 'is_notified',
+              postgresql_where=text('is_triggered AND NOT is_notified')),
+    )
+    user_id = Column(UUID(as_uuid=True), ForeignKey('user.id'),
+                     nullable=False)
+    rate_type = Column(Enum(*RateTypes.CHOICES, name='transaction_types'),
+                       nullable=False)
+    from_currency = Column(String(10), nullable=False)
+    from_currency_network = Column(String(10), nullable=False)
+    to_currency = Column(String(10), nullable=False)
+    to_currency_network = Column(String(10), nullable=False)
+    # Exchange codes the rates are stored under
+    from_code = Column(String(20), nullable=False)
+    to_code = Column(String(20), nullable=False)
+    direction = Column(Enum(*AlertDirections.CHOICES,
+                            name='alert_directions'),
+                       nullable=False)
+    # Rate as the to-amount of one from-unit (out / in)
+    threshold = Column(DECIMAL(precision=50, scale=10), nullable=False)
+
+    is_active = Column(Boolean, nullable=False, default=True)
+    is_triggered = Column(Boolean, nullable=False, default=False)
+    triggered_rate = Column(DECIMAL(precision=50, scale=10), nullable=True)
+    triggered_on = Column(DateTime, nullable=True)
+    is_notified = Column(Boolean, nullable=False, default=False)
+
+    user = relationship('User', lazy='joined')
@@ -0,0 +1,153 @@
+import asyncio
+import json
+import logging
+import random
+import time
+from dataclasses import dataclass
+from typing import Awaitable, Callable
+
+from redis.asyncio import StrictRedis
+
+from src.config import config
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Feed:
+    """Schedule and state of one feed."""
+
+    name: str
+    # Returns True when the feed changed, False when it was unchanged.
+    load: Callable[[], Awaitable[bool]]
+    interval: float
+    next_run: float = 0.0
+    task: asyncio.Task | None = None
+    requested: bool = False
+    failures: int = 0
+    runs: int = 0
+    changes: int = 0
+    last_success: float | None = None
+    last_change: float | None = None
+    last_duration: float = 0.0
+
+
+class FeedScheduler:
+    """Run every feed on its own interval.
+
+    A feed never overlaps itself: the next run is planned only when the
+    current one has finished. After a run the feed waits its interval,
+    ``REFRESH_CHANGED_FACTOR`` of it when the run saw a change, as
+    changes tend to come in bursts, or an exponential backoff capped at
+    ``REFRESH_MAX_BACKOFF`` after a failure. Every delay is spread by
+    ``REFRESH_JITTER`` so feeds do not drift into lockstep.
+    ``request_refresh()`` brings a feed forward, e.g. the currencies when
+    a rate feed lists an unknown code.
+
+    After every run the feed's state is written to ``status_key`` (field
+    per feed, JSON with ``last_success``, ``last_change`` and
+    ``failures``), so the age of a feed can be read by other services.
+    """
+
+    def __init__(self, redis_client: StrictRedis, status_key: str) -> None:
+        self.redis_client = redis_client
+        self.status_key = status_key
+        self.feeds: dict[str, Feed] = {}
+        self._wakeup = asyncio.Event()
+
+    def add_feed(self, name: str, load: Callable[[], Awaitable[bool]],
+                 interval: float) -> None:
+        self.feeds[name] = Feed(name, load, interval)
+
+    def request_refresh(self, name: str) -> None:
+        feed = self.feeds.get(name)
+        if feed is None or feed.requested:
+            return
+        logger.info(f'{name} refresh requested')
+        feed.requested = True
+        if feed.task is None:
+            feed.next_run = time.monotonic()
+            self._wakeup.set()
+
+    async def run(self) -> None:
+        try:
+            while True:
+                now = time.monotonic()
+                for feed in self.feeds.values():
+                    if feed.task is None and feed.next_run <= now:
+                        feed.task = asyncio.create_task(self._run_feed(feed))
+                waiting = [feed.next_run for feed in self.feeds.values()
+                           if feed.task is None]
+                timeout = max(min(waiting) - now, 0) if waiting else None
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout)
+                except TimeoutError:
+                    pass
+        finally:
+            tasks = [feed.task for feed in self.feeds.values() if feed.task]
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _run_feed(self, feed: Feed) -> None:
+        feed.requested = False
+        started = time.monotonic()
+        try:
+            changed = await feed.load()
+        except Exception as e:
+            feed.failures += 1
+            delay = min(feed.interval * 2 ** feed.failures,
+                        config.REFRESH_MAX_BACKOFF)
+            logger.error(f'{feed.name} refresh failed ({feed.failures} in a '
+                         f'row), retrying in {delay:.0f}s: {e}',
+                         exc_info=True)
+        else:
+            feed.failures = 0
+            feed.last_success = time.time()
+            delay = feed.interval
+            if changed:
+                feed.changes += 1
+                feed.last_change = feed.last_success
+                delay *= config.REFRESH_CHANGED_FACTOR
+        finally:
+            feed.runs += 1
+            feed.last_duration = round(time.monotonic() - started, 3)
+            feed.task = None
+            self._wakeup.set()
+
+        delay *= 1 + random.uniform(-config.REFRESH_JITTER,
+                                    config.REFRESH_JITTER)
+        feed.next_run = (time.monotonic() if feed.requested
+                         else started + delay)
+        await self._write_status(feed)
+        logger.info(f'{feed.name} feed: {self.get_stats()[feed.name]}')
+
+    async def _write_status(self, feed: Feed) -> None:
+        try:
+            await self.redis_client.hset(self.status_key, feed.name,
+                                         json.dumps({
+                                             'last_success':
+                                                 feed.last_success,
+                                             'last_change': feed.last_change,
+                                             'failures': feed.failures,
+                                         }))
+        except Exception as e:
+            logger.error(f'Failed to write {feed.name} feed status: {e}',
+                         exc_info=True)
+
+    def get_stats(self) -> dict[str, dict]:
+        now = time.time()
+        monotonic = time.monotonic()
+        return {
+            feed.name: {
+                'last_success_age': (
+                    None if feed.last_success is None
+                    else round(now - feed.last_success, 1)),
+                'next_in': (None if feed.task is not None
+                            else round(max(feed.next_run - monotonic, 0), 1)),
+                'runs': feed.runs,
+                'changes': feed.changes,
+                'failures': feed.failures,
+                'seconds': feed.last_duration,
+            }
+            for feed in self.feeds.values()
+        }
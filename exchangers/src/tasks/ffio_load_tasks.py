@@ -1,13 +1,32 @@
-import asyncio
-
+from src.config import config
 from src.loaders import LoadFFIODataToRedis
+from .feed_scheduler import FeedScheduler
+from .leader_election import LeaderElection
 
 loader = LoadFFIODataToRedis()
 
 
-def get_tasks():
-    return [
-        asyncio.create_task(loader.load_currencies_and_networks()),
-        asyncio.create_task(loader.load_fixed_rates()),
-        asyncio.create_task(loader.load_float_rates())
-    ]
+def get_scheduler() -> FeedScheduler:
+    scheduler = FeedScheduler(
+        loader.redis_client,
+        loader.FEED_STATUS_KEY.format(exchanger=loader.EXCHANGER)
+    )
+    scheduler.add_feed(loader.CURRENCIES_FEED,
+                       loader.load_currencies_and_networks,
+                       config.CCIES_REFRESH_INTERVAL)
+    scheduler.add_feed(loader.api_client.FIXED_FEED, loader.load_fixed_rates,
+                       config.FIXED_REFRESH_INTERVAL)
+    scheduler.add_feed(loader.api_client.FLOAT_FEED, loader.load_float_rates,
+                       config.FLOAT_REFRESH_INTERVAL)
+    loader.refresh_requested = scheduler.request_refresh
+    return scheduler
+
+
+def get_election() -> LeaderElection:
+    return LeaderElection(
+        loader.redis_client,
+        loader.LEADER_KEY.format(exchanger=loader.EXCHANGER),
+        loader.LEADER_TOKEN_KEY.format(exchanger=loader.EXCHANGER),
+        loader.REPLICA_KEY.format(exchanger=loader.EXCHANGER,
+                                  instance='{instance}')
+    )
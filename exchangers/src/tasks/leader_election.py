@@ -0,0 +1,192 @@
+import asyncio
+import json
+import logging
+import os
+import socket
+import time
+
+from redis.asyncio import StrictRedis
+
+from src.config import config
+
+logger = logging.getLogger(__name__)
+
+
+class LeaderElection:
+    """Elect one replica of a service as leader with a Redis lease.
+
+    The lease is ``lease_key`` holding ``token|instance`` with a
+    ``LEADER_LEASE_TTL`` expiry, renewed every ``LEADER_RENEW_INTERVAL``
+    seconds by its holder. Every acquisition takes a new fencing token
+    from ``INCR`` of ``token_key``, so the highest token belongs to the
+    latest leader; writes guarded by the token (see
+    ``LoadFFIODataToRedis._publish_generation``) are refused once a newer
+    leader has been elected, even if the old one has not noticed yet.
+
+    Followers retry the lease on every renew tick, so a dead leader is
+    replaced within ``LEADER_LEASE_TTL + LEADER_RENEW_INTERVAL`` seconds.
+    Every replica writes its state to ``replica_key`` (expiring with a
+    few leases) after each tick.
+    """
+
+    # Takes the lease if it is free. Returns the new fencing token, or the
+    # current holder ``token|instance`` if the lease is taken.
+    ACQUIRE_SCRIPT = """
+    local holder = redis.call('GET', KEYS[1])
+    if holder then
+        return holder
+    end
+    local token = redis.call('INCR', KEYS[2])
+    redis.call('SET', KEYS[1], token .. '|' .. ARGV[1], 'PX', ARGV[2])
+    return token
+    """
+    # Extends the lease if it is still held with the given value.
+    RENEW_SCRIPT = """
+    if redis.call('GET', KEYS[1]) == ARGV[1] then
+        return redis.call('PEXPIRE', KEYS[1], ARGV[2])
+    end
+    return 0
+    """
+    RELEASE_SCRIPT = """
+    if redis.call('GET', KEYS[1]) == ARGV[1] then
+        return redis.call('DEL', KEYS[1])
+    end
+    return 0
+    """
+
+    LEADER = 'leader'
+    FOLLOWER = 'follower'
+
+    def __init__(self, redis_client: StrictRedis, lease_key: str,
+                 token_key: str, replica_key: str) -> None:
+        self.redis_client = redis_client
+        self.lease_key = lease_key
+        self.token_key = token_key
+        self.instance = f'{socket.gethostname()}:{os.getpid()}'
+        self.replica_key = replica_key.format(instance=self.instance)
+        self.ttl = config.LEADER_LEASE_TTL
+        self._check_timing()
+        self.token: int | None = None
+        self.holder: str | None = None
+        self.elected = asyncio.Event()
+        self.deposed = asyncio.Event()
+        self.deposed.set()
+        self._renewed_at = 0.0
+        self._acquire = redis_client.register_script(self.ACQUIRE_SCRIPT)
+        self._renew = redis_client.register_script(self.RENEW_SCRIPT)
+        self._release = redis_client.register_script(self.RELEASE_SCRIPT)
+        self.stats = {'elections': 0, 'failovers': 0, 'lost': 0,
+                      'renew_failures': 0}
+
+    def _check_timing(self) -> None:
+        if config.LEADER_RENEW_INTERVAL >= self.ttl:
+            raise ValueError('LEADER_RENEW_INTERVAL must be shorter than '
+                             'LEADER_LEASE_TTL')
+        failover = self.ttl + config.LEADER_RENEW_INTERVAL
+        interval = min(config.FIXED_REFRESH_INTERVAL,
+                       config.FLOAT_REFRESH_INTERVAL)
+        if failover > interval:
+            logger.warning(f'Leader failover takes up to {failover}s, longer '
+                           f'than the {interval}s feed refresh interval')
+
+    @property
+    def is_leader(self) -> bool:
+        return self.token is not None
+
+    @property
+    def _lease_value(self) -> str:
+        return f'{self.token}|{self.instance}'
+
+    async def run(self) -> None:
+        try:
+            while True:
+                try:
+                    if self.is_leader:
+                        await self._renew_lease()
+                    else:
+                        await self._acquire_lease()
+                except Exception as e:
+                    logger.error(f'Leader election failed: {e}',
+                                 exc_info=True)
+                    if (self.is_leader and time.monotonic() - self._renewed_at
+                            >= self.ttl):
+                        self._lose('lease expired while Redis was '
+                                   'unreachable')
+                await self._write_state()
+                await asyncio.sleep(config.LEADER_RENEW_INTERVAL)
+        finally:
+            await self.release()
+
+    async def _acquire_lease(self) -> None:
+        acquired_at = time.monotonic()
+        result = await self._acquire(keys=[self.lease_key, self.token_key],
+                                     args=[self.instance,
+                                           int(self.ttl * 1000)])
+        if isinstance(result, str):
+            if result != self.holder:
+                logger.info(f'Following leader {result}')
+            self.holder = result
+            return
+        previous, self.holder = self.holder, None
+        self.token = int(result)
+        self._renewed_at = acquired_at
+        self.stats['elections'] += 1
+        if previous is not None:
+            self.stats['failovers'] += 1
+            logger.warning(f'Took over leadership from {previous} with '
+                           f'token {self.token}')
+        else:
+            logger.info(f'Elected leader with token {self.token}')
+        self.deposed.clear()
+        self.elected.set()
+
+    async def _renew_lease(self) -> None:
+        renewed_at = time.monotonic()
+        renewed = await self._renew(keys=[self.lease_key],
+                                    args=[self._lease_value,
+                                          int(self.ttl * 1000)])
+        if renewed:
+            self._renewed_at = renewed_at
+            return
+        self.stats['renew_failures'] += 1
+        self._lose('lease was taken over or expired')
+
+    def _lose(self, reason: str) -> None:
+        logger.warning(f'Lost leadership with token {self.token}: {reason}')
+        self.token = None
+        self.stats['lost'] += 1
+        self.elected.clear()
+        self.deposed.set()
+
+    async def release(self) -> None:
+        """Give the lease up so a follower takes over at once."""
+        if not self.is_leader:
+            return
+        try:
+            await self._release(keys=[self.lease_key],
+                                args=[self._lease_value])
+            logger.info(f'Released leadership with token {self.token}')
+        except Exception as e:
+            logger.error(f'Failed to release leadership: {e}', exc_info=True)
+        self.token = None
+        self.elected.clear()
+        self.deposed.set()
+
+    async def _write_state(self) -> None:
+        try:
+            await self.redis_client.set(
+                self.replica_key, json.dumps(self.get_stats()),
+                ex=int(self.ttl * 3))
+        except Exception as e:
+            logger.error(f'Failed to write replica state: {e}',
+                         exc_info=True)
+
+    def get_stats(self) -> dict:
+        return {
+            'instance': self.instance,
+            'role': self.LEADER if self.is_leader else self.FOLLOWER,
+            'token': self.token,
+            'leader': self._lease_value if self.is_leader else self.holder,
+            'updated_at': time.time(),
+            **self.stats,
+        }
@@ -0,0 +1,168 @@
+import logging
+import os
+import socket
+import uuid
+from datetime import datetime, timedelta
+
+from sqlalchemy import or_, update
+from sqlalchemy.future import select
+
+from src.config import config
+from src.database import get_session
+from src.models import Transaction, TransactionStatuses
+
+logger = logging.getLogger(__name__)
+
+
+class TransactionClaimer:
+    """Claim NEW transactions for one worker of the transactions service.
+
+    A claim moves a bounded batch of NEW rows to HANDLED in one
+    ``UPDATE ... WHERE id IN (SELECT ... FOR UPDATE SKIP LOCKED)
+    RETURNING id`` and stamps them with ``claimed_by`` and
+    ``lease_expires_at``: rows locked by another worker's claim are
+    skipped instead of waited for, so any number of replicas can claim
+    at once without ever getting the same row.
+
+    Claims run at READ COMMITTED, as the SERIALIZABLE default of the
+    engine would abort one of two concurrent claims instead of letting
+    them skip each other's rows. A worker keeps its leases alive with
+    ``renew_leases()`` while it polls its transactions and gives them up
+    with ``release()`` once it stops, and takes over the unfinished
+    transactions of dead workers with ``recover()``.
+    """
+
+    CLAIM_OPTIONS = {'isolation_level': 'READ COMMITTED'}
+    FINAL_STATUSES = (TransactionStatuses.DONE, TransactionStatuses.ERROR)
+
+    def __init__(self, worker_id: str | None = None) -> None:
+        self.worker_id = (worker_id or config.TRANSACTIONS_WORKER_ID
+                          or f'{socket.gethostname()}:{os.getpid()}')
+        self.lease = timedelta(seconds=config.TRANSACTIONS_CLAIM_LEASE)
+
+    async def claim(
+            self, limit: int = config.TRANSACTIONS_CLAIM_BATCH_SIZE,
+            transaction_ids: list[str] | None = None) -> list[uuid.UUID]:
+        """Claim up to ``limit`` NEW transactions, oldest first.
+
+        With ``transaction_ids`` only those are claimed. Returns the ids
+        of the claimed transactions.
+        """
+        candidates = (
+            select(Transaction.id)
+            .where(Transaction.status == TransactionStatuses.NEW)
+            .order_by(Transaction.created_on)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        )
+        if transaction_ids is not None:
+            candidates = candidates.where(Transaction.id.in_(transaction_ids))
+        now = datetime.now()
+        async with get_session() as session:
+            await session.connection(execution_options=self.CLAIM_OPTIONS)
+            result = await session.execute(
+                update(Transaction)
+                .where(Transaction.id.in_(candidates.scalar_subquery()))
+                .values(status=TransactionStatuses.HANDLED,
+                        claimed_by=self.worker_id,
+                        lease_expires_at=now + self.lease,
+                        updated_on=now)
+                .returning(Transaction.id)
+                .execution_options(synchronize_session=False)
+            )
+            claimed = list(result.scalars().all())
+            await session.commit()
+        return claimed
+
+    async def renew_leases(self, transaction_ids: list[uuid.UUID]) -> int:
+        """Extend the worker's leases of the given transactions.
+
+        Only the transactions the worker still polls are passed, so the
+        renewal does not grow with the history of the worker. Returns the
+        number of renewed leases.
+        """
+        renewed = 0
+        for batch in self._batches(transaction_ids):
+            now = datetime.now()
+            renewed += await self._update_leases(
+                batch, lease_expires_at=now + self.lease)
+        return renewed
+
+    async def release(self, transaction_ids: list[uuid.UUID]) -> int:
+        """Give up the worker's claims of the given transactions."""
+        released = 0
+        for batch in self._batches(transaction_ids):
+            released += await self._update_leases(
+                batch, claimed_by=None, lease_expires_at=None)
+        return released
+
+    @staticmethod
+    def _batches(transaction_ids: list[uuid.UUID]):
+        size = config.TRANSACTIONS_CLAIM_BATCH_SIZE
+        for start in range(0, len(transaction_ids), size):
+            yield transaction_ids[start:start + size]
+
+    async def _update_leases(self, transaction_ids: list[uuid.UUID],
+                             **values) -> int:
+        async with get_session() as session:
+            await session.connection(execution_options=self.CLAIM_OPTIONS)
+            result = await session.execute(
+                update(Transaction)
+                .where(Transaction.id.in_(transaction_ids),
+                       Transaction.claimed_by == self.worker_id)
+                # A lease is not a change of the transaction.
+                .values(updated_on=Transaction.updated_on, **values)
+                .execution_options(synchronize_session=False)
+            )
+            await session.commit()
+        return result.rowcount
+
+    async def recover(
+            self, after: uuid.UUID | None = None, include_own: bool = False,
+            limit: int = config.TRANSACTIONS_CLAIM_BATCH_SIZE
+    ) -> list[tuple[uuid.UUID, str, datetime | None]]:
+        """Claim up to ``limit`` unfinished transactions with a lost lease.
+
+        A lease is lost once it has expired; with ``include_own`` the
+        worker's own leases count as lost too, which is what a restarted
+        worker with a stable ``worker_id`` wants. Expired orders that
+        ``PollingPolicy`` has given up on stay unclaimed. Transactions come
+        in id order after ``after``, for the next batch to continue from
+        the last id. Returns ``(id, status, time_expiration)`` tuples.
+        """
+        now = datetime.now()
+        lost = [Transaction.lease_expires_at.is_(None),
+                Transaction.lease_expires_at < now]
+        if include_own:
+            lost.append(Transaction.claimed_by == self.worker_id)
+        given_up = now - timedelta(seconds=config.ORDER_POLL_EXPIRED_GIVE_UP)
+        candidates = (
+            select(Transaction.id)
+            # Matches the predicate of the ix_transaction_active index.
+            .where(Transaction.status.not_in(
+                       (TransactionStatuses.NEW, *self.FINAL_STATUSES)),
+                   or_(*lost),
+                   or_(Transaction.status != TransactionStatuses.EXPIRED,
+                       Transaction.updated_on >= given_up))
+            .order_by(Transaction.id)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        )
+        if after is not None:
+            candidates = candidates.where(Transaction.id > after)
+        async with get_session() as session:
+            await session.connection(execution_options=self.CLAIM_OPTIONS)
+            result = await session.execute(
+                update(Transaction)
+                .where(Transaction.id.in_(candidates.scalar_subquery()))
+                # Taking a transaction over is not a change of it.
+                .values(claimed_by=self.worker_id,
+                        lease_expires_at=now + self.lease,
+                        updated_on=Transaction.updated_on)
+                .returning(Transaction.id, Transaction.status,
+                           Transaction.time_expiration)
+                .execution_options(synchronize_session=False)
+            )
+            recovered = [tuple(row) for row in result.all()]
+            await session.commit()
+        return recovered
@@ -1,21 +1,21 @@
-import asyncio
 import logging
+import uuid
 
-from src.models import Transaction, TransactionStatuses
-from .ffio_transaction import FFioTransaction
+from .order_poller import OrderPoller
 
 logger = logging.getLogger(__name__)
 
 
 class TransactionDispatcher:
-    """Dispatch transaction to a exchanger."""
+    """Dispatch claimed transactions to a exchanger."""
 
-    async def get_best_exchanger(self, transaction: Transaction) -> None:
-        if transaction.status == TransactionStatuses.HANDLED:
-            asyncio.create_task(FFioTransaction(transaction.id).process())
-            return
-        raise ValueError('In dispatcher the transaction status '
-                         'should be always new')
+    def __init__(self, poller: OrderPoller) -> None:
+        self.poller = poller
 
-    async def add(self, transaction: Transaction) -> None:
-        await self.get_best_exchanger(transaction)
+    async def get_best_exchanger(self, transaction_id: uuid.UUID) -> None:
+        self.poller.add(transaction_id)
+
+    async def add(self, transaction_ids: list[uuid.UUID]) -> None:
+        """Start processing transactions claimed as HANDLED."""
+        for transaction_id in transaction_ids:
+            await self.get_best_exchanger(transaction_id)
@@ -1,10 +1,13 @@
-import asyncio
 import logging
 from datetime import datetime
 
+import aiohttp
+import redis.exceptions
+from sqlalchemy import update
 from sqlalchemy.future import select
 
 from . import transaction_codes as tc
+from .polling_policy import OrderState, PollingPolicy
 from src import exceptions as ex
 from src.api import exceptions as api_ex
 from src.api.ffio import schemas
@@ -16,64 +19,149 @@ from src.models import (
 
 logger = logging.getLogger(__name__)
 
+# Errors after which the poll is retried, as the order itself is fine.
+TRANSIENT_ERRORS = (
+    ex.DatabaseError,
+    ex.RedisError,
+    redis.exceptions.RedisError,
+    aiohttp.ClientError,
+    TimeoutError,
+    api_ex.NetworkError,
+    api_ex.TimeoutError,
+)
 
-class FFioTransaction:
-
-    def __init__(self, transaction_id: str) -> None:
-        self.transaction_id = transaction_id
-
-    async def process(self) -> None:
-        logger.info('Handled by ffio')
-        try:
-            sleep_time = 5
-            expired_retries = 0
-            while expired_retries < 60*24:
-                try:
-                    transaction = await self._get_transaction()
-                except ex.DatabaseError as e:
-                    logger.error('Database error while fetching transaction '
-                                 f'{self.transaction_id}: {e}', exc_info=True)
-                    break
-
-                if not transaction:
-                    logger.warning(
-                        f'Transaction {self.transaction_id} not found.')
-                    break
 
-                if transaction.status == TransactionStatuses.NEW:
-                    logger.error('Invalid transaction status NEW '
-                                 f'for {self.transaction_id}')
-                    break
-
-                stop_processing_statuses = (
-                    TransactionStatuses.DONE,
-                    TransactionStatuses.ERROR
-                )
-                if transaction.status in stop_processing_statuses:
-                    logger.info('Stopping processing for transaction '
-                                f'{self.transaction_id} with status '
-                                f'{transaction.status}')
-                    break
+class FFioTransaction:
+    """Drive one ffio order, one poll per ``step()``.
 
-                if transaction.status == TransactionStatuses.EXPIRED:
-                    sleep_time = 60
-                    expired_retries += 1
+    ``OrderPoller`` calls ``step()`` whenever the returned delay has
+    passed. The delay comes from the ``PollingPolicy``.
+    """
 
-                try:
-                    if transaction.status == TransactionStatuses.HANDLED:
-                        await self._handle_new(transaction)
-                    else:
-                        await self._handle_handled(transaction)
-                except Exception as e:
-                    logger.error(f'Error during transaction processing '
-                                 f'{self.transaction_id}: {e}', exc_info=True)
-                    break
+    # Checks for the user's emergency choice.
+    POLL_INTERVAL = 5
 
-                await asyncio.sleep(sleep_time)
+    def __init__(self, transaction_id: str,
+                 policy: PollingPolicy | None = None) -> None:
+        self.transaction_id = transaction_id
+        self.policy = policy or PollingPolicy.from_config()
+        self.status: str | None = None
+        self.status_changed_at: datetime | None = None
+        self.expired_polls = 0
+        self.req_confirmations: int | None = None
+        # Set while waiting for the user's choice on an emergency order.
+        self.in_emergency = False
+        # Failed polls in a row.
+        self.failures = 0
+
+    async def step(self) -> float | None:
+        """Poll the order once.
+
+        Returns the seconds until the next poll, or None when the
+        transaction needs no more polling. Database, Redis and network
+        errors are retried with the policy's backoff; after
+        ``retry_attempts`` of them in a row, or on any other error, the
+        order is set to ERROR.
+        """
+        try:
+            delay = await self._poll()
+        except TRANSIENT_ERRORS as e:
+            self.failures += 1
+            delay = self.policy.next_retry(self.failures)
+            if delay is not None:
+                logger.error(f'Failed to poll transaction '
+                             f'{self.transaction_id} ({self.failures} in a '
+                             f'row), retrying in {delay}s: {e}',
+                             exc_info=True)
+                return delay
+            logger.critical(f'Giving up transaction {self.transaction_id} '
+                            f'after {self.failures} failed polls: {e}',
+                            exc_info=True)
+            return await self._fail()
         except Exception as e:
             logger.critical('Unhandled exception in transaction processing '
                             f'{self.transaction_id}: {e}', exc_info=True)
-            raise
+            return await self._fail()
+        self.failures = 0
+        return delay
+
+    async def _poll(self) -> float | None:
+        if self.in_emergency:
+            if await self._handle_emergency():
+                self.in_emergency = False
+            return self.POLL_INTERVAL
+
+        transaction = await self._get_transaction()
+        if not transaction:
+            logger.warning(
+                f'Transaction {self.transaction_id} not found.')
+            return None
+
+        if transaction.status == TransactionStatuses.NEW:
+            logger.error('Invalid transaction status NEW '
+                         f'for {self.transaction_id}')
+            return None
+
+        stop_processing_statuses = (
+            TransactionStatuses.DONE,
+            TransactionStatuses.ERROR
+        )
+        if transaction.status in stop_processing_statuses:
+            logger.info('Stopping processing for transaction '
+                        f'{self.transaction_id} with status '
+                        f'{transaction.status}')
+            return None
+
+        if transaction.status == TransactionStatuses.HANDLED:
+            await self._handle_new(transaction)
+        else:
+            await self._handle_handled(transaction)
+        return self.policy.next_poll(self._get_state(transaction))
+
+    async def _fail(self) -> float | None:
+        """Set the order to ERROR so that it is no longer polled.
+
+        If that fails too, the order is retried after ``retry_max``.
+        """
+        try:
+            async with get_session() as session:
+                await session.execute(
+                    update(Transaction)
+                    .where(Transaction.id == self.transaction_id,
+                           Transaction.status.notin_(
+                               PollingPolicy.FINAL_STATUSES))
+                    .values(status=TransactionStatuses.ERROR,
+                            status_code=tc.UNDEFINED_ERROR_CODE,
+                            is_status_showed=False)
+                )
+                await session.commit()
+        except Exception as e:
+            logger.critical('Error setting transaction '
+                            f'{self.transaction_id} to ERROR: {e}',
+                            exc_info=True)
+            return self.policy.retry_max
+        return None
+
+    def _get_state(self, transaction: Transaction) -> OrderState:
+        now = datetime.now()
+        if transaction.status != self.status:
+            # The first poll after a restart only knows the last update.
+            self.status_changed_at = (transaction.updated_on
+                                      if self.status is None else now)
+            self.status = transaction.status
+            self.expired_polls = 0
+        if transaction.status == TransactionStatuses.EXPIRED:
+            self.expired_polls += 1
+        return OrderState(
+            status=transaction.status,
+            since_change=(now - self.status_changed_at).total_seconds(),
+            until_expiration=(
+                None if transaction.time_expiration is None
+                else (transaction.time_expiration - now).total_seconds()),
+            confirmations=transaction.received_from_confirmations,
+            req_confirmations=self.req_confirmations,
+            expired_polls=self.expired_polls,
+        )
 
     async def _get_transaction(self) -> Transaction | None:
         try:
@@ -89,17 +177,43 @@ class FFioTransaction:
             raise ex.DatabaseError(
                 'Error accessing transaction database') from e
 
+    async def _start_create(self) -> bool:
+        """Mark the order creation as started, unless it already was.
+
+        The mark is committed before ff.io is called, so an order whose
+        creation was interrupted is recognised after a restart.
+        """
+        try:
+            async with get_session() as session:
+                result = await session.execute(
+                    update(Transaction)
+                    .where(Transaction.id == self.transaction_id,
+                           Transaction.create_started_at.is_(None))
+                    .values(create_started_at=datetime.now())
+                )
+                await session.commit()
+        except Exception as e:
+            logger.error('Error marking the creation of transaction '
+                         f'{self.transaction_id}: {e}', exc_info=True)
+            raise ex.DatabaseError(
+                'Error accessing transaction database') from e
+        return result.rowcount == 1
+
     async def _handle_new(self, transaction: Transaction) -> None:
         try:
             try:
-                fromCcy = await ffio_redis_client.get_coin_full_info(
+                fromCcy = await ffio_redis_client.get_coin_code(
                     transaction.from_currency,
                     network=transaction.from_currency_network
                 )
-                toCcy = await ffio_redis_client.get_coin_full_info(
+                toCcy = await ffio_redis_client.get_coin_code(
                     transaction.to_currency,
                     network=transaction.to_currency_network
                 )
+                if fromCcy is None or toCcy is None:
+                    raise ex.RedisError('Exchange code is missing for '
+                                        f'{transaction.from_currency} or '
+                                        f'{transaction.to_currency}')
             except ex.RedisError as e:
                 logger.error('Redis error while fetching currency info '
                              f'for transaction {self.transaction_id}: {e}',
@@ -118,18 +232,25 @@ class FFioTransaction:
 
             response = None
             error_status_code = None
-            try:
-                response = await ffio_client.create(data)
-                logger.info(response)
-            except api_ex.InvalidAddressError:
-                error_status_code = tc.INVALID_ADDRESS_CODE
-            except api_ex.OutOFLimitisError:
-                error_status_code = tc.OUT_OF_LIMITS_CODE
-            except Exception as e:
-                logger.error('Error from FFIO client during order creation '
-                             f'for transaction {self.transaction_id}: {e}',
-                             exc_info=True)
+            if not await self._start_create():
+                # ff.io may have created the order before a crash, so it is
+                # never created a second time.
+                logger.error('Order creation for transaction '
+                             f'{self.transaction_id} was already started')
                 error_status_code = tc.UNDEFINED_ERROR_CODE
+            else:
+                try:
+                    response = await ffio_client.create(data)
+                    logger.info(response)
+                except api_ex.InvalidAddressError:
+                    error_status_code = tc.INVALID_ADDRESS_CODE
+                except api_ex.OutOFLimitisError:
+                    error_status_code = tc.OUT_OF_LIMITS_CODE
+                except Exception as e:
+                    logger.error('Error from FFIO client during order '
+                                 'creation for transaction '
+                                 f'{self.transaction_id}: {e}', exc_info=True)
+                    error_status_code = tc.UNDEFINED_ERROR_CODE
             try:
                 async with get_session() as session:
                     if error_status_code:
@@ -179,85 +300,76 @@ class FFioTransaction:
                          f'{self.transaction_id}: {e}', exc_info=True)
             raise
 
-    async def _handle_emergency(self) -> None:
+    async def _handle_emergency(self) -> bool:
+        """Act on the user's emergency choice once it is made.
+
+        Returns whether the emergency handling is over.
+        """
         logger.info('Emergency for transaction')
+        transaction = await self._get_transaction()
+        if not transaction:
+            logger.warning(
+                f'Transaction {self.transaction_id} not found.')
+            return True
+
+        if transaction.status != TransactionStatuses.EMERGENCY:
+            logger.critical('This transaction is not emergency '
+                            f'({self.transaction_id})')
+            return True
         try:
-            while True:
-                try:
-                    transaction = await self._get_transaction()
-                except ex.DatabaseError as e:
-                    logger.error('Database error while fetching transaction '
-                                 f'{self.transaction_id}: {e}', exc_info=True)
-                    break
-
-                if not transaction:
-                    logger.warning(
-                        f'Transaction {self.transaction_id} not found.')
-                    break
+            if transaction.emergency_choise is None:
+                return False
+            if transaction.emergency_choise == EmergencyChoices.EXCHANGE:
+                data = schemas.CreateEmergency(
+                    id=transaction.transaction_id,
+                    token=transaction.transaction_token,
+                    choice=transaction.emergency_choise
+                )
+            elif transaction.emergency_choise == EmergencyChoices.REFUND:
+                data = schemas.CreateEmergency(
+                    id=transaction.transaction_id,
+                    token=transaction.transaction_token,
+                    choice=transaction.emergency_choise,
+                    address=transaction.emergency_address,
+                    tag=transaction.emergency_tag_value
+                )
+            else:
+                raise Exception('No such choise')  # ToDo
 
-                if transaction.status != TransactionStatuses.EMERGENCY:
-                    logger.critical('This transaction is not emergency '
-                                    f'({self.transaction_id})')
-                    break
-                try:
-                    if transaction.emergency_choise is not None:
-                        if transaction.emergency_choise == EmergencyChoices.EXCHANGE: # noqa
-                            data = schemas.CreateEmergency(
-                                id=transaction.transaction_id,
-                                token=transaction.transaction_token,
-                                choice=transaction.emergency_choise
-                            )
-                        elif transaction.emergency_choise == EmergencyChoices.REFUND: # noqa
-                            data = schemas.CreateEmergency(
-                                id=transaction.transaction_id,
-                                token=transaction.transaction_token,
-                                choice=transaction.emergency_choise,
-                                address=transaction.emergency_address,
-                                tag=transaction.emergency_tag_value
-                            )
-                        else:
-                            raise Exception('No such choise')  # ToDo
-
-                        is_error = False
-                        try:
-                            if transaction.made_emergency_action:
-                                transaction.made_emergency_action = False
-                                await ffio_client.emergency(data)
-                            else:
-                                is_error = True
-                        except api_ex.InvalidAddressError:
-                            transaction.is_status_showed = False
-                            transaction.status_code = tc.INVALID_EMERGENCY_ADDRESS_CODE # noqa
-                            is_error = True
-                        except Exception as e:
-                            logger.error('Error from FFIO client during order creation ' # noqa
-                                         f'for transaction {self.transaction_id}: {e}', # noqa
-                                         exc_info=True)
-                            continue
-
-                        try:
-                            async with get_session() as session:
-                                transaction.is_emergency_handled = True
-                                session.add(transaction)
-                                await session.commit()
-                                await session.refresh(transaction)
-                        except Exception as e:
-                            logger.error(f'Error retrieving transaction {self.transaction_id} ' # noqa
-                                         f'from database: {e}', exc_info=True)
-                            raise ex.DatabaseError(
-                                'Error accessing transaction database') from e
-                        if not is_error:
-                            return
-                except Exception as e:
-                    logger.error(f'Error during transaction processing '
-                                 f'{self.transaction_id}: {e}', exc_info=True)
-                    break
+            is_error = False
+            try:
+                if transaction.made_emergency_action:
+                    transaction.made_emergency_action = False
+                    await ffio_client.emergency(data)
+                else:
+                    is_error = True
+            except api_ex.InvalidAddressError:
+                transaction.is_status_showed = False
+                transaction.status_code = tc.INVALID_EMERGENCY_ADDRESS_CODE
+                is_error = True
+            except Exception as e:
+                logger.error('Error from FFIO client during order creation '
+                             f'for transaction {self.transaction_id}: {e}',
+                             exc_info=True)
+                return False
 
-                await asyncio.sleep(5)
+            try:
+                async with get_session() as session:
+                    transaction.is_emergency_handled = True
+                    session.add(transaction)
+                    await session.commit()
+                    await session.refresh(transaction)
+            except Exception as e:
+                logger.error('Error retrieving transaction '
+                             f'{self.transaction_id} '
+                             f'from database: {e}', exc_info=True)
+                raise ex.DatabaseError(
+                    'Error accessing transaction database') from e
+            return not is_error
         except Exception as e:
-            logger.critical('Unhandled exception in transaction processing '
-                            f'{self.transaction_id}: {e}', exc_info=True)
-            raise
+            logger.error(f'Error during transaction processing '
+                         f'{self.transaction_id}: {e}', exc_info=True)
+            return True
 
     async def _handle_handled(self, transaction: Transaction) -> None:
         try:
@@ -279,6 +391,7 @@ class FFioTransaction:
                 logger.error('Empty response from FFIO client for '
                              f'transaction {self.transaction_id}')
                 return
+            self.req_confirmations = response.from_info.req_confirmations
 
             status_mapping = {
                 schemas.OrderStatus.NEW: TransactionStatuses.CREATED,
@@ -334,7 +447,7 @@ class FFioTransaction:
                     'Error accessing transaction database') from e
             if (new_status == TransactionStatuses.EMERGENCY
                     and not transaction.is_emergency_handled):
-                await self._handle_emergency()
+                self.in_emergency = True
 
         except Exception as e:
             logger.error('Error handling HANDLED transaction '
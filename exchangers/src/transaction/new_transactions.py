@@ -0,0 +1,170 @@
+import asyncio
+import logging
+
+import asyncpg
+from sqlalchemy.engine import make_url
+from sqlalchemy.sql import text
+
+from src.config import config
+from src.database import engine
+from src.models import TransactionStatuses
+from .claims import TransactionClaimer
+from .dispatcher import TransactionDispatcher
+
+logger = logging.getLogger(__name__)
+
+
+class NewTransactionListener:
+    """Pick up NEW transactions as soon as they are committed.
+
+    A trigger on the ``transaction`` table sends the id of every row that
+    is inserted or updated with status NEW to the ``CHANNEL``
+    notification channel. The listener holds a dedicated asyncpg
+    connection that ``LISTEN``s on it and claims the notified rows with
+    ``TransactionClaimer``, every id that queued up meanwhile in one
+    statement; rows claimed by another replica are skipped.
+
+    Notifications are lost while the connection is down, so a sweep
+    claims every NEW row after each (re)connect and then every
+    ``TRANSACTIONS_SWEEP_INTERVAL`` seconds. The leases of the claimed
+    transactions are renewed by the ``OrderPoller`` that polls them.
+    """
+
+    CHANNEL = 'new_transaction'
+    TRIGGER = 'transaction_new_notify'
+    # Serialises the installation between replicas; the key is arbitrary
+    # but fixed.
+    INSTALL_LOCK = 'SELECT pg_advisory_xact_lock(7305157441)'
+    TRIGGER_EXISTS = (
+        'SELECT 1 FROM pg_trigger WHERE tgname = :name '
+        """AND tgrelid = '"transaction"'::regclass"""
+    )
+    FUNCTION_DDL = f"""
+        CREATE OR REPLACE FUNCTION notify_new_transaction() RETURNS trigger
+        AS $$
+        BEGIN
+            PERFORM pg_notify('{CHANNEL}', NEW.id::text);
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql
+        """
+    TRIGGER_DDL = f"""
+        CREATE TRIGGER {TRIGGER}
+        AFTER INSERT OR UPDATE OF status ON "transaction"
+        FOR EACH ROW WHEN (NEW.status = '{TransactionStatuses.NEW}')
+        EXECUTE FUNCTION notify_new_transaction()
+        """
+
+    def __init__(self, dispatcher: TransactionDispatcher,
+                 claimer: TransactionClaimer) -> None:
+        self.dispatcher = dispatcher
+        self.claimer = claimer
+        self._queue: asyncio.Queue[str] = asyncio.Queue()
+        self._sweep_now = asyncio.Event()
+        self.stats = {'notified': 0, 'swept': 0, 'claimed': 0, 'claims': 0,
+                      'reconnects': 0}
+
+    async def run(self) -> None:
+        await self._install_trigger()
+        tasks = [asyncio.create_task(self._listen()),
+                 asyncio.create_task(self._claim_notified()),
+                 asyncio.create_task(self._sweep())]
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _install_trigger(self) -> None:
+        """Create the trigger unless it exists.
+
+        ``CREATE TRIGGER`` locks the whole ``transaction`` table, so it
+        only runs when the trigger is missing, and under an advisory lock
+        so that replicas starting together do not race.
+        """
+        try:
+            async with engine.begin() as connection:
+                await connection.execute(text(self.INSTALL_LOCK))
+                exists = (await connection.execute(
+                    text(self.TRIGGER_EXISTS), {'name': self.TRIGGER}
+                )).first()
+                if exists:
+                    return
+                await connection.execute(text(self.FUNCTION_DDL))
+                await connection.execute(text(self.TRIGGER_DDL))
+            logger.info('New transaction trigger installed')
+        except Exception as e:
+            logger.error('Failed to install the new transaction trigger, '
+                         f'relying on the sweep: {e}', exc_info=True)
+
+    def _on_notification(self, connection, pid, channel, payload) -> None:
+        self.stats['notified'] += 1
+        self._queue.put_nowait(payload)
+
+    async def _listen(self) -> None:
+        url = make_url(config.DATABASE_URL).set(drivername='postgresql')
+        dsn = url.render_as_string(hide_password=False)
+        while True:
+            lost = asyncio.Event()
+            connection = None
+            try:
+                connection = await asyncpg.connect(dsn)
+                connection.add_termination_listener(
+                    lambda _: lost.set())
+                await connection.add_listener(self.CHANNEL,
+                                              self._on_notification)
+                logger.info(f'Listening on {self.CHANNEL}')
+                # Rows committed while not listening were not notified.
+                self._sweep_now.set()
+                await lost.wait()
+                logger.warning(f'Lost the {self.CHANNEL} connection')
+            except Exception as e:
+                logger.error(f'Failed to listen on {self.CHANNEL}: {e}',
+                             exc_info=True)
+            finally:
+                if connection is not None and not connection.is_closed():
+                    await connection.close()
+            self.stats['reconnects'] += 1
+            await asyncio.sleep(5)
+
+    async def _claim_notified(self) -> None:
+        while True:
+            transaction_ids = {await self._queue.get()}
+            while (not self._queue.empty() and len(transaction_ids)
+                   < config.TRANSACTIONS_CLAIM_BATCH_SIZE):
+                transaction_ids.add(self._queue.get_nowait())
+            await self._claim(list(transaction_ids))
+
+    async def _sweep(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._sweep_now.wait(),
+                                       config.TRANSACTIONS_SWEEP_INTERVAL)
+            except TimeoutError:
+                pass
+            self._sweep_now.clear()
+            while True:
+                claimed = await self._claim()
+                # Claimed here, so their notifications were missed.
+                self.stats['swept'] += claimed
+                if claimed < config.TRANSACTIONS_CLAIM_BATCH_SIZE:
+                    break
+            logger.info(f'New transactions: {self.stats}')
+
+    async def _claim(self, transaction_ids: list[str] | None = None) -> int:
+        """Claim NEW transactions, dispatch them and return their number."""
+        try:
+            claimed = await self.claimer.claim(
+                transaction_ids=transaction_ids)
+        except Exception as e:
+            logger.error(f'Failed to claim new transactions: {e}',
+                         exc_info=True)
+            return 0
+        self.stats['claims'] += 1
+        if claimed:
+            self.stats['claimed'] += len(claimed)
+            logger.info(f'Claimed {len(claimed)} transactions as '
+                        f'{self.claimer.worker_id}')
+            await self.dispatcher.add(claimed)
+        return len(claimed)
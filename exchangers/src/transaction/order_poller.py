@@ -0,0 +1,169 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+import uuid
+
+from src.config import config
+from .claims import TransactionClaimer
+from .ffio_transaction import FFioTransaction
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """Allow ``rate`` acquisitions per second with bursts of ``burst``."""
+
+    def __init__(self, rate: float, burst: int) -> None:
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> float:
+        """Take a token, waiting for one if needed; return the wait."""
+        async with self._lock:
+            now = time.monotonic()
+            refill = (now - self.updated_at) * self.rate
+            self.tokens = min(self.burst, self.tokens + refill)
+            self.updated_at = now
+            self.tokens -= 1
+            if self.tokens >= 0:
+                return 0.0
+            # Waiting under the lock keeps the waiters in arrival order.
+            wait = -self.tokens / self.rate
+            await asyncio.sleep(wait)
+            return wait
+
+
+class OrderPoller:
+    """Poll every active order from one heap of deadlines.
+
+    Each order is an ``FFioTransaction`` in a heap keyed by the time of
+    its next ``step()``. A scheduler moves due orders, earliest deadline
+    first, to a queue served by ``TRANSACTIONS_POLL_WORKERS`` workers, so
+    any number of orders costs a fixed number of coroutines. Every step
+    takes a token from a bucket of ``TRANSACTIONS_FFIO_RATE`` requests
+    per second first, which caps the ff.io request rate of the service;
+    when the budget runs short, orders are served late in deadline order
+    rather than some being starved.
+
+    An order is either in the heap or being stepped, never both, so its
+    polls never overlap. ``get_stats()`` reports the number of orders, the
+    queue depth of due orders and the poll lag, i.e. how late steps start
+    after their deadline.
+
+    The poller renews the claim leases of exactly the orders it holds,
+    every third of ``TRANSACTIONS_CLAIM_LEASE``, and releases the claim of
+    an order once it stops polling it.
+    """
+
+    def __init__(self, claimer: TransactionClaimer) -> None:
+        self.claimer = claimer
+        self.bucket = TokenBucket(config.TRANSACTIONS_FFIO_RATE,
+                                  config.TRANSACTIONS_FFIO_BURST)
+        self._heap: list[tuple[float, int, uuid.UUID]] = []
+        self._orders: dict[uuid.UUID, FFioTransaction] = {}
+        self._ready: asyncio.Queue[tuple[float, uuid.UUID]] = asyncio.Queue()
+        self._sequence = itertools.count()
+        self._wakeup = asyncio.Event()
+        self._lags: list[float] = []
+        self.stats = {'steps': 0, 'finished': 0, 'budget_wait': 0.0,
+                      'leases': 0}
+
+    def add(self, transaction_id: uuid.UUID, delay: float = 0) -> None:
+        """Poll an order in ``delay`` seconds, unless it is polled already."""
+        if transaction_id in self._orders:
+            return
+        self._orders[transaction_id] = FFioTransaction(transaction_id)
+        self._push(transaction_id, time.monotonic() + delay)
+
+    def _push(self, transaction_id: uuid.UUID, deadline: float) -> None:
+        heapq.heappush(self._heap,
+                       (deadline, next(self._sequence), transaction_id))
+        self._wakeup.set()
+
+    async def run(self) -> None:
+        tasks = [asyncio.create_task(self._schedule()),
+                 asyncio.create_task(self._log_stats()),
+                 asyncio.create_task(self._renew_leases())]
+        tasks += [asyncio.create_task(self._work())
+                  for _ in range(config.TRANSACTIONS_POLL_WORKERS)]
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _schedule(self) -> None:
+        while True:
+            now = time.monotonic()
+            while self._heap and self._heap[0][0] <= now:
+                deadline, _, transaction_id = heapq.heappop(self._heap)
+                self._ready.put_nowait((deadline, transaction_id))
+            timeout = self._heap[0][0] - now if self._heap else None
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except TimeoutError:
+                pass
+
+    async def _work(self) -> None:
+        while True:
+            deadline, transaction_id = await self._ready.get()
+            self.stats['budget_wait'] += await self.bucket.acquire()
+            self._lags.append(time.monotonic() - deadline)
+            order = self._orders[transaction_id]
+            try:
+                delay = await order.step()
+            except Exception as e:
+                logger.error(f'Failed to poll transaction {transaction_id}: '
+                             f'{e}', exc_info=True)
+                delay = order.POLL_INTERVAL
+            self.stats['steps'] += 1
+            if delay is None:
+                del self._orders[transaction_id]
+                self.stats['finished'] += 1
+                await self._release(transaction_id)
+            else:
+                self._push(transaction_id, time.monotonic() + delay)
+
+    async def _release(self, transaction_id: uuid.UUID) -> None:
+        try:
+            await self.claimer.release([transaction_id])
+        except Exception as e:
+            # The lease then expires and recovery takes the order over.
+            logger.error('Failed to release transaction '
+                         f'{transaction_id}: {e}', exc_info=True)
+
+    async def _renew_leases(self) -> None:
+        while True:
+            await asyncio.sleep(config.TRANSACTIONS_CLAIM_LEASE / 3)
+            try:
+                self.stats['leases'] = await self.claimer.renew_leases(
+                    list(self._orders))
+            except Exception as e:
+                logger.error(f'Failed to renew transaction leases: {e}',
+                             exc_info=True)
+
+    def get_stats(self) -> dict:
+        lags = sorted(self._lags)
+        return {
+            'orders': len(self._orders),
+            'due': self._ready.qsize(),
+            'lag_avg': round(sum(lags) / len(lags), 3) if lags else 0.0,
+            'lag_p95': round(lags[int(len(lags) * 0.95)], 3) if lags else 0.0,
+            'lag_max': round(lags[-1], 3) if lags else 0.0,
+            **self.stats,
+            'budget_wait': round(self.stats['budget_wait'], 3),
+        }
+
+    async def _log_stats(self) -> None:
+        while True:
+            await asyncio.sleep(config.TRANSACTIONS_POLL_STATS_INTERVAL)
+            logger.info(f'Order poller: {self.get_stats()}')
+            # Lags are reported per interval.
+            self._lags.clear()
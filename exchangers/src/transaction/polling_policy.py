@@ -0,0 +1,104 @@
+from dataclasses import dataclass
+
+from src.config import config
+from src.models import TransactionStatuses
+
+
+@dataclass(frozen=True)
+class OrderState:
+    """What the polling policy knows about an order after a poll."""
+
+    status: str
+    # Seconds since the status last changed.
+    since_change: float
+    # Seconds until the order expires, negative once it has; None if
+    # the order has not been created yet.
+    until_expiration: float | None = None
+    confirmations: int | None = None
+    req_confirmations: int | None = None
+    # Polls made since the order expired.
+    expired_polls: int = 0
+
+
+@dataclass(frozen=True)
+class PollingPolicy:
+    """Decide when an order is polled next from its state alone.
+
+    Created orders are polled fast right after a status change, then
+    slowly while waiting for the deposit, and once exactly at their
+    expiration (plus ``expiration_grace`` for ff.io to flip the status).
+    Deposits being confirmed are polled slowly until the last required
+    confirmation is near. Expired orders, which only change if a late
+    deposit arrives, back off exponentially and are given up after
+    ``expired_give_up`` seconds. Failed polls back off the same way,
+    from ``retry_base`` up to ``retry_max``, and the order is given up
+    after ``retry_attempts`` failures in a row.
+
+    ``next_poll()`` does no I/O, so the cadence of any state can be
+    checked offline.
+    """
+
+    fast: float = 5
+    fast_window: float = 120
+    awaiting_deposit: float = 30
+    confirming: float = 20
+    active: float = 10
+    expiration_grace: float = 2
+    expired_base: float = 60
+    expired_max: float = 3600
+    expired_give_up: float = 24 * 3600
+    retry_base: float = 5
+    retry_max: float = 600
+    retry_attempts: int = 12
+
+    FINAL_STATUSES = (TransactionStatuses.DONE, TransactionStatuses.ERROR)
+
+    @classmethod
+    def from_config(cls) -> 'PollingPolicy':
+        return cls(
+            fast=config.ORDER_POLL_FAST,
+            fast_window=config.ORDER_POLL_FAST_WINDOW,
+            awaiting_deposit=config.ORDER_POLL_AWAITING_DEPOSIT,
+            confirming=config.ORDER_POLL_CONFIRMING,
+            active=config.ORDER_POLL_ACTIVE,
+            expiration_grace=config.ORDER_POLL_EXPIRATION_GRACE,
+            expired_base=config.ORDER_POLL_EXPIRED_BASE,
+            expired_max=config.ORDER_POLL_EXPIRED_MAX,
+            expired_give_up=config.ORDER_POLL_EXPIRED_GIVE_UP,
+            retry_base=config.ORDER_POLL_RETRY_BASE,
+            retry_max=config.ORDER_POLL_RETRY_MAX,
+            retry_attempts=config.ORDER_POLL_RETRY_ATTEMPTS,
+        )
+
+    def next_poll(self, state: OrderState) -> float | None:
+        """Return the seconds until the next poll, None to stop polling."""
+        if state.status in self.FINAL_STATUSES:
+            return None
+        if state.status == TransactionStatuses.HANDLED:
+            return 0
+        if state.status == TransactionStatuses.EXPIRED:
+            if state.since_change >= self.expired_give_up:
+                return None
+            return min(self.expired_base * 2 ** state.expired_polls,
+                       self.expired_max)
+
+        if state.status == TransactionStatuses.CREATED:
+            if state.until_expiration is None or state.until_expiration <= 0:
+                # Past the expiration until ff.io marks the order expired.
+                return self.fast
+            delay = (self.fast if state.since_change < self.fast_window
+                     else self.awaiting_deposit)
+            return min(delay, state.until_expiration + self.expiration_grace)
+        if state.status == TransactionStatuses.PENDING:
+            if (state.req_confirmations is not None
+                    and state.confirmations is not None
+                    and state.req_confirmations - state.confirmations <= 1):
+                return self.fast
+            return self.confirming
+        return self.active
+
+    def next_retry(self, failures: int) -> float | None:
+        """Return the seconds until a failed poll is retried, None if not."""
+        if failures >= self.retry_attempts:
+            return None
+        return min(self.retry_base * 2 ** (failures - 1), self.retry_max)
@@ -0,0 +1,95 @@
+import asyncio
+import logging
+import time
+import uuid
+from datetime import datetime
+
+from src.config import config
+from src.models import TransactionStatuses
+from .claims import TransactionClaimer
+from .order_poller import OrderPoller
+
+logger = logging.getLogger(__name__)
+
+
+class OrderRecovery:
+    """Resume the unfinished orders of a restarted or dead worker.
+
+    ``run()`` claims, in batches of ``TRANSACTIONS_CLAIM_BATCH_SIZE``,
+    every unfinished transaction whose lease was lost, including the
+    worker's own leases from before a restart, and hands them to the
+    ``OrderPoller`` most urgent first: orders still to be created on
+    ff.io, then emergencies, then created orders by expiration, then
+    orders in progress and last expired ones. Their first polls are
+    spread at ``TRANSACTIONS_RECOVERY_RATE`` per second, below the ff.io
+    budget of the poller, so new orders are still served while a backlog
+    is resumed. ``watch()`` then takes over the orders of workers whose
+    leases expire, every ``TRANSACTIONS_CLAIM_LEASE`` seconds.
+
+    Recovery is safe to repeat: the poller ignores orders it already
+    polls, and an order whose ff.io creation was started before a crash
+    is never created again (see ``FFioTransaction._start_create``).
+    """
+
+    URGENCY = {
+        TransactionStatuses.HANDLED: 0,
+        TransactionStatuses.EMERGENCY: 1,
+        TransactionStatuses.CREATED: 2,
+        TransactionStatuses.EXPIRED: 4,
+    }
+    # Orders in progress: pending, exchange and withdraw.
+    DEFAULT_URGENCY = 3
+
+    def __init__(self, claimer: TransactionClaimer,
+                 poller: OrderPoller) -> None:
+        self.claimer = claimer
+        self.poller = poller
+        self.stats = {'recovered': 0, 'taken_over': 0}
+
+    async def run(self) -> int:
+        """Resume the orders of the worker before its restart."""
+        started_at = time.monotonic()
+        orders = await self._recover(include_own=True)
+        self._schedule(orders)
+        self.stats['recovered'] += len(orders)
+        logger.info(f'Recovered {len(orders)} orders in '
+                    f'{time.monotonic() - started_at:.2f}s')
+        return len(orders)
+
+    async def watch(self) -> None:
+        while True:
+            await asyncio.sleep(config.TRANSACTIONS_CLAIM_LEASE)
+            try:
+                orders = await self._recover()
+            except Exception as e:
+                logger.error(f'Failed to take over orders: {e}',
+                             exc_info=True)
+                continue
+            if orders:
+                self._schedule(orders)
+                self.stats['taken_over'] += len(orders)
+                logger.warning(f'Took over {len(orders)} orders with '
+                               'expired leases')
+
+    async def _recover(
+            self, include_own: bool = False
+    ) -> list[tuple[uuid.UUID, str, datetime | None]]:
+        orders = []
+        after = None
+        while True:
+            batch = await self.claimer.recover(after=after,
+                                               include_own=include_own)
+            if not batch:
+                return orders
+            orders += batch
+            after = max(transaction_id for transaction_id, _, _ in batch)
+
+    def _schedule(
+            self, orders: list[tuple[uuid.UUID, str, datetime | None]]
+    ) -> None:
+        orders.sort(key=lambda order: (
+            self.URGENCY.get(order[1], self.DEFAULT_URGENCY),
+            order[2] or datetime.max))
+        for index, (transaction_id, _, _) in enumerate(orders):
+            self.poller.add(transaction_id,
+                            delay=index / config.TRANSACTIONS_RECOVERY_RATE)
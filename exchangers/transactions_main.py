@@ -3,12 +3,14 @@ import logging
 import logging.handlers
 import os
 
-from sqlalchemy.exc import SQLAlchemyError
-from sqlalchemy.future import select
-
-from src.database import get_session, set_isolation_level
-from src.models import Transaction, TransactionStatuses
+from src.api.ffio.ffio_client import ffio_client
+from src.database import engine, set_isolation_level
+from src.models import migrate_models
+from src.transaction.claims import TransactionClaimer
 from src.transaction.dispatcher import TransactionDispatcher
+from src.transaction.new_transactions import NewTransactionListener
+from src.transaction.order_poller import OrderPoller
+from src.transaction.recovery import OrderRecovery
 
 if not os.path.exists('logs'):
     os.makedirs('logs')
@@ -28,47 +30,33 @@ logger = logging.getLogger(__name__)
 async def main():
     logger.info('Transaction processing started.')
     try:
-        dispatcher = TransactionDispatcher()
+        claimer = TransactionClaimer()
+        poller = OrderPoller(claimer)
+        dispatcher = TransactionDispatcher(poller)
         await set_isolation_level('SERIALIZABLE')
     except Exception as e:
         logger.critical(f'Failed to set database isolation level: {e}',
                         exc_info=True)
         return
 
-    while True:
-        try:
-            async with get_session() as session:
-                try:
-                    result = await session.execute(
-                        select(Transaction).where(
-                            Transaction.status == TransactionStatuses.NEW)
-                    )
-                    transactions = result.scalars().all()
-
-                    if transactions:
-                        for transaction in transactions:
-                            try:
-                                transaction.status = TransactionStatuses.HANDLED # noqa
-                                await session.commit()
-                                await session.refresh(transaction)
-
-                                await dispatcher.add(transaction)
-                            except Exception as transaction_error:
-                                logger.error(
-                                    f'Failed to process transaction {transaction.id}: {transaction_error}', # noqa
-                                    exc_info=True
-                                )
-                                await session.rollback()
+    try:
+        await migrate_models(engine)
+    except Exception as e:
+        logger.critical(f'Failed to migrate the database: {e}', exc_info=True)
+        return
 
-                except SQLAlchemyError as db_error:
-                    logger.error('Database error during transaction '
-                                 f'query: {db_error}', exc_info=True)
-                    await asyncio.sleep(5)
+    await ffio_client.start()
+    try:
+        recovery = OrderRecovery(claimer, poller)
+        try:
+            await recovery.run()
         except Exception as e:
-            logger.error(f'Unexpected error in main loop: {e}', exc_info=True)
-            await asyncio.sleep(5)
-
-        await asyncio.sleep(1)
+            logger.error('Failed to recover orders, leaving them to the '
+                         f'lease watch: {e}', exc_info=True)
+        listener = NewTransactionListener(dispatcher, claimer)
+        await asyncio.gather(poller.run(), listener.run(), recovery.watch())
+    finally:
+        await ffio_client.close()
 
 
 if __name__ == '__main__':